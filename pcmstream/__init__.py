@@ -0,0 +1,8 @@
+# Streaming engine behind socketPCM. Importing this package never imports tkinter,
+# the GUI lives in pcmstream.gui and is only loaded when it is started.
+from .config import StreamConfig
+from .engine import StreamEngine
+from .audio import (
+    AudioSource, AudioSink, PyAudioSource, PyAudioSink,
+    ToneSource, WavFileSource, WavFileSink, NullSink
+)
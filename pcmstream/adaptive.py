@@ -0,0 +1,115 @@
+import time
+
+from .config import LOW_LATENCY_CHUNK
+from .protocol import MAX_DATAGRAM_PAYLOAD
+
+# "auto" latency: the sender starts with a small chunk and moves it one step at
+# a time. Any overflow or underrun, on either end, grows it right away. After a
+# clean stretch it shrinks again, but only while the latency estimate is above
+# the target. A shrink that brings the trouble back doubles the wait before
+# the next try, so the chunk settles at the smallest size both machines and the
+# network can keep up with.
+
+CHUNK_STEPS = (64, 128, 256, 512, 1024, 2048)
+MAX_CHUNK_MS = 50 # Whatever the rate, callback rings hold 200 ms
+CHECK_SECONDS = 1.0 # Receivers report once a second
+GRACE_SECONDS = 2.0 # Glitches right after a change are the change settling in
+SETTLE_SECONDS = 15.0 # Clean time needed before trying a smaller chunk
+MAX_SETTLE_SECONDS = 240.0
+LATENCY_CHUNKS = 3 # Capture buffer, chunk on the wire, device buffer on the way out
+
+
+def chunk_steps(config):
+    steps = [chunk for chunk in CHUNK_STEPS if chunk * 1000 / config.rate <= MAX_CHUNK_MS]
+    if config.transport != "tcp":
+        steps = [chunk for chunk in steps if chunk * config.frame_bytes <= MAX_DATAGRAM_PAYLOAD]
+    return steps or [CHUNK_STEPS[0]]
+
+
+def starting_chunk(config, saved=None):
+    # Where the last session settled, otherwise small
+    steps = chunk_steps(config)
+    if saved in steps:
+        return saved
+    return LOW_LATENCY_CHUNK if LOW_LATENCY_CHUNK in steps else steps[0]
+
+
+class LatencyController:
+    def __init__(self, config):
+        self.steps = chunk_steps(config)
+        self.rate = config.rate
+        self.target_ms = config.latency_target_ms
+        # Closest step to the chunk the stream was opened with
+        self.index = min(range(len(self.steps)), key=lambda i: abs(self.steps[i] - config.chunk))
+        now = time.monotonic()
+        self.next_check = now + CHECK_SECONDS
+        self.grace_until = now + GRACE_SECONDS
+        self.clean_since = now
+        self.settle = SETTLE_SECONDS
+        self.shrunk_at = None
+        self.glitches = None
+        self.buffer_ms = 0
+        self.grown = 0
+        self.shrunk = 0
+
+    @property
+    def chunk(self):
+        return self.steps[self.index]
+
+    def latency_ms(self, chunk=None):
+        chunk = self.chunk if chunk is None else chunk
+        return LATENCY_CHUNKS * chunk * 1000 / self.rate + self.buffer_ms
+
+    def due(self, now=None):
+        return (time.monotonic() if now is None else now) >= self.next_check
+
+    def update(self, glitches, buffer_ms=0, now=None):
+        # glitches: overflows and underruns so far, both ends together.
+        # buffer_ms: the receiver's jitter buffer target. Returns the new chunk
+        # size, or None to keep the current one.
+        now = time.monotonic() if now is None else now
+        self.next_check = now + CHECK_SECONDS
+        self.buffer_ms = buffer_ms
+        previous, self.glitches = self.glitches, glitches
+        if previous is None or glitches < previous or now < self.grace_until:
+            # First look, a receiver that reconnected and counts from zero again,
+            # or a change still settling in
+            return None
+
+        if glitches > previous:
+            self.clean_since = now
+            if self.shrunk_at is not None and now - self.shrunk_at < self.settle:
+                # The last shrink brought the trouble back, wait longer next time
+                self.settle = min(self.settle * 2, MAX_SETTLE_SECONDS)
+            self.shrunk_at = None
+            if self.index + 1 >= len(self.steps):
+                return None
+            self.index += 1
+            self.grown += 1
+            self.grace_until = now + GRACE_SECONDS
+            return self.chunk
+
+        if self.index == 0 or now - self.clean_since < self.settle or self.latency_ms() <= self.target_ms:
+            return None
+        self.index -= 1
+        self.shrunk += 1
+        self.clean_since = now
+        self.shrunk_at = now
+        self.grace_until = now + GRACE_SECONDS
+        return self.chunk
+
+    def pause(self, now=None):
+        # The sender is quiet (DTX) and the receivers' devices run dry on
+        # purpose. Their counts are taken as they come until a while after it.
+        now = time.monotonic() if now is None else now
+        self.grace_until = now + GRACE_SECONDS
+
+    def stats(self):
+        return {
+            "chunk": self.chunk,
+            "estimated_latency_ms": round(self.latency_ms(), 1),
+            "target_ms": self.target_ms,
+            "grown": self.grown,
+            "shrunk": self.shrunk,
+            "settle_s": self.settle,
+        }
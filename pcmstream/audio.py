@@ -0,0 +1,514 @@
+import sys
+import time
+import wave
+import threading
+
+import numpy as np
+
+from .formats import FormatConverter, from_float, MAX_CHANNELS
+from .ringbuffer import RingBuffer
+
+_pyaudio = None
+pyaudio_library = None
+
+
+def load_pyaudio():
+    # Imported lazily so file/tone/null pipelines work on boxes without PortAudio
+    global _pyaudio, pyaudio_library
+    if _pyaudio is None:
+        # Determine the appropriate PyAudio library based on the operating system
+        if sys.platform.startswith("win"):
+            import pyaudiowpatch as pyaudio  #This library adds wasapi loopback support
+            pyaudio_library = "PyAudioWPatch"
+        else:
+            import pyaudio
+            pyaudio_library = "pyaudio"
+        _pyaudio = pyaudio
+    return _pyaudio
+
+
+class Pacer:
+    # Sleeps so that file backed sources/sinks behave like a sound card clock
+    def __init__(self, rate):
+        self.rate = rate
+        self.deadline = None
+
+    def wait(self, frames):
+        now = time.monotonic()
+        if self.deadline is None or now - self.deadline > 0.5:
+            # First call, or we fell far behind: resync instead of bursting
+            self.deadline = now
+        self.deadline += frames / self.rate
+        delay = self.deadline - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def pa_format(pyaudio, config):
+    # Not get_format_from_width(): that opens 4 byte samples as float
+    if config.sample_float:
+        return pyaudio.paFloat32
+    return {1: pyaudio.paUInt8, 2: pyaudio.paInt16, 3: pyaudio.paInt24, 4: pyaudio.paInt32}[config.sample_width]
+
+
+def device_channels(pa, device_index, direction):
+    # Most channels the device takes in that direction, 0 when it can't be asked
+    key = 'maxInputChannels' if direction == 'input' else 'maxOutputChannels'
+    try:
+        if device_index is None:
+            if direction == 'input':
+                info = pa.get_default_input_device_info()
+            else:
+                info = pa.get_default_output_device_info()
+        else:
+            info = pa.get_device_info_by_index(device_index)
+        return int(info[key])
+    except (OSError, AttributeError, KeyError):
+        return 0
+
+
+def open_device(pa, pyaudio, config, device_index, direction, **options):
+    # Opens the device at the stream's channel count, or at its own when it
+    # has fewer or refuses that one (WASAPI loopback only takes its mix
+    # format). Returns the stream and the config the device runs at, a
+    # FormatConverter bridges the two. PortAudio converts sample formats itself.
+    maximum = device_channels(pa, device_index, direction)
+    counts = [config.channels] if not maximum or config.channels <= maximum else []
+    if maximum and maximum != config.channels and maximum <= MAX_CHANNELS:
+        counts.append(maximum)
+    options[direction] = True
+    options[f"{direction}_device_index"] = device_index
+    error = None
+    for channels in counts:
+        try:
+            stream = pa.open(format=pa_format(pyaudio, config), channels=channels, rate=config.rate,
+                             frames_per_buffer=config.chunk, **options)
+            return stream, config.copy(channels=channels)
+        except OSError as e:
+            error = error or e
+    raise error or OSError(f"The device has no {direction} channels")
+
+
+def describe_device(device_index, device_config, config):
+    if device_config and device_config.channels != config.channels:
+        return f"device {device_index} ({device_config.channels} ch)"
+    return f"device {device_index}"
+
+
+class AudioSource:
+    # Base class: open(config) once, read(frames) returns PCM bytes, b'' at end
+    def open(self, config):
+        pass
+
+    def read(self, frames):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def describe(self):
+        return type(self).__name__
+
+    def stats(self):
+        return {}
+
+
+class AudioSink:
+    # Base class: open(config) once, write(data) takes whole frames.
+    # A clocked sink blocks in write() at the device rate, others need pacing.
+    clocked = False
+
+    def open(self, config):
+        pass
+
+    def write(self, data):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def describe(self):
+        return type(self).__name__
+
+    def stats(self):
+        return {}
+
+
+class PyAudioSource(AudioSource):
+    def __init__(self, device_index=None, pa=None):
+        self.device_index = device_index
+        self.pa = pa
+        self.owns_pa = pa is None
+        self.stream = None
+        self.config = None
+        self.device_config = None
+        self.converter = None
+        self.overflows = 0
+
+    def open(self, config):
+        pyaudio = load_pyaudio()
+        if self.pa is None:
+            self.pa = pyaudio.PyAudio()
+        self.paInputOverflowed = pyaudio.paInputOverflowed
+        self.config = config
+        self.stream, self.device_config = open_device(self.pa, pyaudio, config, self.device_index, 'input')
+        self.converter = FormatConverter(self.device_config, config)
+
+    def read(self, frames):
+        try:
+            data = self.stream.read(frames)
+        except IOError as e:
+            if e.errno != self.paInputOverflowed:
+                raise
+            # Input was dropped while the loop was busy, count it and carry on
+            self.overflows += 1
+            data = self.stream.read(frames, exception_on_overflow=False)
+        return self.converter.convert(data)
+
+    def close(self):
+        if self.stream:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+        if self.owns_pa and self.pa:
+            self.pa.terminate()
+            self.pa = None
+
+    def describe(self):
+        return describe_device(self.device_index, self.device_config, self.config)
+
+    def stats(self):
+        return {"overflows": self.overflows}
+
+
+class PyAudioSink(AudioSink):
+    clocked = True
+
+    def __init__(self, device_index=None, pa=None):
+        self.device_index = device_index
+        self.pa = pa
+        self.owns_pa = pa is None
+        self.stream = None
+        self.config = None
+        self.device_config = None
+        self.converter = None
+        self.underruns = 0
+
+    def open(self, config):
+        pyaudio = load_pyaudio()
+        if self.pa is None:
+            self.pa = pyaudio.PyAudio()
+        self.paOutputUnderflowed = pyaudio.paOutputUnderflowed
+        self.config = config
+        self.stream, self.device_config = open_device(self.pa, pyaudio, config, self.device_index, 'output')
+        self.converter = FormatConverter(config, self.device_config)
+
+    def write(self, data):
+        data = self.converter.convert(data)
+        try:
+            self.stream.write(data, exception_on_underflow=True)
+        except IOError as e:
+            if e.errno != self.paOutputUnderflowed:
+                raise
+            # The chunk was still played, the device ran dry before it
+            self.underruns += 1
+
+    def close(self):
+        if self.stream:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+        if self.owns_pa and self.pa:
+            self.pa.terminate()
+            self.pa = None
+
+    def describe(self):
+        return describe_device(self.device_index, self.device_config, self.config)
+
+    def stats(self):
+        return {"underruns": self.underruns}
+
+
+def ring_capacity(config, ring_ms):
+    # Room for ring_ms of audio and never less than 4 chunks, in whole frames
+    frames = max(int(config.rate * ring_ms / 1000), 4 * config.chunk)
+    return frames * config.frame_bytes
+
+
+class CallbackPyAudioSource(AudioSource):
+    # PortAudio calls us with each captured buffer and we only copy it into a
+    # ring. The network thread drains the ring through read(), so a slow send
+    # can no longer make the device overflow.
+    def __init__(self, device_index=None, pa=None, ring_ms=200):
+        self.device_index = device_index
+        self.pa = pa
+        self.owns_pa = pa is None
+        self.ring_ms = ring_ms
+        self.stream = None
+        self.ring = None
+        self.frame_bytes = 0
+        self.config = None
+        self.device_config = None
+        self.converter = None
+        self.ready = threading.Event()
+        self.timeout = 1.0
+        self.overflows = 0 # Chunks the ring had no room for
+        self.device_overflows = 0 # Reported by PortAudio
+
+    def open(self, config):
+        pyaudio = load_pyaudio()
+        if self.pa is None:
+            self.pa = pyaudio.PyAudio()
+        self.paContinue = pyaudio.paContinue
+        self.paInputOverflow = pyaudio.paInputOverflow
+        self.config = config
+        self.timeout = max(1.0, 4 * config.chunk_seconds)
+        # Started once the ring is there, it holds what the device delivers
+        # and read() converts it
+        self.stream, self.device_config = open_device(self.pa, pyaudio, config, self.device_index, 'input',
+                                                      stream_callback=self._callback, start=False)
+        self.ring = RingBuffer(ring_capacity(self.device_config, self.ring_ms))
+        self.frame_bytes = self.device_config.frame_bytes
+        self.converter = FormatConverter(self.device_config, config)
+        self.stream.start_stream()
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        if status & self.paInputOverflow:
+            self.device_overflows += 1
+        if self.ring.write(in_data) < len(in_data):
+            self.overflows += 1
+        self.ready.set()
+        return (None, self.paContinue)
+
+    def read(self, frames):
+        size = frames * self.frame_bytes
+        while self.ring.readable() < size:
+            self.ready.clear()
+            if self.ring.readable() >= size:
+                break
+            if not self.ready.wait(self.timeout):
+                raise IOError("No audio from the input device")
+        return self.converter.convert(self.ring.read(size))
+
+    def close(self):
+        if self.stream:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+        if self.owns_pa and self.pa:
+            self.pa.terminate()
+            self.pa = None
+
+    def describe(self):
+        return describe_device(self.device_index, self.device_config, self.config) + " (callback)"
+
+    def stats(self):
+        return {"overflows": self.overflows, "device_overflows": self.device_overflows}
+
+
+class CallbackPyAudioSink(AudioSink):
+    # The playout thread fills a ring, PortAudio's callback empties it. When the
+    # ring runs dry the callback plays silence and counts an underrun instead
+    # of waiting on the network.
+    clocked = True
+
+    def __init__(self, device_index=None, pa=None, ring_ms=200):
+        self.device_index = device_index
+        self.pa = pa
+        self.owns_pa = pa is None
+        self.ring_ms = ring_ms
+        self.stream = None
+        self.ring = None
+        self.started = False
+        self.prefill = 0
+        self.frame_bytes = 0
+        self.config = None
+        self.device_config = None
+        self.converter = None
+        self.space = threading.Event()
+        self.underruns = 0 # Callbacks the ring could not fully serve
+        self.device_underruns = 0 # Reported by PortAudio
+
+    def open(self, config):
+        pyaudio = load_pyaudio()
+        if self.pa is None:
+            self.pa = pyaudio.PyAudio()
+        self.paContinue = pyaudio.paContinue
+        self.paOutputUnderflow = pyaudio.paOutputUnderflow
+        self.config = config
+        self.started = False
+        self.stream, self.device_config = open_device(self.pa, pyaudio, config, self.device_index, 'output',
+                                                      stream_callback=self._callback, start=False)
+        # The ring holds device frames, write() converts into it
+        self.converter = FormatConverter(config, self.device_config)
+        self.ring = RingBuffer(ring_capacity(self.device_config, self.ring_ms))
+        self.frame_bytes = self.device_config.frame_bytes
+        self.prefill = 2 * self.device_config.chunk_bytes
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        if status & self.paOutputUnderflow:
+            self.device_underruns += 1
+        size = frame_count * self.frame_bytes
+        data = self.ring.read(size)
+        self.space.set()
+        if len(data) < size:
+            self.underruns += 1
+            data += bytes(size - len(data))
+        return (data, self.paContinue)
+
+    def write(self, data):
+        # Blocks while the ring is full, which paces the caller at the device rate
+        view = memoryview(self.converter.convert(data))
+        while view:
+            written = self.ring.write(view)
+            view = view[written:]
+            if not self.started and self.ring.readable() >= self.prefill:
+                # Start playing only once there is something to play
+                self.stream.start_stream()
+                self.started = True
+            if view:
+                self.space.clear()
+                if self.ring.writable():
+                    continue
+                self.space.wait(1.0)
+
+    def close(self):
+        if self.stream:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+        if self.owns_pa and self.pa:
+            self.pa.terminate()
+            self.pa = None
+
+    def describe(self):
+        return describe_device(self.device_index, self.device_config, self.config) + " (callback)"
+
+    def stats(self):
+        return {"underruns": self.underruns, "device_underruns": self.device_underruns}
+
+
+def create_pyaudio_source(device_index, pa=None, audio_io="blocking"):
+    if audio_io == "callback":
+        return CallbackPyAudioSource(device_index, pa)
+    return PyAudioSource(device_index, pa)
+
+
+def create_pyaudio_sink(device_index, pa=None, audio_io="blocking"):
+    if audio_io == "callback":
+        return CallbackPyAudioSink(device_index, pa)
+    return PyAudioSink(device_index, pa)
+
+
+class ToneSource(AudioSource):
+    # Synthetic sine wave, handy for testing without any audio hardware
+    def __init__(self, frequency=440.0, amplitude=0.3, realtime=True):
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self.realtime = realtime
+        self.buffer = b''
+        self.position = 0
+        self.frame_bytes = 0
+        self.pacer = None
+
+    def open(self, config):
+        # One second of audio, an integer frequency loops over it without clicks
+        step = 2 * np.pi * self.frequency / config.rate
+        tone = (self.amplitude * np.sin(step * np.arange(config.rate))).astype(np.float32)
+        self.buffer = from_float(np.repeat(tone[:, None], config.channels, axis=1), config)
+        self.frame_bytes = config.frame_bytes
+        self.position = 0
+        self.pacer = Pacer(config.rate) if self.realtime else None
+
+    def read(self, frames):
+        if self.pacer:
+            self.pacer.wait(frames)
+        size = frames * self.frame_bytes
+        end = self.position + size
+        if end <= len(self.buffer):
+            data = self.buffer[self.position:end]
+        else:
+            data = self.buffer[self.position:] + self.buffer[:end - len(self.buffer)]
+        self.position = end % len(self.buffer)
+        return data
+
+    def describe(self):
+        return f"tone {self.frequency:g} Hz"
+
+
+class WavFileSource(AudioSource):
+    def __init__(self, path, loop=False, realtime=True):
+        self.path = path
+        self.loop = loop
+        self.realtime = realtime
+        self.wav = None
+        self.pacer = None
+
+    def open(self, config):
+        self.wav = wave.open(self.path, 'rb')
+        # The file dictates the stream format
+        config.rate = self.wav.getframerate()
+        config.channels = self.wav.getnchannels()
+        config.sample_width = self.wav.getsampwidth()
+        config.sample_float = False # The wave module only reads integer PCM
+        self.pacer = Pacer(config.rate) if self.realtime else None
+
+    def read(self, frames):
+        if self.pacer:
+            self.pacer.wait(frames)
+        data = self.wav.readframes(frames)
+        if not data and self.loop:
+            self.wav.rewind()
+            data = self.wav.readframes(frames)
+        return data
+
+    def close(self):
+        if self.wav:
+            self.wav.close()
+            self.wav = None
+
+    def describe(self):
+        return self.path
+
+
+def wav_format(config):
+    # The wave module only writes integer PCM, float streams are stored as int32
+    return config.copy(sample_float=False)
+
+
+class WavFileSink(AudioSink):
+    def __init__(self, path):
+        self.path = path
+        self.wav = None
+        self.converter = None
+
+    def open(self, config):
+        file_config = wav_format(config)
+        self.converter = FormatConverter(config, file_config)
+        self.wav = wave.open(self.path, 'wb')
+        self.wav.setnchannels(file_config.channels)
+        self.wav.setsampwidth(file_config.sample_width)
+        self.wav.setframerate(file_config.rate)
+
+    def write(self, data):
+        self.wav.writeframesraw(self.converter.convert(data))
+
+    def close(self):
+        if self.wav:
+            self.wav.close()
+            self.wav = None
+
+    def describe(self):
+        return self.path
+
+
+class NullSink(AudioSink):
+    # Discards audio, counts what went through
+    def __init__(self):
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+
+    def describe(self):
+        return "null"
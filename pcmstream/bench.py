@@ -0,0 +1,219 @@
+import argparse
+import itertools
+import json
+import platform
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from .audio import AudioSource, AudioSink, Pacer
+from .config import StreamConfig
+from .engine import StreamEngine
+from .codec import CODECS
+from .transport import TRANSPORTS
+
+# Loopback benchmark: a sender and a receiver engine in this process, talking
+# over 127.0.0.1 with a synthetic source and a discarding sink, so no audio
+# hardware is involved. Every MARKER_INTERVAL the source ends a chunk with a
+# short full scale pulse and notes when it handed that chunk over; the sink
+# spots the pulse and notes when it would have been played. The difference is
+# the end-to-end latency, network, buffering, codec and resampling included.
+#
+#   python -m pcmstream.bench --output before.json
+#   python -m pcmstream.bench --output after.json --compare before.json
+
+MARKER_INTERVAL = 0.5 # Seconds between pulses, latencies above this are ambiguous
+MARKER_FRAMES = 32
+MARKER_LEVEL = 20000
+DETECT_LEVEL = 8000
+
+
+class MarkerSource(AudioSource):
+    # Silence, with a pulse at the end of a chunk every MARKER_INTERVAL
+    def __init__(self):
+        self.emitted = deque(maxlen=64)
+        self.pacer = None
+        self.frames_until_marker = 0
+        self.rate = 0
+        self.channels = 0
+
+    def open(self, config):
+        if config.sample_width != 2:
+            raise ValueError("MarkerSource only generates 16 bit samples")
+        self.rate = config.rate
+        self.channels = config.channels
+        self.pacer = Pacer(config.rate)
+        self.frames_until_marker = int(MARKER_INTERVAL * config.rate)
+
+    def read(self, frames):
+        self.pacer.wait(frames)
+        self.frames_until_marker -= frames
+        if self.frames_until_marker > 0:
+            return bytes(frames * self.channels * 2)
+        self.frames_until_marker += int(MARKER_INTERVAL * self.rate)
+        pulse = min(MARKER_FRAMES, frames)
+        samples = np.zeros((frames, self.channels), dtype='<i2')
+        samples[-pulse:] = MARKER_LEVEL
+        # The chunk is "captured" now, its pulse starts pulse frames before
+        self.emitted.append(time.perf_counter() - pulse / self.rate)
+        return samples.tobytes()
+
+    def describe(self):
+        return "markers"
+
+
+class MarkerSink(AudioSink):
+    # Discards audio, timing every pulse it finds against the source's log
+    def __init__(self, source):
+        self.source = source
+        self.latencies = []
+        self.rate = 0
+        self.channels = 0
+        self.quiet = True
+
+    def open(self, config):
+        self.rate = config.rate
+        self.channels = config.channels
+
+    def write(self, data):
+        now = time.perf_counter()
+        # First channel only, a pulse starts where it gets loud after quiet
+        loud = np.abs(np.frombuffer(data, dtype='<i2')[::self.channels].astype(np.int32)) > DETECT_LEVEL
+        if not len(loud):
+            return
+        before = np.concatenate(([not self.quiet], loud[:-1]))
+        for frame in np.flatnonzero(loud & ~before):
+            self._matched(now + frame / self.rate)
+        self.quiet = not loud[-1]
+
+    def _matched(self, played):
+        emitted = self.source.emitted
+        match = None
+        while emitted and emitted[0] <= played:
+            match = emitted.popleft()
+        if match is not None:
+            self.latencies.append((played - match) * 1000)
+
+    def describe(self):
+        return "markers"
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return round(ordered[index], 2)
+
+
+def run_case(chunk, rate, transport, codec, seconds, port, jitter_ms):
+    config = StreamConfig(rate=rate, chunk=chunk, transport=transport, codec=codec, jitter_ms=jitter_ms)
+    logs = []
+
+    def keep(message, level='info'):
+        if level != 'info':
+            logs.append(message)
+
+    receiver = StreamEngine(config.copy(mode="receiver"), on_log=keep)
+    sender = StreamEngine(config.copy(mode="sender"), on_log=keep)
+    source = MarkerSource()
+    sink = MarkerSink(source)
+
+    receiver.start_receiver(sink, "127.0.0.1", port)
+    time.sleep(0.2)
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    sender.start_sender(source, "127.0.0.1", port)
+    time.sleep(seconds)
+    # Read the receiver's counters before its playout session is torn down
+    snapshot = receiver.metrics.snapshot()
+    sent = sender.metrics.snapshot()
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    sender.stop()
+    sender.wait(5)
+    receiver.stop()
+    receiver.wait(5)
+
+    # The first pulses land while the jitter buffer is still filling
+    latencies = sink.latencies[2:]
+    return {
+        "chunk": chunk,
+        "rate": rate,
+        "transport": transport,
+        "codec": codec,
+        "seconds": round(wall, 2),
+        "frames_per_s": round(snapshot["frames"] / wall, 1),
+        "realtime_factor": round(snapshot["frames"] / wall / rate, 3),
+        "wire_kbit_s": round(sent["wire_bytes"] * 8 / wall / 1000, 1),
+        "cpu_percent": round(cpu / wall * 100, 1),
+        "latency_p50_ms": percentile(latencies, 0.5),
+        "latency_p99_ms": percentile(latencies, 0.99),
+        "markers": len(latencies),
+        "underruns": snapshot.get("jitter_underruns", 0),
+        "lost": snapshot.get("jitter_lost", 0),
+        "errors": logs,
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    key = lambda case: (case["chunk"], case["rate"], case["transport"], case["codec"])
+    before = {key(case): case for case in baseline["results"]}
+    print(f"\nAgainst {baseline_path} ({baseline.get('version', '?')}):")
+    for case in results:
+        old = before.get(key(case))
+        if not old:
+            continue
+        changes = []
+        for metric in ("cpu_percent", "latency_p50_ms", "latency_p99_ms"):
+            if case[metric] is not None and old[metric] is not None:
+                changes.append(f"{metric} {old[metric]} -> {case[metric]} ({case[metric] - old[metric]:+.1f})")
+        print(f"  {case['transport']:<9} {case['codec']:<8} {case['rate']:>6} Hz {case['chunk']:>5}: " + ", ".join(changes))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pcmstream.bench", description="Loopback benchmark of the streaming pipeline")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[128, 256, 1024])
+    parser.add_argument("--rates", type=int, nargs="+", default=[44100, 48000])
+    parser.add_argument("--transports", nargs="+", choices=[t for t in TRANSPORTS if t != "multicast"], default=["tcp", "udp"])
+    parser.add_argument("--codecs", nargs="+", choices=CODECS, default=["none"])
+    parser.add_argument("--seconds", type=float, default=5, help="Length of every case")
+    parser.add_argument("--jitter-ms", type=int, default=60)
+    parser.add_argument("--port", type=int, default=50400, help="First port, every case uses the next one")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of an earlier run to compare against")
+    parser.add_argument("--version", default="", help="Label stored with the results, e.g. a git commit")
+    args = parser.parse_args(argv)
+
+    cases = list(itertools.product(args.transports, args.codecs, args.rates, args.chunks))
+    results = []
+    print(f"{'transport':<9} {'codec':<8} {'rate':>6} {'chunk':>5} {'cpu %':>6} {'p50 ms':>7} {'p99 ms':>7} {'rt x':>6} {'under':>5} {'lost':>5}")
+    for port, (transport, codec, rate, chunk) in enumerate(cases, args.port):
+        case = run_case(chunk, rate, transport, codec, args.seconds, port, args.jitter_ms)
+        results.append(case)
+        print(f"{transport:<9} {codec:<8} {rate:>6} {chunk:>5} {case['cpu_percent']:>6} {case['latency_p50_ms']!s:>7} "
+              f"{case['latency_p99_ms']!s:>7} {case['realtime_factor']:>6} {case['underruns']:>5} {case['lost']:>5}")
+        for error in case["errors"]:
+            print(f"    {error}")
+
+    report = {
+        "version": args.version,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
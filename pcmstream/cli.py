@@ -0,0 +1,386 @@
+import argparse
+import logging
+import os
+import threading
+import time
+
+from .adaptive import starting_chunk
+from .config import (
+    StreamConfig, LOW_LATENCY_CHUNK, DEFAULT_CHUNK, DEFAULT_JITTER_MS, MAX_JITTER_MS, DEFAULT_LATENCY_TARGET_MS,
+    DEFAULT_RECORD_MAX_MB, DEFAULT_DTX_THRESHOLD_DB
+)
+from .codec import CODEC_CHOICES
+from .conceal import CONCEAL_MODES
+from .devices import enumerate_devices, find_device
+from .dsp import BAND_TYPES, DspChain, DspSink, DspSource
+from .engine import StreamEngine
+from .formats import SAMPLE_FORMATS, SAMPLE_RATES, MAX_CHANNELS, parse_sample_format
+from .settings import load_settings, update_settings
+from .transport import TRANSPORTS
+from . import audio
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="socketPCM",
+        description="Stream PCM audio between computers. Without --headless the GUI is started."
+    )
+    parser.add_argument("--headless", action="store_true", help="Run without the GUI (never imports tkinter)")
+    parser.add_argument("--mode", choices=["sender", "receiver"], default="receiver")
+    parser.add_argument("--ip", default="", help="Receiver address to connect to (comma separated host[:port] list to send to several), or address to listen on")
+    parser.add_argument("--port", type=int, default=65432)
+    parser.add_argument("--rate", type=int, default=44100,
+                        help=f"Sample rate in Hz, {SAMPLE_RATES[0]} to {SAMPLE_RATES[-1]}")
+    parser.add_argument("--format", choices=SAMPLE_FORMATS, default="int16",
+                        help="Sample format the sender streams (and a --mix server plays), receivers follow the sender")
+    parser.add_argument("--channels", type=int, choices=range(1, MAX_CHANNELS + 1), default=2, metavar="1-8",
+                        help="Channels the sender streams. A device with other channels is up or downmixed to it, "
+                             "and a receiver's device with fewer channels gets a downmix")
+    parser.add_argument("--chunk", type=int, default=None, help="Frames per chunk")
+    parser.add_argument("--low-latency", action="store_true", help=f"Shortcut for --chunk {LOW_LATENCY_CHUNK}")
+    parser.add_argument("--latency", choices=["fixed", "auto"], default="fixed",
+                        help="Sender: auto grows or shrinks the chunk at runtime, from over/underruns on both ends. "
+                             "It starts at --chunk, or where the last auto session settled (last_settings.json)")
+    parser.add_argument("--latency-target-ms", type=int, default=DEFAULT_LATENCY_TARGET_MS,
+                        help="What auto latency aims for; it never shrinks the chunk below that, it does grow past it to stop glitches")
+    parser.add_argument("--jitter-ms", type=int, default=DEFAULT_JITTER_MS,
+                        help="Receiver jitter buffer target in ms, 0 disables buffering")
+    parser.add_argument("--jitter-max-ms", type=int, default=MAX_JITTER_MS,
+                        help="Receiver jitter buffer upper bound in ms")
+    parser.add_argument("--transport", choices=TRANSPORTS, default="tcp",
+                        help="tcp: reliable stream. udp: sequenced datagrams, losses are concealed. "
+                             "multicast: udp to the group given in --ip, for any number of receivers")
+    parser.add_argument("--multicast-ttl", type=int, default=1,
+                        help="Router hops a multicast stream may cross, 1 stays on the local network")
+    parser.add_argument("--multicast-interface", default="",
+                        help="Local address of the interface to send or join multicast on, default lets the OS pick")
+    parser.add_argument("--no-drift-compensation", dest="drift_compensation", action="store_false",
+                        help="Receiver: don't resample to follow the sender's clock, latency may creep over long sessions")
+    parser.add_argument("--record", metavar="DIR", default="",
+                        help="Also write the audio sent or played to WAV files in DIR, on a background thread")
+    parser.add_argument("--record-max-mb", type=int, default=DEFAULT_RECORD_MAX_MB,
+                        help="Start a new recording file past this size")
+    parser.add_argument("--dtx", action="store_true",
+                        help="Sender: stop sending while the input is quiet, receivers play silence meanwhile")
+    parser.add_argument("--dtx-threshold-db", type=float, default=DEFAULT_DTX_THRESHOLD_DB,
+                        help="Level (RMS, dBFS) under which --dtx counts a chunk as quiet")
+    parser.add_argument("--volume-db", type=float, default=0.0,
+                        help="Volume change, on the input before sending or on the output before playing")
+    parser.add_argument("--eq", action="append", default=[], metavar="TYPE:FREQ[:DB[:Q]]",
+                        help=f"EQ band (repeatable), TYPE one of {', '.join(BAND_TYPES)}")
+    parser.add_argument("--limit-db", type=float, default=None,
+                        help="Look-ahead peak limiter ceiling in dBFS, e.g. -1 (delays the audio 1.5 ms)")
+    parser.add_argument("--conceal", choices=CONCEAL_MODES, default="fade",
+                        help="How lost UDP chunks are filled")
+    parser.add_argument("--codec", choices=CODEC_CHOICES, default="auto",
+                        help="Sender: codec to propose. Receiver: codec to ask for, auto takes the sender's")
+    parser.add_argument("--source", choices=["device", "wav", "tone"], default="device",
+                        help="Sender audio source")
+    parser.add_argument("--sink", choices=["device", "wav", "null"], default="device",
+                        help="Receiver audio sink")
+    parser.add_argument("--audio-io", choices=["blocking", "callback"], default="blocking",
+                        help="callback: PortAudio callbacks and ring buffers, decoupled from the network")
+    parser.add_argument("--device", default=None,
+                        help="PyAudio device index or (part of) its name, default device if omitted. "
+                             "Names stay put when indexes move around")
+    parser.add_argument("--file", help="WAV file for --source wav / --sink wav")
+    parser.add_argument("--loop", action="store_true", help="Loop the WAV source")
+    parser.add_argument("--tone-frequency", type=float, default=440.0)
+    parser.add_argument("--language", choices=["en", "es"], default="en")
+    parser.add_argument("--server", action="store_true",
+                        help="Receiver: serve any number of senders at once on one event loop")
+    parser.add_argument("--route", action="append", default=[], metavar="HOST=SINK",
+                        help="Server: play the sender at HOST on SINK (device:INDEX or device:NAME, wav:PATH or null), "
+                             "repeatable. Other senders use --sink")
+    parser.add_argument("--mix", action="store_true",
+                        help="Server: mix every sender into one output (--sink) instead of one output each")
+    parser.add_argument("--gain", action="append", default=[], metavar="HOST=DB",
+                        help="Server with --mix: gain in dB for the sender at HOST, repeatable. Default 0")
+    parser.add_argument("--sessions", metavar="FILE", default=None,
+                        help="Run every sender and receiver session defined in FILE (JSON) in this process, "
+                             "sharing one PyAudio instance and a pool of workers. The GUI lists them too")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve stream metrics in Prometheus text format on this port (GET /metrics)")
+    parser.add_argument("--metrics-host", default="",
+                        help="Address the metrics endpoint listens on, default all interfaces")
+    parser.add_argument("--metrics-interval", type=float, default=0,
+                        help="Log a JSON line with the stream metrics every this many seconds, 0 disables it")
+    return parser
+
+
+def config_from_args(args):
+    chunk = args.chunk or (LOW_LATENCY_CHUNK if args.low_latency else DEFAULT_CHUNK)
+    if args.server and args.mode == "sender":
+        raise SystemExit("--server only works with --mode receiver")
+    if not SAMPLE_RATES[0] <= args.rate <= SAMPLE_RATES[-1]:
+        raise SystemExit(f"Sample rate {args.rate} out of range, {SAMPLE_RATES[0]} to {SAMPLE_RATES[-1]} Hz")
+    sample_width, sample_float = parse_sample_format(args.format)
+    config = StreamConfig(
+        mode=args.mode,
+        ip=args.ip,
+        port=args.port,
+        rate=args.rate,
+        chunk=chunk,
+        channels=args.channels,
+        sample_width=sample_width,
+        sample_float=sample_float,
+        language=args.language,
+        jitter_ms=args.jitter_ms,
+        jitter_max_ms=args.jitter_max_ms,
+        transport=args.transport,
+        conceal=args.conceal,
+        codec=args.codec,
+        audio_io=args.audio_io,
+        multicast_ttl=args.multicast_ttl,
+        multicast_interface=args.multicast_interface,
+        drift_compensation=args.drift_compensation,
+        latency=args.latency,
+        latency_target_ms=args.latency_target_ms,
+        record_dir=args.record,
+        record_max_mb=args.record_max_mb,
+        dtx=args.dtx,
+        dtx_threshold_db=args.dtx_threshold_db
+    )
+    if config.latency == "auto" and not args.chunk:
+        config.chunk = starting_chunk(config, load_settings().get('auto_chunk'))
+    return config
+
+
+def resolve_device(spec, direction):
+    # An index as is, a name looked up among the devices PortAudio sees now
+    if spec is None or str(spec).isdigit():
+        return None if spec is None else int(spec)
+    pa = audio.load_pyaudio().PyAudio()
+    try:
+        device = find_device(enumerate_devices(pa), spec, direction)
+    finally:
+        pa.terminate()
+    if device is None:
+        raise SystemExit(f"No {direction} device matches {spec!r}")
+    return device['index']
+
+
+def build_source(args):
+    if args.source == "tone":
+        return audio.ToneSource(frequency=args.tone_frequency)
+    if args.source == "wav":
+        if not args.file:
+            raise SystemExit("--source wav needs --file")
+        return audio.WavFileSource(args.file, loop=args.loop)
+    return audio.create_pyaudio_source(resolve_device(args.device, 'input'), audio_io=args.audio_io)
+
+
+def build_sink(args):
+    if args.sink == "null":
+        return audio.NullSink()
+    if args.sink == "wav":
+        if not args.file:
+            raise SystemExit("--sink wav needs --file")
+        return audio.WavFileSink(args.file)
+    return audio.create_pyaudio_sink(resolve_device(args.device, 'output'), audio_io=args.audio_io)
+
+
+def build_dsp(args):
+    # The volume, EQ and limiter chain, None when none of them is set
+    if args.volume_db == 0 and not args.eq and args.limit_db is None:
+        return None
+    try:
+        return DspChain(args.volume_db, args.limit_db, args.eq)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+
+def with_dsp(endpoint, args):
+    # Every stream gets a chain of its own, it keeps the filter state
+    chain = build_dsp(args)
+    if chain is None:
+        return endpoint
+    return DspSource(endpoint, chain) if isinstance(endpoint, audio.AudioSource) else DspSink(endpoint, chain)
+
+
+def parse_sink_spec(spec):
+    # "device:3", "device:Speakers", "device", "wav:out.wav" or "null" -> (kind, argument)
+    kind, _, value = spec.partition(':')
+    if kind == "device":
+        return kind, resolve_device(value or None, 'output')
+    if kind == "wav" and value:
+        return kind, value
+    if kind == "null" and not value:
+        return kind, None
+    raise SystemExit(f"Invalid sink {spec!r}, expected device:INDEX, device:NAME, wav:PATH or null")
+
+
+def build_sink_factory(args):
+    # Server mode: picks a sink for every new sender. Devices share one
+    # PyAudio instance and always use callback I/O, so no write blocks a thread
+    # for a whole chunk.
+    routes = {}
+    for route in args.route:
+        host, sep, spec = route.partition('=')
+        if not sep:
+            raise SystemExit(f"Invalid route {route!r}, expected HOST=SINK")
+        routes[host.strip()] = parse_sink_spec(spec.strip())
+    if args.sink == "wav" and not args.file:
+        raise SystemExit("--sink wav needs --file")
+    default = (args.sink, resolve_device(args.device, 'output') if args.sink == "device" else args.file)
+    shared = {}
+    build_dsp(args) # A wrong EQ band fails now, not with the first sender
+
+    def sink_for(peer):
+        return with_dsp(build_peer_sink(peer), args)
+
+    def build_peer_sink(peer):
+        host, port = peer[0], peer[1]
+        kind, value = routes.get(host, default)
+        if kind == "null":
+            return audio.NullSink()
+        if kind == "wav":
+            if "{peer}" in value:
+                return audio.WavFileSink(value.replace("{peer}", f"{host}_{port}"))
+            if (kind, value) == default:
+                # Senders sharing the default file each get their own
+                root, ext = os.path.splitext(value)
+                return audio.WavFileSink(f"{root}-{host}_{port}{ext}")
+            return audio.WavFileSink(value)
+        if "pa" not in shared:
+            shared["pa"] = audio.load_pyaudio().PyAudio()
+        return audio.CallbackPyAudioSink(value, shared["pa"])
+
+    return sink_for
+
+
+def build_mixer(args, config):
+    # Server mode with --mix: one output for everybody, opened once
+    from .mixer import Mixer
+    if args.route:
+        raise SystemExit("--route and --mix can't be used together")
+    gains = {}
+    for spec in args.gain:
+        host, sep, db = spec.partition('=')
+        try:
+            gains[host.strip()] = 10 ** (float(db) / 20)
+        except ValueError:
+            sep = None
+        if not sep:
+            raise SystemExit(f"Invalid gain {spec!r}, expected HOST=DB")
+    if args.sink == "device":
+        sink = audio.CallbackPyAudioSink(resolve_device(args.device, 'output'), audio.load_pyaudio().PyAudio())
+    else:
+        sink = build_sink(args)
+    return Mixer(config, with_dsp(sink, args), gains)
+
+
+def start_metrics(args, metrics_source, strings, logger):
+    # Returns a function that stops whatever was started
+    from .metrics import MetricsReporter, MetricsServer
+    done = threading.Event()
+    http = None
+    if args.metrics_port:
+        http = MetricsServer(metrics_source, args.metrics_host, args.metrics_port)
+        http.start()
+        logger.info(f"{strings['metrics_endpoint']}http://{args.metrics_host or '0.0.0.0'}:{args.metrics_port}/metrics")
+    if args.metrics_interval > 0:
+        MetricsReporter(metrics_source, args.metrics_interval, logger.info, done).start()
+
+    def stop():
+        done.set()
+        if http:
+            http.close()
+    return stop
+
+
+def run_server(args, config, logger):
+    from .logs import stop_logging
+    from .server import ReceiverServer
+    finished = threading.Event()
+    mixer = build_mixer(args, config) if args.mix else None
+    server = ReceiverServer(config, build_sink_factory(args), on_stopped=finished.set, mixer=mixer)
+    if mixer:
+        logger.info(f"{server.strings['mix_output']}{mixer.sink.describe()}")
+    stop_metrics = start_metrics(args, lambda: server.metrics, server.strings, logger)
+    server.start(config.ip, config.port)
+    try:
+        while not finished.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        server.stop()
+        finished.wait(5)
+        logger.info(server.strings["streaming_stopped"])
+    stop_metrics()
+    stop_logging()
+    logging.shutdown()
+    return 0
+
+
+def run_sessions(args, logger):
+    # Every session in the file, until Ctrl+C or until none is left running
+    from .logs import stop_logging
+    from .sessions import SessionManager, load_session_file
+    try:
+        workers, sessions = load_session_file(args.sessions)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    manager = SessionManager(workers, args.language)
+    manager.load(sessions)
+    strings = manager.strings
+    logger.info(strings['sessions_loaded'].format(count=len(sessions), path=args.sessions, workers=manager.workers))
+    # The manager reports like an engine's metrics, with a session label on every stream
+    stop_metrics = start_metrics(args, lambda: manager, strings, logger)
+    manager.start_all()
+    try:
+        while manager.active():
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        logger.info(strings["streaming_stopped"])
+    manager.close()
+    stop_metrics()
+    stop_logging()
+    logging.shutdown()
+    return 0
+
+
+def run_headless(args):
+    from .logs import setup_logging, stop_logging
+    logger = setup_logging()
+
+    if args.sessions:
+        return run_sessions(args, logger)
+    config = config_from_args(args)
+    if args.server and config.mode == "receiver":
+        return run_server(args, config, logger)
+    # Waiting on an event rather than Thread.join, a Ctrl+C inside join can
+    # leave the thread looking finished while it is still cleaning up
+    finished = threading.Event()
+    engine = StreamEngine(config, on_stopped=finished.set)
+    strings = engine.strings
+    stop_metrics = start_metrics(args, lambda: engine.metrics, strings, logger)
+    if config.mode == "sender":
+        source = with_dsp(build_source(args), args)
+        logger.info(f"{strings['streaming_start_input']}{source.describe()}")
+        engine.start_sender(source, config.ip or "127.0.0.1", config.port)
+        logger.info(f"{strings['streaming_rate']}{config.rate} Hz, CHUNK = {config.chunk}")
+    else:
+        # The receiver plays whatever the sender negotiates, the engine logs
+        # that format once the handshake is done
+        sink = with_dsp(build_sink(args), args)
+        logger.info(f"{strings['streaming_start_output']}{sink.describe()}")
+        engine.start_receiver(sink, config.ip, config.port)
+    if config.mode == "sender" and config.latency == "auto":
+        logger.info(strings['latency_auto_on'].format(chunk=config.chunk, target=config.latency_target_ms))
+    if config.mode == "sender" and config.dtx:
+        logger.info(strings['dtx_on'].format(threshold=config.dtx_threshold_db))
+
+    try:
+        while not finished.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        engine.stop()
+        finished.wait(5)
+        logger.info(strings["streaming_stopped"])
+    if config.mode == "sender" and config.latency == "auto":
+        # The next auto session starts where this one settled
+        update_settings(auto_chunk=config.chunk)
+    stop_metrics()
+    stop_logging()
+    logging.shutdown()
+    return 0
@@ -0,0 +1,48 @@
+import numpy as np
+
+from .formats import to_float, from_float
+
+CONCEAL_MODES = ("fade", "repeat", "silence")
+
+# How many chunks in a row "repeat" fills before falling back to silence,
+# repeating longer than that just turns into a buzz
+MAX_REPEATS = 3
+
+
+class Concealer:
+    # Fills chunks that never arrived: repeat the last one, or repeat it fading
+    # out and fade the next real chunk back in, or plain silence
+    def __init__(self, config, mode="fade"):
+        self.mode = mode if mode in CONCEAL_MODES else "fade"
+        self.config = config
+        # 8 bit audio is unsigned, its silence is 128
+        self.silence = from_float(np.zeros((config.chunk, config.channels), dtype=np.float32), config)
+        self.last = None
+        self.losses = 0
+        frames = config.chunk
+        self.fade_out = np.linspace(1.0, 0.0, frames, dtype=np.float32)[:, None]
+        self.fade_in = self.fade_out[::-1]
+        self.concealed = 0
+
+    def played(self, chunk):
+        # Called with every chunk that actually arrived, returns what to play
+        if self.losses and self.mode == "fade" and len(chunk) == len(self.silence):
+            chunk = self._scale(chunk, self.fade_in)
+        self.last = chunk
+        self.losses = 0
+        return chunk
+
+    def conceal(self):
+        self.losses += 1
+        self.concealed += 1
+        if self.last is None or self.mode == "silence":
+            return self.silence
+        if self.mode == "repeat":
+            return self.last if self.losses <= MAX_REPEATS else self.silence
+        # fade: the first lost chunk fades the last one out, then silence
+        if self.losses == 1 and len(self.last) == len(self.silence):
+            return self._scale(self.last, self.fade_out)
+        return self.silence
+
+    def _scale(self, chunk, ramp):
+        return from_float(to_float(chunk, self.config) * ramp, self.config)
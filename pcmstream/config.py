@@ -0,0 +1,60 @@
+LOW_LATENCY_CHUNK = 128 #In case of instability, set to 256 or 512
+DEFAULT_CHUNK = 1024 # The default 1024 chunk size should be more stable
+DEFAULT_JITTER_MS = 60 # Receiver buffer target, 0 plays packets as soon as they arrive
+MAX_JITTER_MS = 500
+DEFAULT_LATENCY_TARGET_MS = 40 # What "auto" latency aims for, capture to playout
+DEFAULT_RECORD_MAX_MB = 512 # Recordings move on to a new file past this, WAV can't go over 4 GB
+DEFAULT_DTX_THRESHOLD_DB = -60 # Chunk level (RMS, dB below full scale) under which DTX counts it as quiet
+
+
+class StreamConfig:
+    # Everything a sender or receiver needs to know about one stream
+    def __init__(self, mode="sender", ip="", port=65432, rate=44100, chunk=DEFAULT_CHUNK,
+                 channels=2, sample_width=2, sample_float=False, language="en", jitter_ms=DEFAULT_JITTER_MS,
+                 jitter_max_ms=MAX_JITTER_MS, transport="tcp", conceal="fade",
+                 codec="auto", audio_io="blocking", multicast_ttl=1, multicast_interface="",
+                 drift_compensation=True, latency="fixed", latency_target_ms=DEFAULT_LATENCY_TARGET_MS,
+                 record_dir="", record_max_mb=DEFAULT_RECORD_MAX_MB, dtx=False,
+                 dtx_threshold_db=DEFAULT_DTX_THRESHOLD_DB):
+        self.mode = mode
+        self.ip = ip
+        self.port = port
+        self.rate = rate
+        self.chunk = chunk
+        self.channels = channels
+        self.sample_width = sample_width
+        self.sample_float = sample_float # 4 byte float samples instead of int32, see formats.py
+        self.language = language
+        self.jitter_ms = jitter_ms
+        self.jitter_max_ms = jitter_max_ms
+        self.transport = transport # "tcp", "udp" or "multicast"
+        self.conceal = conceal # How lost UDP chunks are filled: "fade", "repeat" or "silence"
+        self.codec = codec # "auto", "none", "adpcm" or "lossless", see codec.py
+        self.audio_io = audio_io # "blocking" read/write, or "callback" with ring buffers
+        self.multicast_ttl = multicast_ttl # 1 keeps the stream inside the local network
+        self.multicast_interface = multicast_interface # Local address of the interface to use, "" lets the OS pick
+        self.drift_compensation = drift_compensation # Receiver: resample slightly to hold the buffer at its target
+        self.latency = latency # "fixed" keeps the chunk, "auto" lets the sender resize it, see adaptive.py
+        self.latency_target_ms = latency_target_ms
+        self.record_dir = record_dir # Also write the stream to WAV files in this directory, "" doesn't
+        self.record_max_mb = record_max_mb # Size at which the recording moves on to a new file
+        self.dtx = dtx # Sender: stop sending while the input is quiet, see dtx.py
+        self.dtx_threshold_db = dtx_threshold_db
+
+    @property
+    def frame_bytes(self):
+        return self.channels * self.sample_width
+
+    @property
+    def chunk_bytes(self):
+        return self.chunk * self.frame_bytes
+
+    @property
+    def chunk_seconds(self):
+        return self.chunk / self.rate
+
+    def copy(self, **changes):
+        config = StreamConfig()
+        config.__dict__.update(self.__dict__)
+        config.__dict__.update(changes)
+        return config
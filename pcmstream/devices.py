@@ -0,0 +1,71 @@
+from .settings import load_settings, save_settings
+
+# Audio device lists. Asking PortAudio about every device can take seconds on
+# machines with many WASAPI or ALSA endpoints, so the GUI shows the list saved
+# by the last run right away and refreshes it in the background. Devices are
+# told apart by name: indexes shift whenever something is plugged in or the
+# machine reboots.
+
+DEVICE_CACHE_FILE = 'device_cache.json'
+
+
+def enumerate_devices(pa):
+    # One pass over PortAudio's devices, both directions at once
+    host_apis = {}
+    devices = []
+    for index in range(pa.get_device_count()):
+        info = pa.get_device_info_by_index(index)
+        api = info.get('hostApi', 0)
+        if api not in host_apis:
+            try:
+                host_apis[api] = pa.get_host_api_info_by_index(api)['name']
+            except Exception:
+                host_apis[api] = ""
+        devices.append({
+            "index": index,
+            "name": info['name'],
+            "host_api": host_apis[api],
+            "inputs": int(info['maxInputChannels']),
+            "outputs": int(info['maxOutputChannels']),
+        })
+    return devices
+
+
+def device_labels(devices, direction):
+    # What the device selectors show, "index: name"
+    key = "inputs" if direction == 'input' else "outputs"
+    return [f"{device['index']}: {device['name']}" for device in devices if device[key] > 0]
+
+
+def label_name(label):
+    index, sep, name = label.partition(': ')
+    return name if sep and index.isdigit() else label
+
+
+def find_device(devices, spec, direction):
+    # The device for a saved label ("3: Speakers"), a bare name or an index,
+    # None when there is no such device now. By name first: the same name at
+    # the same index wins when several devices share it.
+    key = "inputs" if direction == 'input' else "outputs"
+    candidates = [device for device in devices if device[key] > 0]
+    spec = str(spec).strip()
+    if spec.isdigit():
+        return next((device for device in candidates if device['index'] == int(spec)), None)
+    name = label_name(spec)
+    named = [device for device in candidates if device['name'] == name]
+    if not named:
+        # Headless --device takes any part of the name
+        named = [device for device in candidates if name.lower() in device['name'].lower()]
+    saved_index = spec.partition(': ')[0]
+    for device in named:
+        if str(device['index']) == saved_index:
+            return device
+    return named[0] if named else None
+
+
+def load_cached_devices(path=DEVICE_CACHE_FILE):
+    return load_settings(path).get('devices', [])
+
+
+def save_cached_devices(devices, path=DEVICE_CACHE_FILE):
+    save_settings({"devices": devices}, path)
@@ -0,0 +1,93 @@
+import numpy as np
+
+from .formats import to_float, from_float
+
+# Sender and receiver sound cards never tick at exactly the same rate, a few
+# tens of ppm apart is normal. Left alone the jitter buffer slowly fills up
+# (latency creeps up) or drains (periodic underruns). The receiver watches the
+# buffer depth and plays chunks back very slightly faster or slower to hold it
+# at the target, which is inaudible at these ratios.
+
+MAX_CORRECTION = 0.002 # 2000 ppm, about 3.5 cents of pitch at most
+GAIN = 0.1 # Ratio change per second of depth error
+SMOOTHING_SECONDS = 2.0 # Depth is averaged this long, it jumps a chunk on every arrival
+ESTIMATE_SECONDS = 30.0 # Averaging window of the reported drift
+REPORT_SECONDS = 60.0 # How often a running session logs its drift
+
+
+class Resampler:
+    # Linear interpolation with the fractional position carried from one chunk
+    # to the next, so consecutive chunks join without clicks
+    def __init__(self, config):
+        self.config = config # Only the sample format and channels matter
+        self.previous = None # Last frame of the previous chunk
+        self.phase = 0.0 # Position of the next output frame, 0 = previous frame
+
+    def process(self, data, ratio):
+        # ratio = input frames consumed per output frame, > 1 plays faster
+        frames = to_float(data, self.config)
+        count = len(frames)
+        if not count:
+            return data
+        if self.previous is None:
+            self.previous = frames[0]
+        extended = np.concatenate((self.previous[None, :], frames))
+        outputs = int(np.ceil((count - self.phase) / ratio))
+        positions = self.phase + ratio * np.arange(outputs)
+        index = positions.astype(np.int64)
+        fraction = (positions - index).astype(np.float32)[:, None]
+        out = extended[index] * (1 - fraction) + extended[index + 1] * fraction
+        self.phase = positions[-1] + ratio - count
+        self.previous = frames[-1]
+        return from_float(out, self.config)
+
+
+class DriftCompensator:
+    # Proportional controller from smoothed buffer depth to playback ratio.
+    # Once settled the ratio is the clock drift itself, its average is what
+    # gets reported.
+    def __init__(self, config):
+        self.resampler = Resampler(config)
+        self.depth = None
+        self.ratio = 1.0
+        self.estimate = 0.0
+        self.set_chunk_seconds(config.chunk_seconds)
+        self.played_seconds = 0.0
+        self.next_report = REPORT_SECONDS
+
+    def set_chunk_seconds(self, chunk_seconds):
+        # One step per chunk, the smoothing follows the chunk length
+        self.chunk_seconds = chunk_seconds
+        self.smoothing = min(1.0, chunk_seconds / SMOOTHING_SECONDS)
+        self.estimate_smoothing = min(1.0, chunk_seconds / ESTIMATE_SECONDS)
+
+    def process(self, chunk, depth, target):
+        # depth/target in seconds, straight from the jitter buffer after get()
+        if self.depth is None:
+            self.depth = depth
+        self.depth += (depth - self.depth) * self.smoothing
+        # Right after get() the depth saws between target - 1 chunk and target,
+        # half a chunk under the target is on target
+        correction = (self.depth + self.chunk_seconds / 2 - target) * GAIN
+        self.ratio = 1.0 + max(-MAX_CORRECTION, min(MAX_CORRECTION, correction))
+        self.estimate += (self.ratio - 1.0 - self.estimate) * self.estimate_smoothing
+        self.played_seconds += self.chunk_seconds
+        return self.resampler.process(chunk, self.ratio)
+
+    def report_due(self):
+        # True about once a minute of played audio
+        if self.played_seconds < self.next_report:
+            return False
+        self.next_report += REPORT_SECONDS
+        return True
+
+    def drift_ppm(self):
+        # Positive: the sender's clock runs faster than ours
+        return self.estimate * 1e6
+
+    def stats(self):
+        return {
+            "drift_ppm": round(self.drift_ppm(), 1),
+            "ratio_ppm": round((self.ratio - 1.0) * 1e6, 1),
+            "smoothed_depth_ms": round((self.depth or 0.0) * 1000, 1),
+        }
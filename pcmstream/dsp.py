@@ -0,0 +1,495 @@
+import math
+import time
+
+import numpy as np
+
+from .audio import AudioSource, AudioSink
+
+# Processing chain for the audio itself: parametric EQ, volume and a look-ahead
+# peak limiter, between the network and the sound card on a receiver or
+# between the input and the network on a sender. Its sink and source wrap any
+# other, so every path (direct, jitter buffer, server, mix) gets it without the
+# engine knowing.
+#
+# Every chunk is read through an np.frombuffer view and processed in float32
+# buffers allocated when the stream opens, every step a NumPy call with out=,
+# so a chunk costs no allocation and no loop per sample. The biquads are
+# recursive, which NumPy can't vectorize, so the EQ runs the whole cascade as
+# one state space system a block at a time: a block's output is a matrix
+# product with its input plus one with the filter state, the same numbers a
+# loop per sample would give. The settings can change at any time from another
+# thread (the GUI): new coefficients are built there and swapped in whole, the
+# next chunk picks them up.
+
+BLOCK = 128 # Frames per EQ matrix product, longer chunks go through in blocks
+SMOOTH_MS = 20 # Time constant of volume changes
+LOOKAHEAD_MS = 1.5 # How far ahead the limiter looks, the delay it adds
+RELEASE_DB_PER_S = 60 # How fast the limiter lets go
+BAND_TYPES = ("peak", "lowshelf", "highshelf", "lowpass", "highpass")
+MAX_BANDS = 8
+DEFAULT_Q = 0.707
+LN10_20 = math.log(10) / 20
+
+
+def db_to_gain(db):
+    return 10 ** (db / 20)
+
+
+def parse_band(spec):
+    # "TYPE:FREQ[:GAIN_DB[:Q]]", a dict with the same keys from a sessions
+    # file or a band already parsed -> (type, freq, gain_db, q). ValueError
+    # when it's wrong.
+    if isinstance(spec, dict):
+        parts = [spec.get("type"), spec.get("freq"), spec.get("gain_db", 0.0), spec.get("q", DEFAULT_Q)]
+    else:
+        parts = list(spec) if isinstance(spec, (tuple, list)) else str(spec).split(':')
+        parts += [0.0, DEFAULT_Q][len(parts) - 2:] if 2 <= len(parts) <= 4 else []
+    if len(parts) != 4 or parts[0] not in BAND_TYPES:
+        raise ValueError(f"Invalid EQ band {spec!r}, expected TYPE:FREQ[:GAIN_DB[:Q]] with TYPE one of {', '.join(BAND_TYPES)}")
+    try:
+        freq, gain_db, q = float(parts[1]), float(parts[2]), float(parts[3])
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid EQ band {spec!r}, frequency, gain and Q are numbers")
+    if freq <= 0 or q <= 0:
+        raise ValueError(f"Invalid EQ band {spec!r}, frequency and Q must be above 0")
+    return parts[0], freq, gain_db, q
+
+
+def parse_bands(specs):
+    bands = tuple(parse_band(spec) for spec in specs or ())
+    if len(bands) > MAX_BANDS:
+        raise ValueError(f"At most {MAX_BANDS} EQ bands")
+    return bands
+
+
+def biquad(kind, freq, gain_db, q, rate):
+    # (b0, b1, b2, a1, a2) with a0 = 1, from the Audio EQ Cookbook
+    freq = min(freq, rate * 0.49)
+    w = 2 * math.pi * freq / rate
+    cos_w = math.cos(w)
+    alpha = math.sin(w) / (2 * q)
+    a = 10 ** (gain_db / 40)
+    if kind == "peak":
+        b = (1 + alpha * a, -2 * cos_w, 1 - alpha * a)
+        den = (1 + alpha / a, -2 * cos_w, 1 - alpha / a)
+    elif kind in ("lowshelf", "highshelf"):
+        root = 2 * math.sqrt(a) * alpha
+        sign = 1 if kind == "lowshelf" else -1
+        b = (a * ((a + 1) - sign * (a - 1) * cos_w + root),
+             sign * 2 * a * ((a - 1) - sign * (a + 1) * cos_w),
+             a * ((a + 1) - sign * (a - 1) * cos_w - root))
+        den = ((a + 1) + sign * (a - 1) * cos_w + root,
+               -sign * 2 * ((a - 1) + sign * (a + 1) * cos_w),
+               (a + 1) + sign * (a - 1) * cos_w - root)
+    elif kind == "lowpass":
+        b = ((1 - cos_w) / 2, 1 - cos_w, (1 - cos_w) / 2)
+        den = (1 + alpha, -2 * cos_w, 1 - alpha)
+    else:
+        b = ((1 + cos_w) / 2, -(1 + cos_w), (1 + cos_w) / 2)
+        den = (1 + alpha, -2 * cos_w, 1 - alpha)
+    return b[0] / den[0], b[1] / den[0], b[2] / den[0], den[1] / den[0], den[2] / den[0]
+
+
+class Equalizer:
+    # The bands for one sample rate, as one state space system (A, B, C, D)
+    # of the biquads in series (transposed direct form II, two states each)
+    def __init__(self, bands, rate):
+        self.bands = bands
+        self.order = 2 * len(bands)
+        A = np.zeros((0, 0))
+        B = np.zeros((0, 1))
+        C = np.zeros((1, 0))
+        D = np.ones((1, 1))
+        for band in bands:
+            b0, b1, b2, a1, a2 = biquad(*band, rate)
+            Ab = np.array([[-a1, 1.0], [-a2, 0.0]])
+            Bb = np.array([[b1 - a1 * b0], [b2 - a2 * b0]])
+            Cb = np.array([[1.0, 0.0]])
+            # The band takes the output of the ones before it
+            A = np.block([[A, np.zeros((len(A), 2))], [Bb @ C, Ab]])
+            B = np.vstack([B, Bb @ D])
+            C = np.hstack([b0 * C, Cb])
+            D = b0 * D
+        self.system = (A, B, C, D)
+        self.blocks = {}
+        # The block sizes built so far, replaced whole so another thread can
+        # read it while the stream adds one
+        self.sizes = ()
+
+    def block(self, frames):
+        # Matrices that run a block of this many frames at once:
+        #   out = T @ x + O @ state,  state = S @ state + X @ x
+        matrices = self.blocks.get(frames)
+        if matrices is None:
+            A, B, C, D = self.system
+            powers = [np.eye(self.order)]
+            for _ in range(frames):
+                powers.append(A @ powers[-1])
+            # Impulse response: D, then C A^(n-1) B
+            response = np.array([D[0, 0]] + [(C @ powers[n] @ B)[0, 0] for n in range(frames - 1)])
+            lag = np.subtract.outer(np.arange(frames), np.arange(frames))
+            T = np.where(lag >= 0, response[np.maximum(lag, 0)], 0.0)
+            O = np.vstack([C @ powers[n] for n in range(frames)])
+            X = np.hstack([powers[frames - 1 - k] @ B for k in range(frames)])
+            matrices = tuple(np.ascontiguousarray(m, dtype=np.float32) for m in (T, O, powers[frames], X))
+            self.blocks[frames] = matrices
+            self.sizes = self.sizes + (frames,)
+        return matrices
+
+
+class DspChain:
+    # EQ, volume and limiter for one stream. open() is called from the
+    # stream's thread whenever it (re)opens, process() for every chunk, the
+    # set_ functions from anywhere.
+    def __init__(self, volume_db=0.0, limit_db=None, bands=()):
+        self.config = None
+        self.bands = ()
+        self.capacity = 0
+        self.gain = 1.0
+        self.eq = None
+        self.eq_active = None
+        self.limiting = False
+        self.reduction_db = 0.0
+        self.chunks = 0
+        self.busy = 0.0
+        self.busy_max = 0.0
+        self.set_volume(volume_db)
+        self.set_limit(limit_db)
+        self.set_bands(bands)
+
+    def set_volume(self, db):
+        self.volume_db = float(db)
+        self.target = db_to_gain(self.volume_db)
+
+    def set_limit(self, db):
+        # Ceiling in dBFS, None turns the limiter off
+        self.limit_db = None if db is None else min(float(db), 0.0)
+        self.ceiling = None if db is None else db_to_gain(self.limit_db)
+
+    def set_bands(self, bands):
+        bands = parse_bands(bands)
+        if bands != self.bands:
+            self.bands = bands
+            self._build_eq()
+
+    def _build_eq(self):
+        config = self.config
+        if config is None or not self.bands:
+            self.eq = None
+            return
+        current = self.eq
+        eq = Equalizer(self.bands, config.rate)
+        # The block sizes in use are ready before the stream sees it
+        for frames in (current.sizes if current else (min(BLOCK, config.chunk),)):
+            eq.block(frames)
+        self.eq = eq
+
+    @property
+    def flat(self):
+        # Nothing set, the audio goes through as it is
+        return self.volume_db == 0 and not self.bands and self.limit_db is None
+
+    @property
+    def bypassed(self):
+        return self.eq is None and self.ceiling is None and self.gain == self.target == 1.0
+
+    def open(self, config):
+        self.config = config
+        self.channels = config.channels
+        self.frame_bytes = config.frame_bytes
+        self.width = config.sample_width
+        self.float = config.sample_float
+        self.scale = float(1 << (8 * self.width - 1))
+        self.smooth_frames = SMOOTH_MS * config.rate / 1000
+        self.lookahead = max(1, round(LOOKAHEAD_MS * config.rate / 1000))
+        self.release = RELEASE_DB_PER_S / config.rate
+        self.gain = self.target
+        self.eq_active = None
+        self.limiting = False
+        self.reduction_db = 0.0
+        self.chunks = 0
+        self.busy = 0.0
+        self.busy_max = 0.0
+        self.capacity = 0
+        self._allocate(config.chunk)
+        self._build_eq()
+
+    def _allocate(self, frames):
+        # Everything process() writes to, for chunks of up to this many frames
+        channels = self.channels
+        look = self.lookahead
+        self.capacity = frames
+        self.work = np.zeros((frames, channels), dtype=np.float32)
+        self.wide = np.zeros((frames, channels), dtype=np.float64)
+        self.ints = np.zeros((frames, channels), dtype='<i4')
+        self.padded = np.zeros((frames * channels, 4), dtype=np.uint8)
+        self.out = bytearray(frames * self.frame_bytes)
+        # Read-only like the receive buffer, PyAudio's blocking write only takes those
+        self.out_view = memoryview(self.out).toreadonly()
+        self.out_bytes = np.frombuffer(self.out, dtype=np.uint8)
+        self.out_samples = None if self.width == 3 else np.frombuffer(
+            self.out, dtype='<f4' if self.float else f'<i{self.width}').reshape(frames, channels)
+        self.steps = np.arange(1, frames + 1, dtype=np.float32)
+        self.ramp = np.zeros(frames, dtype=np.float32)
+        # Limiter: the delay line and peak history carry over from chunk to chunk
+        history = (self.delay, self.peaks, self.attenuation) if self.limiting else None
+        self.delay = np.zeros((look + frames, channels), dtype=np.float32)
+        self.peaks = np.zeros(look + frames, dtype=np.float32)
+        self.attenuation = np.zeros(look + frames, dtype=np.float32)
+        if history:
+            for new, old in zip((self.delay, self.peaks, self.attenuation), history):
+                new[:look] = old[:look]
+        self.magnitude = np.zeros((frames, channels), dtype=np.float32)
+        self.window = np.zeros(frames, dtype=np.float32)
+        self.spans = (np.zeros(look + frames, dtype=np.float32), np.zeros(look + frames, dtype=np.float32))
+        self.curve = np.zeros(frames, dtype=np.float32)
+        self.sums = np.zeros(look + frames + 1, dtype=np.float32)
+        self.gains = np.zeros(frames, dtype=np.float32)
+
+    def process(self, data):
+        # The processed chunk as a view of the chain's own buffer, valid until
+        # the next call. data itself is never written to.
+        if self.bypassed:
+            return data
+        started = time.perf_counter()
+        frames = len(data) // self.frame_bytes
+        if frames > self.capacity:
+            self._allocate(frames)
+        work = self.work[:frames]
+        self._load(data, frames, work)
+        eq = self.eq
+        if eq is not None:
+            self._equalize(eq, work)
+        self._volume(work)
+        # The GUI can turn the limiter off while this chunk is being processed
+        ceiling = self.ceiling
+        if ceiling is not None:
+            self._limit(work, ceiling)
+        else:
+            self.limiting = False
+        self._store(frames, work)
+        elapsed = time.perf_counter() - started
+        self.chunks += 1
+        self.busy += elapsed
+        self.busy_max = max(self.busy_max, elapsed)
+        return self.out_view[:frames * self.frame_bytes]
+
+    def _load(self, data, frames, work):
+        count = frames * self.channels
+        if self.float:
+            np.copyto(work, np.frombuffer(data, dtype='<f4', count=count).reshape(frames, self.channels))
+        elif self.width == 3:
+            # Each 3 byte sample into the top of an int32, which keeps the sign
+            padded = self.padded[:count]
+            padded[:, 1:] = np.frombuffer(data, dtype=np.uint8, count=count * 3).reshape(count, 3)
+            np.copyto(work, padded.view('<i4').reshape(frames, self.channels), casting='unsafe')
+            work *= 1 / 2 ** 31
+        else:
+            samples = np.frombuffer(data, dtype=f'<i{self.width}', count=count).reshape(frames, self.channels)
+            # Converting and scaling in one ufunc call would buffer the cast
+            np.copyto(work, samples, casting='unsafe')
+            work *= 1 / self.scale
+
+    def _store(self, frames, work):
+        if self.float:
+            np.copyto(self.out_samples[:frames], work)
+            return
+        # Saturating at full scale, in float64 since float32 can't hold 2 ** 31 - 1
+        wide = self.wide[:frames]
+        np.copyto(wide, work)
+        wide *= self.scale
+        np.rint(wide, out=wide)
+        np.clip(wide, -self.scale, self.scale - 1, out=wide)
+        if self.width == 3:
+            ints = self.ints[:frames]
+            np.copyto(ints, wide, casting='unsafe')
+            count = frames * self.channels
+            np.copyto(self.out_bytes[:count * 3].reshape(count, 3), ints.reshape(-1).view(np.uint8).reshape(count, 4)[:, :3])
+        else:
+            np.copyto(self.out_samples[:frames], wide, casting='unsafe')
+
+    def _equalize(self, eq, work):
+        if eq is not self.eq_active:
+            # New settings keep the filter state when the bands only moved,
+            # more or fewer bands start from silence
+            if self.eq_active is None or eq.order != self.eq_active.order:
+                self.state = np.zeros((eq.order, self.channels), dtype=np.float32)
+                self.next_state = np.zeros_like(self.state)
+                self.state_part = np.zeros_like(self.state)
+                self.eq_out = np.zeros((BLOCK, self.channels), dtype=np.float32)
+                self.eq_part = np.zeros_like(self.eq_out)
+            self.eq_active = eq
+        for start in range(0, len(work), BLOCK):
+            x = work[start:start + BLOCK]
+            frames = len(x)
+            T, O, S, X = eq.block(frames)
+            y = self.eq_out[:frames]
+            part = self.eq_part[:frames]
+            np.matmul(T, x, out=y)
+            np.matmul(O, self.state, out=part)
+            y += part
+            np.matmul(S, self.state, out=self.next_state)
+            np.matmul(X, x, out=self.state_part)
+            self.next_state += self.state_part
+            self.state, self.next_state = self.next_state, self.state
+            np.copyto(x, y)
+
+    def _volume(self, work):
+        # Ramps towards the target over the chunk instead of jumping, a jump
+        # in the middle of a waveform is a click
+        gain, target = self.gain, self.target
+        if gain != target:
+            frames = len(work)
+            end = target + (gain - target) * math.exp(-frames / self.smooth_frames)
+            if abs(end - target) < 1e-4:
+                end = target
+            ramp = self.ramp[:frames]
+            np.multiply(self.steps[:frames], (end - gain) / frames, out=ramp)
+            ramp += gain
+            work *= ramp[:, None]
+            self.gain = end
+        elif gain != 1.0:
+            work *= gain
+
+    def _limit(self, work, ceiling):
+        # The output is the input delayed by the lookahead, so the gain can
+        # come down before a peak gets out: every frame gets the attenuation
+        # (dB) the loudest frame within the lookahead needs, which then
+        # falls back at the release rate and is averaged over the lookahead so
+        # it ramps instead of stepping. The average never ends up below what a
+        # peak needs, every frame before it already asked for as much.
+        frames = len(work)
+        look = self.lookahead
+        if not self.limiting:
+            self.delay[:look] = 0
+            self.peaks[:look] = 0
+            self.attenuation[:look] = 0
+            self.limiting = True
+        delay = self.delay
+        peaks = self.peaks
+        np.copyto(delay[look:look + frames], work)
+        magnitude = self.magnitude[:frames]
+        np.abs(work, out=magnitude)
+        np.max(magnitude, axis=1, out=peaks[look:look + frames])
+        window = self.window[:frames]
+        self._window_max(peaks[:look + frames], look + 1, window)
+        np.maximum(window, ceiling, out=window)
+        np.log10(window, out=window)
+        window *= 20
+        window -= 20 * math.log10(ceiling)
+        # Release: a[n] = max(need[n], a[n - 1] - release) is a running maximum
+        # of need[n] + release * n, shifted back down
+        attenuation = self.attenuation
+        curve = self.curve[:frames]
+        np.multiply(self.steps[:frames], self.release, out=curve)
+        curve += window
+        curve[0] = max(curve[0], attenuation[look - 1])
+        np.maximum.accumulate(curve, out=curve)
+        new = attenuation[look:look + frames]
+        np.multiply(self.steps[:frames], -self.release, out=new)
+        new += curve
+        # Average over the lookahead, from a running sum
+        sums = self.sums[:look + frames + 1]
+        np.cumsum(attenuation[:look + frames], out=sums[1:])
+        gains = self.gains[:frames]
+        np.subtract(sums[look + 1:], sums[1:frames + 1], out=gains)
+        gains *= -LN10_20 / look
+        np.exp(gains, out=gains)
+        np.multiply(delay[:frames], gains[:, None], out=work)
+        self.reduction_db = float(20 * math.log10(max(gains[-1], 1e-9))) if frames else 0.0
+        # What the next chunk needs of this one
+        delay[:look] = delay[frames:frames + look]
+        peaks[:look] = peaks[frames:frames + look]
+        attenuation[:look] = attenuation[frames:frames + look]
+
+    def _window_max(self, values, width, out):
+        # out[i] = max(values[i:i + width]): maxima over spans that double
+        # every step, then two overlapping spans cover each window
+        count = len(values)
+        current, other = self.spans
+        np.copyto(current[:count], values)
+        span = 1
+        while span * 2 <= width:
+            np.maximum(current[:count - span], current[span:count], out=other[:count - span])
+            current, other = other, current
+            count -= span
+            span *= 2
+        frames = len(out)
+        np.maximum(current[:frames], current[width - span:width - span + frames], out=out)
+
+    def stats(self):
+        return {
+            "dsp_chunks": self.chunks,
+            "dsp_avg_us": round(self.busy / self.chunks * 1e6, 1) if self.chunks else 0,
+            "dsp_max_us": round(self.busy_max * 1e6, 1),
+            "dsp_limit_db": round(self.reduction_db, 2) if self.limiting else 0.0,
+        }
+
+    def describe(self):
+        parts = [f"volume {self.volume_db:+g} dB"]
+        parts += [f"{kind} {freq:g} Hz {gain_db:+g} dB Q {q:g}" for kind, freq, gain_db, q in self.bands]
+        if self.limit_db is not None:
+            parts.append(f"limiter {self.limit_db:g} dBFS")
+        return ", ".join(parts)
+
+
+class DspSource(AudioSource):
+    # A sender's input through the chain. The engine may keep a chunk queued
+    # for the network thread, so it gets a copy of the chain's buffer.
+    def __init__(self, source, chain):
+        self.source = source
+        self.chain = chain
+
+    def open(self, config):
+        # A file source decides the format, the chain follows it
+        self.source.open(config)
+        self.chain.open(config)
+
+    def read(self, frames):
+        data = self.source.read(frames)
+        if not data:
+            return data
+        data = self.chain.process(data)
+        return data if isinstance(data, bytes) else bytes(data)
+
+    def close(self):
+        self.source.close()
+
+    def describe(self):
+        if self.chain.flat:
+            return self.source.describe()
+        return f"{self.source.describe()} [{self.chain.describe()}]"
+
+    def stats(self):
+        if not self.chain.chunks:
+            return self.source.stats()
+        return dict(self.source.stats(), **self.chain.stats())
+
+
+class DspSink(AudioSink):
+    # A receiver's output through the chain. Sinks are done with a chunk
+    # when write() returns, so they get the chain's buffer itself.
+    def __init__(self, sink, chain):
+        self.sink = sink
+        self.chain = chain
+        self.clocked = sink.clocked
+
+    def open(self, config):
+        self.sink.open(config)
+        self.chain.open(config)
+
+    def write(self, data):
+        self.sink.write(self.chain.process(data))
+
+    def close(self):
+        self.sink.close()
+
+    def describe(self):
+        if self.chain.flat:
+            return self.sink.describe()
+        return f"{self.sink.describe()} [{self.chain.describe()}]"
+
+    def stats(self):
+        if not self.chain.chunks:
+            return self.sink.stats()
+        return dict(self.sink.stats(), **self.chain.stats())
@@ -0,0 +1,67 @@
+import time
+
+import numpy as np
+
+from .formats import to_float
+
+# Discontinuous transmission: while the input stays quiet the sender stops
+# sending audio. It sends a SILENCE marker when it goes quiet and repeats it
+# once a second, so receivers know the gap is silence and not loss, and UDP
+# receivers know the sender is still there. The receiver plays silence on its
+# own and picks the stream up again with the next audio chunk.
+
+HANGOVER_SECONDS = 0.3 # Audio keeps going this long after the last loud chunk, so tails aren't cut
+MARKER_SECONDS = 1.0 # SILENCE repeats while quiet
+
+
+class SilenceGate:
+    def __init__(self, config):
+        self.config = config
+        # Compared against the mean square of full scale samples, no square root per chunk
+        self.threshold = (10 ** (config.dtx_threshold_db / 20)) ** 2
+        self.hangover = 0.0 # Seconds of audio still to send after the last loud chunk
+        self.quiet = False
+        self.next_marker = 0.0
+        self.sent_chunks = 0
+        self.silent_chunks = 0
+        self.pauses = 0
+
+    def loud(self, data):
+        samples = to_float(data, self.config).reshape(-1)
+        if not len(samples):
+            return False
+        return float(np.dot(samples, samples)) > self.threshold * len(samples)
+
+    def send(self, data):
+        # True when the chunk should go out. Counts chunk time in seconds, so a
+        # chunk size change doesn't change the hangover.
+        if self.loud(data):
+            self.hangover = HANGOVER_SECONDS
+        elif self.hangover > 0:
+            self.hangover -= self.config.chunk_seconds
+        else:
+            if not self.quiet:
+                self.quiet = True
+                self.pauses += 1
+                self.next_marker = 0.0
+            self.silent_chunks += 1
+            return False
+        self.quiet = False
+        self.sent_chunks += 1
+        return True
+
+    def marker_due(self):
+        # Only asked while quiet: the first quiet chunk, then once a second
+        now = time.monotonic()
+        if now < self.next_marker:
+            return False
+        self.next_marker = now + MARKER_SECONDS
+        return True
+
+    def stats(self):
+        return {
+            "quiet": self.quiet,
+            "sent_chunks": self.sent_chunks,
+            "silent_chunks": self.silent_chunks,
+            "pauses": self.pauses,
+        }
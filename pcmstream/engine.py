@@ -0,0 +1,700 @@
+import socket
+import threading
+import logging
+import traceback
+import errno
+import struct
+import time
+
+from .adaptive import LatencyController
+from .audio import Pacer
+from .codec import create_codec
+from .conceal import Concealer
+from .drift import DriftCompensator
+from .dtx import SilenceGate
+from .formats import sample_format
+from .jitter import JitterBuffer, MISSING
+from .logs import RateLimiter
+from .metrics import StreamMetrics
+from .record import Recorder
+from .protocol import (
+    unpack_header, timestamp_us, parse_hello, parse_rechunk, pack_report, receiver_handshake, describe_format,
+    FrameReader, FrameAligner, ProtocolError, HEADER_SIZE, MSG_AUDIO, MSG_HELLO, MSG_SILENCE, REPORT_INTERVAL
+)
+from .strings import LANGUAGE_STRINGS
+from .transport import (
+    create_sender, parse_targets, format_targets, join_multicast, multicast_bind_address, socket_profile, tune_socket,
+    Backoff, Reconnector
+)
+
+UDP_SESSION_TIMEOUT = 3 # Seconds without datagrams before a UDP session is over
+CONNECTION_TIMEOUT = 3 # Seconds without data before a TCP sender counts as gone (DTX still sends every second)
+BIND_TIMEOUT = 30 # Seconds to keep retrying an address in use
+
+
+def output_format(config):
+    return (config.rate, config.channels, sample_format(config))
+
+
+class StreamEngine:
+    # Capture/send and receive/play loops, with no knowledge of any UI.
+    # on_log(message, level) and on_stopped() let a front end follow along.
+    def __init__(self, config, on_log=None, on_stopped=None):
+        self.config = config
+        self.on_log = on_log
+        self.on_stopped = on_stopped
+        self.strings = LANGUAGE_STRINGS.get(config.language, LANGUAGE_STRINGS["en"])
+        self.logger = logging.getLogger(__name__)
+
+        # Streaming control
+        self.is_streaming = False
+        self.stream_thread = None
+        self.stream_socket = None
+        self.connection = None
+        self.transport = None
+        # Receiver: the output and the playout session outlive a connection,
+        # so a sender that reconnects finds them ready
+        self.output_format = None
+        self.playout = None
+        self.stop_event = threading.Event()
+        self.metrics = StreamMetrics(config.mode)
+        self.limiter = RateLimiter()
+
+    def log_message(self, message, level='info', key=None):
+        # Messages that can repeat per chunk or per packet pass a key and get
+        # rate limited, so a broken link can't flood the disk or the UI
+        if key is not None:
+            suppressed = self.limiter.allow(key)
+            if suppressed is None:
+                return
+            if suppressed:
+                message += self.strings['log_suppressed'].format(count=suppressed)
+        if self.on_log:
+            self.on_log(message, level)
+        elif level == 'error':
+            self.logger.error(message)
+        elif level == 'warning':
+            self.logger.warning(message)
+        else:
+            self.logger.info(message)
+
+    def start_sender(self, source, ip, port):
+        return self._start_thread(self.run_sender, source, ip, port)
+
+    def start_receiver(self, sink, ip, port):
+        return self._start_thread(self.run_receiver, sink, ip, port)
+
+    def _start_thread(self, target, *args):
+        self.is_streaming = True
+        self.stop_event.clear()
+        self.stream_thread = threading.Thread(target=target, args=args, daemon=True)
+        self.stream_thread.start()
+        return self.stream_thread
+
+    def stop(self):
+        self.is_streaming = False
+        self.stop_event.set()
+
+        # Shutting the sockets down unblocks accept/recv/sendall in the worker
+        for sock in (self.connection, self.stream_socket):
+            self._close_socket(sock, shutdown=True)
+        if self.transport:
+            self.transport.interrupt()
+
+    def wait(self, timeout=None):
+        if self.stream_thread:
+            self.stream_thread.join(timeout)
+            return not self.stream_thread.is_alive()
+        return True
+
+    def running(self):
+        return self.is_streaming and not self.stop_event.is_set()
+
+    def run_sender(self, source, ip, port):
+        self.is_streaming = True
+        transport = None
+        recorder = None
+        gate = None
+        source_open = False
+        try:
+            targets = parse_targets(ip, port)
+            if not targets:
+                raise ValueError(self.strings['error_ip_port'])
+            destination = format_targets(targets)
+            # The network thread's sends and queue, per receiver for a fan-out
+            stats_name = "fanout" if len(targets) > 1 else "network"
+            self.log_message(f"{self.strings['connecting_to']}{destination} ({self.config.transport.upper()})")
+
+            # Open input first, a file source decides the stream format
+            source.open(self.config)
+            source_open = True
+            self.metrics.add_provider("input", source.stats)
+
+            # Create socket, the handshake announces the format
+            transport = create_sender(self.config.transport, targets, self.log_message, self.strings)
+            self.transport = transport
+            transport.open(self.config)
+            if len(targets) > 1:
+                # Receivers come and go on their own, each link logs its connection
+                self.log_message(self.strings['fanout_streaming'].format(count=len(targets)))
+            else:
+                self.log_message(f"{self.strings['connected_to']}{destination}")
+            self.log_message(f"{self.strings['stream_format']}{describe_format(self.config)}")
+            self.log_message(f"{self.strings['socket_profile']}{socket_profile(self.config)}")
+            self.metrics.add_provider(stats_name, transport.stats)
+            encoder = create_codec(self.config.codec, self.config)
+            recorder = self.open_recorder(self.config, "sent")
+            chunk = self.config.chunk
+            frame_bytes = self.config.frame_bytes
+            metrics = self.metrics
+            seq = 0
+            reconnector = None # While the link to a single receiver is down
+            controller = None
+            if self.config.latency == "auto":
+                controller = LatencyController(self.config)
+                self.metrics.add_provider("latency", controller.stats)
+            if self.config.dtx:
+                gate = SilenceGate(self.config)
+                self.metrics.add_provider("dtx", gate.stats)
+
+            # Send audio
+            while self.running():
+                data = source.read(chunk)
+                if not data:
+                    self.log_message(self.strings['source_finished'])
+                    break
+                size = len(data)
+                if recorder:
+                    recorder.offer(data)
+                kind = MSG_AUDIO
+                if gate and not gate.send(data):
+                    # Quiet: nothing goes out but a SILENCE now and then. The
+                    # sequence numbers keep counting the chunks not sent.
+                    if not gate.marker_due():
+                        seq += 1
+                        continue
+                    kind, data = MSG_SILENCE, b''
+                    if controller:
+                        controller.pause()
+                if reconnector:
+                    if not reconnector.sender:
+                        # Still reconnecting, the input keeps being read so it
+                        # doesn't overflow and this chunk is lost with the link
+                        seq += 1
+                        continue
+                    transport = self.transport = reconnector.sender
+                    self.metrics.add_provider(stats_name, transport.stats)
+                    encoder = create_codec(self.config.codec, self.config)
+                    self.log_message(self.strings['link_resumed'].format(
+                        ms=round((time.monotonic() - reconnector.started) * 1000), attempts=reconnector.attempts))
+                    reconnector = None
+                if encoder and kind == MSG_AUDIO:
+                    data = encoder.encode(data)
+                try:
+                    transport.send(seq, timestamp_us(), data, kind)
+                except OSError as e:
+                    # Only a single receiver's link raises, a fan-out reconnects its links itself
+                    if not self.running():
+                        raise
+                    self.log_message(f"{self.strings['link_lost']}{e}", 'warning')
+                    transport.close()
+                    reconnector = Reconnector(self.config.transport, *targets[0], self.config, self.stop_event)
+                    transport = self.transport = reconnector
+                    seq += 1
+                    continue
+                if kind == MSG_AUDIO:
+                    metrics.chunk(size // frame_bytes, size, HEADER_SIZE + len(data))
+                seq += 1
+                if controller and controller.due():
+                    chunk = self._adapt_chunk(controller, source, transport, chunk)
+
+        except Exception as e:
+            if self.running():
+                self.log_message(f"{self.strings['sender_error']}{e}", 'error')
+                self.log_message(traceback.format_exc(), 'error')
+        finally:
+            self.is_streaming = False
+            self.metrics.remove_provider("latency")
+            if gate:
+                self.metrics.remove_provider("dtx")
+                self.log_message(f"{self.strings['dtx_stats']}{gate.stats()}")
+            self.close_recorder(recorder)
+            if transport:
+                try:
+                    transport.close()
+                except Exception as e:
+                    self.log_message(f"{self.strings['socket_close_error']}{e}", 'error')
+                if hasattr(transport, 'stats'):
+                    self.log_message(f"{self.strings[stats_name + '_stats']}{transport.stats()}")
+                self.transport = None
+            if source_open:
+                try:
+                    source.close()
+                except Exception as e:
+                    self.log_message(f"{self.strings['stream_close_error']}{e}", 'error')
+                self._log_audio_stats(source)
+            self._stopped()
+
+    def _adapt_chunk(self, controller, source, transport, chunk):
+        # Glitches on both ends so far: our input overflows plus what the
+        # receivers reported. Returns the chunk size to read from now on.
+        report = transport.report() or (0, 0, 0)
+        glitches = source.stats().get('overflows', 0) + report[0] + report[1]
+        new_chunk = controller.update(glitches, report[2])
+        if new_chunk is None:
+            return chunk
+        self.config.chunk = new_chunk
+        transport.reconfigure(self.config)
+        self.log_message(self.strings['latency_chunk'].format(old=chunk, new=new_chunk, latency=round(controller.latency_ms())))
+        return new_chunk
+
+    def open_recorder(self, config, prefix, **labels):
+        # Optional recording tee, None unless config.record_dir is set
+        if not config.record_dir:
+            return None
+        recorder = Recorder(config.record_dir, config, prefix, self.log_message, self.strings, config.record_max_mb)
+        recorder.start()
+        self.metrics.add_provider("record", recorder.stats, **labels)
+        return recorder
+
+    def close_recorder(self, recorder, **labels):
+        # Waits for the writer to empty its queue
+        if recorder:
+            recorder.close()
+            self.metrics.remove_provider("record", **labels)
+            self.log_message(f"{self.strings['record_stats']}{recorder.stats()}")
+
+    def run_receiver(self, sink, ip, port):
+        if self.config.transport in ("udp", "multicast"):
+            return self.run_udp_receiver(sink, ip, port)
+
+        self.is_streaming = True
+        sock = None
+        player = None
+        try:
+            self.log_message(f"{self.strings['listening_on']}{ip}:{port} (TCP)")
+
+            # Create socket
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            # Before listen, so accepted connections start with the larger window
+            tune_socket(sock, self.config, stream=True, send=False)
+            self.stream_socket = sock  # Store for potential stopping
+            self._bind(sock, ip, port)
+            sock.listen(1)
+
+            self.log_message(self.strings["waiting_for_connection"])
+            while self.running():
+                try:
+                    conn, addr = sock.accept()
+                except Exception as e:
+                    if self.running():
+                        self.log_message(f"{self.strings['accept_connection_error']}{e}", 'error')
+                    break
+                if player and player.is_alive():
+                    # One sender at a time: a new connection means it reconnected
+                    # while the old one still looks open to us, drop that one
+                    self.log_message(self.strings['connection_replaced'])
+                    self._drop_connection()
+                    player.join()
+                self.connection = conn
+                self.log_message(f"{self.strings['connection_from']}{addr}")
+                player = threading.Thread(target=self._play_connection, args=(conn, sink), daemon=True)
+                player.start()
+
+        except Exception as e:
+            if self.running():
+                self.log_message(f"{self.strings['receiver_error']}{e}", 'error')
+                self.log_message(traceback.format_exc(), 'error')
+        finally:
+            self.is_streaming = False
+            self._close_socket(sock, shutdown=True)
+            if player:
+                self._drop_connection()
+                player.join()
+            self._close_playout()
+            self._close_output(sink)
+            self._stopped()
+
+    def run_udp_receiver(self, sink, ip, port):
+        # No connections with UDP: a session starts with the first HELLO and
+        # ends after UDP_SESSION_TIMEOUT seconds without any.
+        # With multicast, ip is the group to join.
+        self.is_streaming = True
+        sock = None
+        session = None
+        multicast = self.config.transport == "multicast"
+        try:
+            self.log_message(f"{self.strings['listening_on']}{ip}:{port} ({self.config.transport.upper()})")
+
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            # Several receivers on one machine may join the same group and port
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            tune_socket(sock, self.config, stream=False, send=False)
+            self.stream_socket = sock
+            if multicast:
+                self._bind(sock, multicast_bind_address(ip), port)
+                join_multicast(sock, ip, self.config.multicast_interface)
+                self.log_message(self.strings['multicast_joined'].format(group=ip, interface=self.config.multicast_interface or "default"))
+            else:
+                self._bind(sock, ip, port)
+            sock.settimeout(0.5)
+
+            self.log_message(self.strings["waiting_for_connection"])
+            last_packet = 0.0
+            announced = None  # (address, HELLO payload) of the stream being played
+            decoder = None
+            next_report = float('inf')
+            frame_bytes = self.config.frame_bytes
+            # Every datagram lands in the same buffer, only audio headed for the
+            # jitter buffer gets copied out
+            buffer = bytearray(65536)
+            view = memoryview(buffer)
+            while self.running():
+                try:
+                    size, addr = sock.recvfrom_into(buffer)
+                except socket.timeout:
+                    if session and time.monotonic() - last_packet > UDP_SESSION_TIMEOUT:
+                        self.log_message(self.strings['session_timeout'].format(addr=session.addr, seconds=UDP_SESSION_TIMEOUT))
+                        session.close()
+                        session = None
+                        announced = None
+                    continue
+
+                if size < HEADER_SIZE:
+                    continue
+                try:
+                    kind, seq, timestamp, length = unpack_header(view)
+                except (ProtocolError, struct.error):
+                    continue  # Not ours, or truncated
+                payload = view[HEADER_SIZE:min(size, HEADER_SIZE + length)]
+                if len(payload) != length:
+                    continue
+                if session is not None and addr != session.addr:
+                    continue  # One sender at a time
+
+                if kind == MSG_HELLO:
+                    if announced == (addr, payload):
+                        continue
+                    if session is not None:
+                        try:
+                            # Auto latency on the sender: same stream, new chunk size
+                            session.set_chunk(parse_rechunk(payload, session.config))
+                            announced = (addr, bytes(payload))
+                            continue
+                        except (ProtocolError, ValueError):
+                            pass
+                    # New sender, or the sender changed format: (re)start playout
+                    try:
+                        session_config = parse_hello(payload, self.config, negotiate=False)
+                        decoder = create_codec(session_config.codec, session_config)
+                    except (ProtocolError, ValueError) as e:
+                        self.log_message(f"{self.strings['handshake_error']}{addr}: {e}", 'error', key=('handshake', addr))
+                        continue
+                    if session:
+                        session.close()
+                    self.log_message(f"{self.strings['connection_from']}{addr}")
+                    self.log_message(f"{self.strings['stream_format']}{describe_format(session_config)}")
+                    self._open_output(sink, session_config)
+                    session = PlayoutSession(self, sink, addr, session_config)
+                    announced = (addr, bytes(payload))
+                    frame_bytes = session_config.frame_bytes
+                    # Nobody to report to over multicast, the sender's socket only hears the group
+                    next_report = float('inf') if multicast or session_config.latency != "auto" else 0.0
+                    last_packet = time.monotonic()
+                    continue
+                if kind == MSG_SILENCE and session is not None:
+                    # The sender is quiet, not gone
+                    last_packet = time.monotonic()
+                    session.buffer.silence(seq)
+                    continue
+                if kind != MSG_AUDIO or session is None:
+                    continue  # Audio before HELLO: format unknown yet
+                if session.done.is_set():
+                    # Playout died, the error has been logged already
+                    break
+                last_packet = time.monotonic()
+                if decoder:
+                    try:
+                        payload = decoder.decode(payload)
+                    except Exception as e:
+                        # Corrupt datagram, concealed like a lost one
+                        self.log_message(f"{self.strings['corrupt_packet'].format(addr=addr)}{e}", 'warning', key=('corrupt', addr))
+                        continue
+                else:
+                    # Whole frames only, a datagram can't carry a frame over to the next
+                    payload = bytes(payload[:length - length % frame_bytes])
+                session.put(payload, seq, timestamp, size)
+                if last_packet >= next_report:
+                    next_report = last_packet + REPORT_INTERVAL
+                    sock.sendto(pack_report(*session.report()), addr)
+
+        except Exception as e:
+            if self.running():
+                self.log_message(f"{self.strings['receiver_error']}{e}", 'error')
+                self.log_message(traceback.format_exc(), 'error')
+        finally:
+            self.is_streaming = False
+            if session:
+                session.close()
+            self._close_output(sink)
+            self._close_socket(sock)
+            self._stopped()
+
+    def _bind(self, sock, ip, port):
+        # Retried for a while, fast: the previous instance may just be letting go of it
+        backoff = Backoff()
+        backoff.next()
+        give_up = time.monotonic() + BIND_TIMEOUT
+        while True:
+            try:
+                sock.bind((ip, port))
+                return
+            except OSError as e:
+                if e.errno != errno.EADDRINUSE or time.monotonic() >= give_up or not self.running():
+                    raise
+                delay = backoff.next()
+                self.log_message(self.strings['address_in_use'].format(ip=ip, port=port, delay=delay), 'warning', key=('bind', port))
+                self.stop_event.wait(delay)
+
+    def _play_connection(self, conn, sink):
+        try:
+            # The sender announces its format, the output is opened to match
+            try:
+                session_config = receiver_handshake(conn, self.config)
+            except (ProtocolError, OSError, struct.error) as e:
+                self.log_message(f"{self.strings['handshake_error']}{e}", 'error')
+                return
+            self.log_message(f"{self.strings['stream_format']}{describe_format(session_config)}")
+            # A sender that just vanished never closes the connection
+            conn.settimeout(CONNECTION_TIMEOUT)
+            # REPORTs go back right away, whatever the OS carried over from the listening socket
+            tune_socket(conn, session_config, stream=True, send=False)
+
+            decoder = create_codec(session_config.codec, session_config)
+            if session_config.jitter_ms > 0:
+                self._receive_buffered(conn, sink, session_config, decoder)
+            else:
+                self._open_output(sink, session_config)
+                self._receive_direct(conn, sink, session_config, decoder)
+        finally:
+            self._close_socket(conn)
+
+    def _drop_connection(self):
+        # Only shut down: the playing thread sees the end of the stream, and closes it
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _open_output(self, sink, config):
+        # Opens the sink, or keeps it open from the last session when the format
+        # is the same: no device reopen when a sender comes back
+        if output_format(config) == self.output_format:
+            return
+        self._close_output(sink)
+        sink.open(config)
+        self.output_format = output_format(config)
+        self.metrics.add_provider("output", sink.stats)
+
+    def _close_output(self, sink):
+        if self.output_format is None:
+            return
+        self.output_format = None
+        self.metrics.remove_provider("output")
+        try:
+            sink.close()
+        except Exception as e:
+            self.log_message(f"{self.strings['stream_close_error']}{e}", 'error')
+        self._log_audio_stats(sink)
+
+    def _playout_session(self, sink, config):
+        # The last connection's session kept playing silence since it dropped.
+        # A sender that comes back with the same format takes it over.
+        session = self.playout
+        if session and not session.done.is_set() and output_format(session.config) == output_format(config):
+            session.resume(config.chunk)
+            return session
+        self._close_playout()
+        self._open_output(sink, config)
+        self.playout = PlayoutSession(self, sink, None, config)
+        return self.playout
+
+    def _close_playout(self):
+        if self.playout:
+            self.playout.close()
+            self.playout = None
+
+    def _receive_direct(self, conn, sink, config, decoder):
+        # Receive and play audio as soon as each frame is complete
+        # The payload is a view into the reader's buffer, handed to the sink
+        # without a copy
+        reader = FrameReader(conn)
+        frame_bytes = config.frame_bytes
+        aligner = FrameAligner(frame_bytes)
+        metrics = self.metrics
+        next_report = 0.0 if config.latency == "auto" else float('inf')
+        recorder = self.open_recorder(config, "received")
+        while self.running():
+            try:
+                message = reader.read()
+                if message is None:
+                    break
+                kind, seq, timestamp, payload = message
+                if kind == MSG_AUDIO:
+                    data = aligner.align(decoder.decode(payload) if decoder else payload)
+                    metrics.chunk(len(data) // frame_bytes, len(data), HEADER_SIZE + len(payload))
+                    metrics.arrival(timestamp, 0.0)
+                    sink.write(data)
+                    if recorder:
+                        recorder.offer(data)
+                elif kind == MSG_HELLO:
+                    # Frames of any size play as they come, just keep track
+                    config.chunk = parse_rechunk(payload, config)
+                    self.log_message(self.strings['chunk_changed'].format(chunk=config.chunk), key='chunk_changed')
+                now = time.monotonic()
+                if now >= next_report:
+                    next_report = now + REPORT_INTERVAL
+                    conn.sendall(pack_report(0, sink.stats().get('underruns', 0), 0))
+            except Exception as e:
+                if self.running():
+                    self.log_message(f"{self.strings['audio_receive_error']}{e}", 'error')
+                break
+        self.close_recorder(recorder)
+
+    def _receive_buffered(self, conn, sink, config, decoder):
+        # The network side fills the jitter buffer, a playout thread drains it
+        # at the sink's pace
+        session = self._playout_session(sink, config)
+        reader = FrameReader(conn)
+        aligner = FrameAligner(config.frame_bytes)
+        next_report = 0.0 if config.latency == "auto" else float('inf')
+        try:
+            while self.running() and not session.done.is_set():
+                message = reader.read()
+                if message is None:
+                    break
+                kind, seq, timestamp, payload = message
+                if kind == MSG_AUDIO:
+                    # Buffered chunks outlive the reader's buffer: the one copy on this path
+                    data = aligner.align(decoder.decode(payload) if decoder else bytes(payload))
+                    session.put(data, seq, timestamp, HEADER_SIZE + len(payload))
+                elif kind == MSG_SILENCE:
+                    session.buffer.silence(seq)
+                elif kind == MSG_HELLO:
+                    session.set_chunk(parse_rechunk(payload, session.config))
+                now = time.monotonic()
+                if now >= next_report:
+                    next_report = now + REPORT_INTERVAL
+                    conn.sendall(pack_report(*session.report()))
+        except Exception as e:
+            if self.running():
+                self.log_message(f"{self.strings['audio_receive_error']}{e}", 'error')
+
+    def _close_socket(self, sock, shutdown=False):
+        if not sock:
+            return
+        try:
+            if shutdown:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass  # Listening sockets are not connected
+            sock.close()
+        except Exception as e:
+            self.log_message(f"{self.strings['socket_close_error']}{e}", 'error')
+
+    def _log_audio_stats(self, endpoint):
+        stats = endpoint.stats()
+        if stats:
+            self.log_message(f"{self.strings['audio_stats']}{endpoint.describe()}: {stats}")
+
+    def _stopped(self):
+        if self.on_stopped:
+            self.on_stopped()
+
+
+class PlayoutSession:
+    # Jitter buffer plus the thread that plays it out to a sink, for one sender.
+    # The sink is the engine's, opened before and closed after the session.
+    def __init__(self, engine, sink, addr, config):
+        self.engine = engine
+        self.config = config
+        self.sink = sink
+        self.addr = addr
+        self.buffer = JitterBuffer(self.config.chunk_seconds, self.config.jitter_ms, self.config.jitter_max_ms)
+        self.concealer = Concealer(self.config, self.config.conceal)
+        self.drift = DriftCompensator(self.config) if self.config.drift_compensation else None
+        self.done = threading.Event()
+        # What gets recorded is what gets played: concealed and resampled
+        self.recorder = engine.open_recorder(self.config, "received")
+        engine.metrics.add_provider("jitter", self.buffer.stats)
+        if self.drift:
+            engine.metrics.add_provider("drift", self.drift.stats)
+        self.thread = threading.Thread(target=self._playout, daemon=True)
+        self.thread.start()
+
+    def set_chunk(self, chunk):
+        # The sender switched chunk size mid-stream (auto latency)
+        if chunk == self.config.chunk:
+            return
+        self.config.chunk = chunk
+        self.buffer.set_chunk_seconds(self.config.chunk_seconds, self.config.jitter_ms)
+        self.concealer = Concealer(self.config, self.config.conceal)
+        if self.drift:
+            self.drift.set_chunk_seconds(self.config.chunk_seconds)
+        self.engine.log_message(self.engine.strings['chunk_changed'].format(chunk=chunk), key='chunk_changed')
+
+    def resume(self, chunk):
+        # A sender that reconnected takes the session over. Its sequence
+        # numbers went on while it was away, so the buffer starts over.
+        self.set_chunk(chunk)
+        self.buffer.clear()
+
+    def report(self):
+        # What goes back to an auto latency sender
+        return self.buffer.underruns, self.sink.stats().get('underruns', 0), self.buffer.target * 1000
+
+    def put(self, chunk, seq, timestamp, wire_bytes):
+        self.buffer.put(chunk, seq)
+        metrics = self.engine.metrics
+        metrics.chunk(len(chunk) // self.config.frame_bytes, len(chunk), wire_bytes)
+        metrics.arrival(timestamp, self.buffer.depth)
+
+    def _playout(self):
+        engine = self.engine
+        config = self.config
+        pacer = None if self.sink.clocked else Pacer(config.rate)
+        try:
+            while engine.running() and not self.done.is_set():
+                chunk = self.buffer.get()
+                if chunk is None:
+                    data = self.concealer.silence
+                elif chunk is MISSING:
+                    data = self.concealer.conceal()
+                else:
+                    data = self.concealer.played(chunk)
+                if self.drift and chunk is not None:
+                    data = self.drift.process(data, self.buffer.depth, self.buffer.target)
+                    if self.drift.report_due():
+                        engine.log_message(f"{engine.strings['drift_stats']}{self.drift.stats()}")
+                if pacer:
+                    pacer.wait(len(data) // config.frame_bytes)
+                self.sink.write(data)
+                if self.recorder:
+                    self.recorder.offer(data)
+        except Exception as e:
+            if engine.running():
+                engine.log_message(f"{engine.strings['audio_receive_error']}{e}", 'error')
+        finally:
+            self.done.set()
+
+    def close(self):
+        self.done.set()
+        self.thread.join()
+        self.engine.close_recorder(self.recorder)
+        for name in ("jitter", "drift"):
+            self.engine.metrics.remove_provider(name)
+        self.engine.log_message(f"{self.engine.strings['jitter_stats']}{self.buffer.stats()}")
+        if self.drift:
+            self.engine.log_message(f"{self.engine.strings['drift_stats']}{self.drift.stats()}")
@@ -0,0 +1,132 @@
+import numpy as np
+
+# Sample formats and the conversion stage between them. Anything that has to
+# do arithmetic on samples (concealment fades, resampling, mixing, DTX levels)
+# goes through float32 frames in [-1, 1) of shape (frames, channels), and the
+# conversions here are plain NumPy array operations, never a loop per sample.
+# Channel layouts follow the WAVE default speaker order, so a 5.1 source can
+# be folded down to stereo and stereo spread over a 5.1 output by position.
+
+SAMPLE_FORMATS = ("int16", "int24", "int32", "float32")
+FORMAT_WIDTHS = {"uint8": 1, "int16": 2, "int24": 3, "int32": 4, "float32": 4}
+SAMPLE_RATES = (8000, 16000, 22050, 32000, 44100, 48000, 88200, 96000, 176400, 192000)
+MAX_CHANNELS = 8
+
+LAYOUTS = {
+    1: ("FC",),
+    2: ("FL", "FR"),
+    3: ("FL", "FR", "FC"),
+    4: ("FL", "FR", "BL", "BR"),
+    5: ("FL", "FR", "FC", "BL", "BR"),
+    6: ("FL", "FR", "FC", "LFE", "BL", "BR"),
+    7: ("FL", "FR", "FC", "LFE", "BC", "SL", "SR"),
+    8: ("FL", "FR", "FC", "LFE", "BL", "BR", "SL", "SR"),
+}
+
+# Where a speaker goes when the output doesn't have it: the first choice
+# whose speakers the output all has, at that gain each. LFE is dropped, like
+# most downmixes do, small speakers can't play it anyway.
+FALLBACKS = {
+    "FL": ((("FC",), 0.707),),
+    "FR": ((("FC",), 0.707),),
+    "FC": ((("FL", "FR"), 0.707),),
+    "LFE": (),
+    "BL": ((("SL",), 1.0), (("FL",), 0.707), (("FC",), 0.5)),
+    "BR": ((("SR",), 1.0), (("FR",), 0.707), (("FC",), 0.5)),
+    "SL": ((("BL",), 1.0), (("FL",), 0.707), (("FC",), 0.5)),
+    "SR": ((("BR",), 1.0), (("FR",), 0.707), (("FC",), 0.5)),
+    "BC": ((("BL", "BR"), 0.707), (("SL", "SR"), 0.707), (("FL", "FR"), 0.5), (("FC",), 0.5)),
+}
+
+
+def format_name(sample_width, sample_float=False):
+    if sample_float:
+        return "float32"
+    return {1: "uint8", 2: "int16", 3: "int24", 4: "int32"}.get(sample_width, f"{sample_width * 8} bit")
+
+
+def sample_format(config):
+    return format_name(config.sample_width, config.sample_float)
+
+
+def parse_sample_format(name):
+    # (sample width, float) for a format name
+    if name not in FORMAT_WIDTHS:
+        raise ValueError(f"Unknown sample format {name}, expected one of {', '.join(SAMPLE_FORMATS)}")
+    return FORMAT_WIDTHS[name], name == "float32"
+
+
+def to_float(data, config):
+    # PCM bytes in the config's format to float32 frames
+    width = config.sample_width
+    if config.sample_float:
+        samples = np.frombuffer(data, dtype='<f4')
+    elif width == 3:
+        # Each 3 byte sample goes into the top of an int32, which keeps the sign
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+        padded = np.zeros((len(raw), 4), dtype=np.uint8)
+        padded[:, 1:] = raw
+        samples = padded.view('<i4').astype(np.float32) * (1 / 2 ** 31)
+    elif width == 1:
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128.0) * (1 / 128.0)
+    else:
+        samples = np.frombuffer(data, dtype=f'<i{width}').astype(np.float32) * (1 / 2 ** (8 * width - 1))
+    return samples.reshape(-1, config.channels)
+
+
+def from_float(block, config):
+    # Float frames back to PCM bytes, saturating at full scale
+    width = config.sample_width
+    if config.sample_float:
+        return np.ascontiguousarray(block, dtype='<f4').tobytes()
+    if width == 1:
+        return np.clip(np.rint(block * 128.0 + 128.0), 0, 255).astype(np.uint8).tobytes()
+    scale = float(1 << (8 * width - 1))
+    if width == 4:
+        # float32 can't hold 2 ** 31 - 1, the clip needs float64
+        block = block.astype(np.float64)
+    samples = np.clip(np.rint(block * scale), -scale, scale - 1)
+    if width == 3:
+        return samples.astype('<i4').view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    return samples.astype(f'<i{width}').tobytes()
+
+
+def channel_matrix(in_channels, out_channels):
+    # (in, out) gains routing every input speaker to the output, None when
+    # the layouts are the same
+    if in_channels == out_channels:
+        return None
+    inputs = LAYOUTS[in_channels]
+    outputs = LAYOUTS[out_channels]
+    matrix = np.zeros((in_channels, out_channels), dtype=np.float32)
+    for row, speaker in enumerate(inputs):
+        if speaker in outputs:
+            matrix[row, outputs.index(speaker)] = 1.0
+        elif in_channels == 1:
+            # Mono on both sides of a layout without a centre, at full level
+            matrix[row, outputs.index("FL")] = matrix[row, outputs.index("FR")] = 1.0
+        else:
+            for targets, gain in FALLBACKS[speaker]:
+                if all(target in outputs for target in targets):
+                    for target in targets:
+                        matrix[row, outputs.index(target)] = gain
+                    break
+    return matrix
+
+
+class FormatConverter:
+    # Converts chunks from one format and channel count to another: sources
+    # and sinks use it when a device can't be opened in the stream's format
+    def __init__(self, source, target):
+        self.source = source
+        self.target = target
+        self.matrix = channel_matrix(source.channels, target.channels)
+        self.identity = self.matrix is None and sample_format(source) == sample_format(target)
+
+    def convert(self, data):
+        if self.identity:
+            return data
+        samples = to_float(data, self.source)
+        if self.matrix is not None:
+            samples = samples @ self.matrix
+        return from_float(samples, self.target)
@@ -0,0 +1,813 @@
+import tkinter as tk
+from tkinter import messagebox, ttk, scrolledtext
+import socket
+import traceback
+import os
+import queue
+import threading
+import time
+
+from . import audio
+from .codec import CODEC_CHOICES
+from .adaptive import starting_chunk
+from .config import StreamConfig, LOW_LATENCY_CHUNK, DEFAULT_CHUNK, DEFAULT_JITTER_MS, DEFAULT_LATENCY_TARGET_MS
+from .devices import device_labels, find_device, load_cached_devices, save_cached_devices
+from .dsp import DspChain
+from .formats import SAMPLE_FORMATS, SAMPLE_RATES, MAX_CHANNELS, parse_sample_format
+from .logs import setup_logging
+from .sessions import SessionManager, Session, load_session_file, DEFAULT_WORKERS
+from .settings import load_settings, save_settings
+from .strings import LANGUAGE_STRINGS
+from .transport import TRANSPORTS
+
+LOG_DRAIN_MS = 100 # How often the Tk thread picks up queued log lines
+LOG_BATCH = 200 # Most lines inserted per drain, the rest waits for the next one
+MAX_LOG_LINES = 1000 # Older lines are dropped from the log widget
+SESSION_CHANGED = object() # Queued as (SESSION_CHANGED, name) when a session starts or ends
+DEVICES = object() # Queued as (DEVICES, devices) when a device refresh is done
+DEVICE_REFRESH_SECONDS = 5 # Opening a device list refreshes it when it is older than this
+LATENCY_MODES = ("auto", "low", "normal")
+GUI_SESSION = "gui" # The form's own stream, in the session list like the others
+SESSION_REFRESH_MS = 1000 # How often the session list updates its figures
+TONE_BANDS = (("bass", "lowshelf", 120.0, 0.707), ("mid", "peak", 1000.0, 0.9), ("treble", "highshelf", 6000.0, 0.707))
+GUI_LIMIT_DB = -1.0 # Ceiling of the limiter checkbox
+
+def get_local_ip():
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(("8.8.8.8", 80))
+            local_ip = s.getsockname()[0]
+            return local_ip
+    except OSError as e:
+        return "127.0.0.1"
+
+
+class AudioStreamer:
+    def __init__(self, master, sessions_file=None):
+        self.master = master
+        master.title("SocketPCM")
+        master.geometry("500x930")
+
+        # Logging setup
+        self.setup_logging()
+
+        # Audio Configuration
+        self.CHUNK = DEFAULT_CHUNK
+        self.CHANNELS = 2
+        self.RATE = 44100
+
+        # Network Configuration
+        self.HOST = ''
+        self.PORT = 65432
+
+        # Streaming control
+        self.is_streaming = False
+
+        # Worker threads never touch Tk, they queue log lines and events here
+        self.ui_queue = queue.SimpleQueue()
+
+        # Load last settings
+        self.last_settings = self.load_last_settings()
+
+        # Every stream is a session of the manager: the form's own one and the
+        # ones from a --sessions file. The manager's PyAudio instance is created
+        # by the first device refresh or the first stream, whichever comes
+        # first. The window doesn't wait for it: the device lists start from the
+        # ones saved by the last run.
+        workers, sessions, sessions_error = DEFAULT_WORKERS, [], None
+        if sessions_file:
+            try:
+                workers, sessions = load_session_file(sessions_file)
+            except ValueError as e:
+                sessions_error = str(e)
+        self.manager = SessionManager(workers, self.last_settings.get('language', 'en'),
+                                      on_log=self.log_message, on_change=self.on_session_change)
+        self.manager.load(sessions)
+        self.session_traffic = {} # name -> (time, wire bytes) at the last list update
+        # Volume, tone and limiter of the form's stream, the controls change it while it plays
+        self.dsp = DspChain()
+        self.devices = load_cached_devices()
+        self.refreshing = False
+        self.devices_refreshed = 0.0
+
+        try:
+            if os.path.exists("tinchopcm.ico"):
+                self.master.iconbitmap("tinchopcm.ico") #Icon is not showing properly, could be a tkinter limitation.
+            else:
+                print("Icon file not found.")
+        except tk.TclError as e:
+            print(f"Error setting icon: {e}")
+
+        # Language Configuration
+        self.language_strings = LANGUAGE_STRINGS
+        self.current_language = self.last_settings.get('language', 'en')
+
+        # Create UI Components
+        self.create_ui()
+        self.set_language(self.current_language)
+        self.set_dropdown_values()
+        self.refresh_devices()
+        if sessions_error:
+            self.log_message(sessions_error, 'error')
+        elif sessions_file:
+            self.log_message(self.language_strings[self.current_language]['sessions_loaded'].format(
+                count=len(sessions), path=sessions_file, workers=self.manager.workers))
+            self.manager.start_all()
+
+        # Bind window close event to stop_streaming
+        self.master.protocol("WM_DELETE_WINDOW", self.on_window_close)
+        self.master.after(LOG_DRAIN_MS, self.drain_ui_queue)
+        self.master.after(SESSION_REFRESH_MS, self.refresh_session_list)
+
+    def setup_logging(self):
+        self.logger = setup_logging()
+
+    def create_ui(self):
+        # Language Selection
+        self.lang_var = tk.StringVar(value=self.current_language)
+        lang_frame = tk.Frame(self.master)
+        lang_frame.pack(side=tk.TOP, anchor=tk.NE, padx=5, pady=5)
+        lang_dropdown = ttk.Combobox(
+            lang_frame,
+            textvariable=self.lang_var,
+            values=["en", "es"],
+            width=3,
+            state="readonly"
+        )
+        lang_dropdown.pack(side=tk.RIGHT)
+        lang_dropdown.bind("<<ComboboxSelected>>", self.on_language_change)
+
+        # Mode Selection
+        self.mode_label = tk.Label(self.master, text=self.language_strings[self.current_language]["mode_label"], font=("Arial", 12))
+        self.mode_label.pack(pady=10)
+        self.mode_var = tk.StringVar(value="sender")
+        modes = [(self.language_strings[self.current_language]["sender"], "sender"), (self.language_strings[self.current_language]["receiver"], "receiver")]
+        mode_frame = tk.Frame(self.master)
+        mode_frame.pack()
+        for text, mode in modes:
+            tk.Radiobutton(
+                mode_frame, 
+                text=text, 
+                variable=self.mode_var, 
+                value=mode,
+                command=self.update_device_selectors
+            ).pack(side=tk.LEFT, padx=10)
+
+        # Input Device Selection
+        self.input_label = tk.Label(self.master, text=self.language_strings[self.current_language]["input_label"], font=("Arial", 12))
+        self.input_label.pack(pady=5)
+        self.input_device_var = tk.StringVar()
+        self.input_dropdown = ttk.Combobox(
+            self.master, 
+            textvariable=self.input_device_var, 
+            values=device_labels(self.devices, 'input'),
+            postcommand=self.on_device_list_open,
+            width=40
+        )
+        self.input_dropdown.pack(pady=5)
+        self.input_dropdown.set(self.language_strings[self.current_language]["select_input"])
+        if self.last_settings and self.last_settings.get('input_device'):
+            self.input_device_var.set(self.last_settings['input_device'])
+
+        # Output Device Selection
+        self.output_label = tk.Label(self.master, text=self.language_strings[self.current_language]["output_label"], font=("Arial", 12))
+        self.output_label.pack(pady=5)
+        self.output_device_var = tk.StringVar()
+        self.output_dropdown = ttk.Combobox(
+            self.master, 
+            textvariable=self.output_device_var, 
+            values=device_labels(self.devices, 'output'),
+            postcommand=self.on_device_list_open,
+            width=40
+        )
+        self.output_dropdown.pack(pady=5)
+        self.output_dropdown.set(self.language_strings[self.current_language]["select_output"])
+        if self.last_settings and self.last_settings.get('output_device'):
+            self.output_device_var.set(self.last_settings['output_device'])
+
+
+        # IP Address Entry
+        self.ip_label = tk.Label(self.master, text=self.language_strings[self.current_language]["ip_label"], font=("Arial", 12))
+        self.ip_label.pack(pady=10)
+        self.ip_var = tk.StringVar(value=self.last_settings.get('ip') or get_local_ip()) # Use last IP or local IP
+        ip_entry = tk.Entry(self.master, textvariable=self.ip_var, width=36)
+        ip_entry.pack(pady=5)
+
+        # Port Entry (added)
+        self.port_label = tk.Label(self.master, text=self.language_strings[self.current_language]["port_label"], font=("Arial", 12))
+        self.port_label.pack(pady=5)
+        self.port_var = tk.StringVar(value=str(self.PORT))
+        port_entry = tk.Entry(self.master, textvariable=self.port_var, width=10)
+        port_entry.pack(pady=5)
+
+        # Sample Rate, format and channels the sender streams, receivers follow the sender
+        self.sample_rate_label = tk.Label(self.master, text=self.language_strings[self.current_language]["sample_rate_label"], font=("Arial", 12))
+        self.sample_rate_label.pack(pady=5)
+        format_frame = tk.Frame(self.master)
+        format_frame.pack(pady=5)
+        self.sample_rate_var = tk.StringVar(value=str(self.last_settings.get('sample_rate', self.RATE)))
+        self.sample_rate_dropdown = ttk.Combobox(
+            format_frame,
+            textvariable=self.sample_rate_var,
+            values=[str(rate) for rate in SAMPLE_RATES],
+            width=10
+        )
+        self.sample_rate_dropdown.pack(side=tk.LEFT)
+        self.format_label = tk.Label(format_frame, text=self.language_strings[self.current_language]["format_label"])
+        self.format_label.pack(side=tk.LEFT, padx=5)
+        self.format_var = tk.StringVar(value=self.last_settings.get('sample_format', 'int16'))
+        format_dropdown = ttk.Combobox(
+            format_frame,
+            textvariable=self.format_var,
+            values=list(SAMPLE_FORMATS),
+            width=8,
+            state="readonly"
+        )
+        format_dropdown.pack(side=tk.LEFT)
+        self.channels_label = tk.Label(format_frame, text=self.language_strings[self.current_language]["channels_label"])
+        self.channels_label.pack(side=tk.LEFT, padx=5)
+        self.channels_var = tk.StringVar(value=str(self.last_settings.get('channels', self.CHANNELS)))
+        channels_dropdown = ttk.Combobox(
+            format_frame,
+            textvariable=self.channels_var,
+            values=[str(count) for count in range(1, MAX_CHANNELS + 1)],
+            width=3,
+            state="readonly"
+        )
+        channels_dropdown.pack(side=tk.LEFT)
+
+        # Latency: "auto" lets the sender resize the chunk, "low" and "normal" are fixed
+        latency_frame = tk.Frame(self.master)
+        latency_frame.pack(pady=5)
+        self.latency_label = tk.Label(latency_frame, text=self.language_strings[self.current_language]["latency_label"])
+        self.latency_label.pack(side=tk.LEFT, padx=5)
+        # Settings from before the auto mode only have the old checkbox
+        latency = self.last_settings.get('latency') or ('low' if self.last_settings.get('low_latency') else 'normal')
+        self.latency_var = tk.StringVar(value=latency)
+        latency_dropdown = ttk.Combobox(
+            latency_frame,
+            textvariable=self.latency_var,
+            values=list(LATENCY_MODES),
+            width=7,
+            state="readonly"
+        )
+        latency_dropdown.pack(side=tk.LEFT)
+        self.latency_target_label = tk.Label(latency_frame, text=self.language_strings[self.current_language]["latency_target_label"])
+        self.latency_target_label.pack(side=tk.LEFT, padx=5)
+        self.latency_target_var = tk.StringVar(value=str(self.last_settings.get('latency_target_ms', DEFAULT_LATENCY_TARGET_MS)))
+        latency_target_entry = tk.Entry(latency_frame, textvariable=self.latency_target_var, width=6)
+        latency_target_entry.pack(side=tk.LEFT)
+
+        # Receiver jitter buffer target
+        jitter_frame = tk.Frame(self.master)
+        jitter_frame.pack(pady=5)
+        self.jitter_label = tk.Label(jitter_frame, text=self.language_strings[self.current_language]["jitter_label"])
+        self.jitter_label.pack(side=tk.LEFT, padx=5)
+        self.jitter_var = tk.StringVar(value=str(self.last_settings.get('jitter_ms', DEFAULT_JITTER_MS)))
+        jitter_entry = tk.Entry(jitter_frame, textvariable=self.jitter_var, width=6)
+        jitter_entry.pack(side=tk.LEFT)
+
+        # Transport Selection
+        self.transport_label = tk.Label(jitter_frame, text=self.language_strings[self.current_language]["transport_label"])
+        self.transport_label.pack(side=tk.LEFT, padx=5)
+        self.transport_var = tk.StringVar(value=self.last_settings.get('transport', 'tcp'))
+        transport_dropdown = ttk.Combobox(
+            jitter_frame,
+            textvariable=self.transport_var,
+            values=list(TRANSPORTS),
+            width=9,
+            state="readonly"
+        )
+        transport_dropdown.pack(side=tk.LEFT)
+
+        # Codec Selection
+        self.codec_label = tk.Label(jitter_frame, text=self.language_strings[self.current_language]["codec_label"])
+        self.codec_label.pack(side=tk.LEFT, padx=5)
+        self.codec_var = tk.StringVar(value=self.last_settings.get('codec', 'auto'))
+        codec_dropdown = ttk.Combobox(
+            jitter_frame,
+            textvariable=self.codec_var,
+            values=list(CODEC_CHOICES),
+            width=8,
+            state="readonly"
+        )
+        codec_dropdown.pack(side=tk.LEFT)
+
+        # Callback driven audio I/O
+        self.callback_io_var = tk.BooleanVar(value=self.last_settings.get('audio_io') == 'callback')
+        self.callback_io_check = tk.Checkbutton(
+            self.master,
+            text=self.language_strings[self.current_language]["callback_io"],
+            variable=self.callback_io_var
+        )
+        self.callback_io_check.pack(pady=5)
+
+        # Sender: stop sending while the input is quiet
+        self.dtx_var = tk.BooleanVar(value=bool(self.last_settings.get('dtx', False)))
+        self.dtx_check = tk.Checkbutton(
+            self.master,
+            text=self.language_strings[self.current_language]["dtx_label"],
+            variable=self.dtx_var
+        )
+        self.dtx_check.pack(pady=5)
+
+        # Volume, tone and limiter, they apply to the stream as it plays
+        self.dsp_label = tk.Label(self.master, text=self.language_strings[self.current_language]["dsp_label"], font=("Arial", 12))
+        self.dsp_label.pack(pady=5)
+        dsp_frame = tk.Frame(self.master)
+        dsp_frame.pack()
+        self.volume_var = tk.DoubleVar(value=float(self.last_settings.get('volume_db', 0.0)))
+        self.volume_scale = tk.Scale(
+            dsp_frame,
+            label=self.language_strings[self.current_language]["volume_label"],
+            variable=self.volume_var,
+            from_=-40,
+            to=12,
+            resolution=0.5,
+            orient=tk.HORIZONTAL,
+            length=110,
+            command=self.on_dsp_change
+        )
+        self.volume_scale.pack(side=tk.LEFT, padx=2)
+        self.tone_vars = {}
+        self.tone_scales = {}
+        for name, _, _, _ in TONE_BANDS:
+            self.tone_vars[name] = tk.DoubleVar(value=float(self.last_settings.get(f'{name}_db', 0.0)))
+            self.tone_scales[name] = tk.Scale(
+                dsp_frame,
+                label=self.language_strings[self.current_language][f"{name}_label"],
+                variable=self.tone_vars[name],
+                from_=-12,
+                to=12,
+                resolution=0.5,
+                orient=tk.HORIZONTAL,
+                length=110,
+                command=self.on_dsp_change
+            )
+            self.tone_scales[name].pack(side=tk.LEFT, padx=2)
+        self.limiter_var = tk.BooleanVar(value=bool(self.last_settings.get('limiter', False)))
+        self.limiter_check = tk.Checkbutton(
+            self.master,
+            text=self.language_strings[self.current_language]["limiter_label"],
+            variable=self.limiter_var,
+            command=self.on_dsp_change
+        )
+        self.limiter_check.pack(pady=5)
+        self.on_dsp_change()
+
+
+        # Buttons Frame
+        button_frame = tk.Frame(self.master)
+        button_frame.pack(pady=10)
+
+        # Start Button
+        self.start_button = tk.Button(
+            button_frame, 
+            text=self.language_strings[self.current_language]["start_button"],
+            command=self.start_streaming
+        )
+        self.start_button.pack(side=tk.LEFT, padx=5)
+
+        # Stop Button
+        self.stop_button = tk.Button(
+            button_frame, 
+            text=self.language_strings[self.current_language]["stop_button"],
+            command=self.stop_streaming,
+            state=tk.DISABLED
+        )
+        self.stop_button.pack(side=tk.LEFT, padx=5)
+
+        # Sessions: the form's stream and the ones from a --sessions file
+        self.sessions_label = tk.Label(self.master, text=self.language_strings[self.current_language]["sessions_label"], font=("Arial", 12))
+        self.sessions_label.pack(pady=5)
+        self.session_tree = ttk.Treeview(self.master, columns=("mode", "status", "traffic"), height=4)
+        self.session_tree.column("#0", width=110)
+        self.session_tree.column("mode", width=80)
+        self.session_tree.column("status", width=100)
+        self.session_tree.column("traffic", width=180)
+        self.session_tree.pack(pady=5)
+        session_button_frame = tk.Frame(self.master)
+        session_button_frame.pack()
+        self.session_start_button = tk.Button(
+            session_button_frame,
+            text=self.language_strings[self.current_language]["session_start"],
+            command=self.start_selected_sessions
+        )
+        self.session_start_button.pack(side=tk.LEFT, padx=5)
+        self.session_stop_button = tk.Button(
+            session_button_frame,
+            text=self.language_strings[self.current_language]["session_stop"],
+            command=self.stop_selected_sessions
+        )
+        self.session_stop_button.pack(side=tk.LEFT, padx=5)
+
+        # Logging Text Area
+        self.logs_label = tk.Label(self.master, text=self.language_strings[self.current_language]["logs_label"], font=("Arial", 12))
+        self.logs_label.pack(pady=5)
+        self.log_text = scrolledtext.ScrolledText(
+            self.master, 
+            wrap=tk.WORD, 
+            width=60, 
+            height=10
+        )
+        self.log_text.pack(pady=10)
+
+        # Initial device selector state
+        self.update_device_selectors()
+
+    def update_device_selectors(self):
+        mode = self.mode_var.get()
+        if mode == "sender":
+            # In sender mode, disable output device selector
+            self.output_dropdown.config(state='disabled')
+            self.output_label.config(fg='gray')
+            self.input_dropdown.config(state='normal')
+            self.input_label.config(fg='black')
+        else:
+            # In receiver mode, disable input device selector
+            self.input_dropdown.config(state='disabled')
+            self.input_label.config(fg='gray')
+            self.output_dropdown.config(state='normal')
+            self.output_label.config(fg='black')
+
+    def log_message(self, message, level='info'):
+        # Safe from any thread: the logger only queues the record, and the
+        # widget is updated later by drain_ui_queue on the Tk thread
+        if level == 'info':
+            self.logger.info(message)
+        elif level == 'error':
+            self.logger.error(message)
+        elif level == 'warning':
+            self.logger.warning(message)
+        self.ui_queue.put(message)
+
+    def drain_ui_queue(self):
+        lines = []
+        stopped = False
+        changed = False
+        try:
+            while len(lines) < LOG_BATCH:
+                item = self.ui_queue.get_nowait()
+                if isinstance(item, tuple) and item[0] is SESSION_CHANGED:
+                    changed = True
+                    if item[1] == GUI_SESSION:
+                        stopped = not self.manager.sessions[GUI_SESSION].active
+                elif isinstance(item, tuple) and item[0] is DEVICES:
+                    self.devices_ready(item[1])
+                else:
+                    lines.append(item)
+        except queue.Empty:
+            pass
+        if lines:
+            # One insert per batch, a burst of errors costs one redraw
+            self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+            excess = int(self.log_text.index('end-1c').split('.')[0]) - MAX_LOG_LINES
+            if excess > 0:
+                self.log_text.delete('1.0', f'{excess + 1}.0')
+            self.log_text.see(tk.END)
+        if stopped:
+            self.is_streaming = False
+            self.reset_ui()
+        elif changed and self.manager.sessions.get(GUI_SESSION) and self.manager.sessions[GUI_SESSION].active:
+            # Started from the session list
+            self.is_streaming = True
+            self.start_button.config(state=tk.DISABLED)
+            self.stop_button.config(state=tk.NORMAL)
+        if changed:
+            self.update_session_list()
+        self.master.after(LOG_DRAIN_MS, self.drain_ui_queue)
+
+    def on_session_change(self, session):
+        # Called from the manager's workers
+        self.ui_queue.put((SESSION_CHANGED, session.name))
+
+    def refresh_session_list(self):
+        self.update_session_list()
+        self.master.after(SESSION_REFRESH_MS, self.refresh_session_list)
+
+    def update_session_list(self):
+        strings = self.language_strings[self.current_language]
+        now = time.monotonic()
+        names = []
+        for name, stats in self.manager.status().items():
+            names.append(name)
+            if stats["status"] == "error":
+                traffic = stats["error"]
+            else:
+                # kbps on the wire since the last update
+                then, wire_bytes = self.session_traffic.get(name, (now, stats["wire_bytes"]))
+                kbps = (stats["wire_bytes"] - wire_bytes) * 8 / 1000 / (now - then) if now > then else 0
+                traffic = f"{kbps:.0f} kbps, {stats['target']}" if stats["status"] == "running" else stats["target"]
+            self.session_traffic[name] = (now, stats["wire_bytes"])
+            values = (strings[stats["mode"]], strings["state_" + stats["status"]], traffic)
+            if self.session_tree.exists(name):
+                self.session_tree.item(name, values=values)
+            else:
+                self.session_tree.insert("", tk.END, iid=name, text=name, values=values)
+        for name in self.session_tree.get_children():
+            if name not in names:
+                self.session_tree.delete(name)
+
+    def start_selected_sessions(self):
+        for name in self.session_tree.selection():
+            self.manager.start(name)
+
+    def stop_selected_sessions(self):
+        for name in self.session_tree.selection():
+            self.manager.stop(name)
+
+    def on_dsp_change(self, value=None):
+        # Scales pass their value, the checkbox nothing. The stream picks the
+        # new settings up with its next chunk.
+        self.dsp.set_volume(self.volume_var.get())
+        self.dsp.set_bands([(kind, freq, self.tone_vars[name].get(), q)
+                            for name, kind, freq, q in TONE_BANDS if self.tone_vars[name].get() != 0])
+        self.dsp.set_limit(GUI_LIMIT_DB if self.limiter_var.get() else None)
+
+    def refresh_devices(self):
+        # Enumerates on a worker thread, the lists update when it's done.
+        # The manager only restarts PortAudio when no stream is using it.
+        if self.refreshing:
+            return
+        self.refreshing = True
+        threading.Thread(target=self._enumerate_devices, daemon=True).start()
+
+    def _enumerate_devices(self):
+        devices = None
+        try:
+            devices = self.manager.refresh_devices()
+            if not self.devices_refreshed:
+                self.log_message(f"PyAudio lib: {audio.pyaudio_library}")
+        except Exception as e:
+            self.log_message(f"{self.language_strings[self.current_language]['device_list_error']}{e}", 'error')
+        self.ui_queue.put((DEVICES, devices))
+
+    def devices_ready(self, devices):
+        # Tk thread
+        self.refreshing = False
+        self.devices_refreshed = time.monotonic()
+        if devices is None:
+            return
+        self.devices = devices
+        self.input_dropdown.config(values=device_labels(devices, 'input'))
+        self.output_dropdown.config(values=device_labels(devices, 'output'))
+        # Indexes may have moved, show the saved choices at their new ones
+        for var, direction in ((self.input_device_var, 'input'), (self.output_device_var, 'output')):
+            device = find_device(devices, var.get(), direction)
+            if device:
+                var.set(f"{device['index']}: {device['name']}")
+        try:
+            save_cached_devices(devices)
+        except OSError as e:
+            self.log_message(f"{self.language_strings[self.current_language]['save_settings_error']}{e}", 'error')
+
+    def on_device_list_open(self):
+        if time.monotonic() - self.devices_refreshed > DEVICE_REFRESH_SECONDS:
+            self.refresh_devices()
+
+    def selected_device(self, direction):
+        var = self.input_device_var if direction == 'input' else self.output_device_var
+        device = find_device(self.devices, var.get(), direction)
+        if device is None:
+            raise ValueError(self.language_strings[self.current_language]["error_device"].format(device=var.get()))
+        return device['index']
+
+    def start_streaming(self):
+        try:
+            # Reset log text
+            self.log_text.delete('1.0', tk.END)
+
+            # Validate inputs
+            ip_address = self.ip_var.get()
+            port = self.port_var.get()
+            if not ip_address or not port:
+                messagebox.showerror("Error", self.language_strings[self.current_language]["error_ip_port"])
+                return
+            try:
+                port = int(port)
+            except ValueError:
+                messagebox.showerror("Error", self.language_strings[self.current_language]["error_port"])
+                return
+
+            input_device_index = None
+            output_device_index = None
+
+            mode = self.mode_var.get()
+            try:
+                if mode == "sender":
+                    input_device_index = self.selected_device('input')
+                else:
+                    output_device_index = self.selected_device('output')
+            except ValueError as e:
+                messagebox.showerror("Error", str(e))
+                return
+            if mode == "sender":
+                self.log_message(f"{self.language_strings[self.current_language]['streaming_start_input']}{input_device_index}")
+            else:
+                self.log_message(f"{self.language_strings[self.current_language]['streaming_start_output']}{output_device_index}")
+
+            # Get selected sample rate, format and channels
+            try:
+                self.RATE = int(self.sample_rate_var.get())
+            except ValueError:
+                self.RATE = 0
+            if not SAMPLE_RATES[0] <= self.RATE <= SAMPLE_RATES[-1]:
+                messagebox.showerror("Error", self.language_strings[self.current_language]["error_rate"])
+                return
+            self.CHANNELS = int(self.channels_var.get())
+            sample_width, sample_float = parse_sample_format(self.format_var.get())
+            self.log_message(f"{self.language_strings[self.current_language]['streaming_rate']}{self.RATE} Hz, "
+                             f"{self.format_var.get()}, {self.CHANNELS} ch")
+
+            # Select the chunk size: auto starts where the last auto session settled,
+            # low latency is 128 and the default 1024 chunk size should be more stable
+            latency = self.latency_var.get()
+            try:
+                jitter_ms = int(self.jitter_var.get())
+            except ValueError:
+                messagebox.showerror("Error", self.language_strings[self.current_language]["error_jitter"])
+                return
+            try:
+                latency_target_ms = int(self.latency_target_var.get())
+            except ValueError:
+                messagebox.showerror("Error", self.language_strings[self.current_language]["error_latency_target"])
+                return
+            if latency == "auto":
+                # The chunk has to fit a datagram in this format and channel count
+                self.CHUNK = starting_chunk(StreamConfig(rate=self.RATE, transport=self.transport_var.get(),
+                                                         channels=self.CHANNELS, sample_width=sample_width,
+                                                         sample_float=sample_float),
+                                            self.last_settings.get('auto_chunk'))
+                self.log_message(self.language_strings[self.current_language]["latency_auto_on"].format(chunk=self.CHUNK, target=latency_target_ms))
+            elif latency == "low":
+                self.CHUNK = LOW_LATENCY_CHUNK
+                self.log_message(self.language_strings[self.current_language]["low_latency_on"].format(chunk=self.CHUNK))
+            else:
+                self.CHUNK = DEFAULT_CHUNK
+                self.log_message(self.language_strings[self.current_language]["low_latency_off"].format(chunk=self.CHUNK))
+
+
+            # start/stop button switch
+            self.start_button.config(state=tk.DISABLED)
+            self.stop_button.config(state=tk.NORMAL)
+
+            # Set streaming flag
+            self.is_streaming = True
+
+            # Start streaming thread
+            config = StreamConfig(
+                mode=mode,
+                ip=ip_address,
+                port=port,
+                rate=self.RATE,
+                chunk=self.CHUNK,
+                channels=self.CHANNELS,
+                sample_width=sample_width,
+                sample_float=sample_float,
+                language=self.current_language,
+                jitter_ms=jitter_ms,
+                transport=self.transport_var.get(),
+                codec=self.codec_var.get(),
+                audio_io=self.audio_io(),
+                latency="auto" if latency == "auto" else "fixed",
+                latency_target_ms=latency_target_ms,
+                dtx=self.dtx_var.get()
+            )
+            if mode == "sender":
+                endpoint = {"source": "device", "device": input_device_index, "dsp": self.dsp}
+            else:
+                endpoint = {"sink": "device", "device": output_device_index, "dsp": self.dsp}
+            self.manager.add(Session(GUI_SESSION, config, endpoint))
+            self.manager.start(GUI_SESSION)
+
+            self.save_last_settings() #Save settings after starting
+
+        except Exception as e:
+            self.log_message(f"{self.language_strings[self.current_language]['error_starting_stream']}{e}", 'error')
+            self.log_message(traceback.format_exc(), 'error')
+            messagebox.showerror("Error", str(e))
+            self.reset_ui()
+
+    def stop_streaming(self):
+        self.is_streaming = False
+        self.manager.stop(GUI_SESSION)
+
+        # Reset UI
+        self.reset_ui()
+        self.log_message(self.language_strings[self.current_language]["streaming_stopped"])
+
+    def reset_ui(self):
+        self.start_button.config(state=tk.NORMAL)
+        self.stop_button.config(state=tk.DISABLED)
+        # Where auto latency settled is where the next session starts
+        session = self.manager.sessions.get(GUI_SESSION)
+        engine = session.engine if session else None
+        if engine and engine.config.mode == "sender" and engine.config.latency == "auto":
+            self.last_settings['auto_chunk'] = engine.config.chunk
+            self.save_last_settings()
+
+    def current_settings(self):
+        return {
+            'ip': self.ip_var.get(),
+            'port': self.port_var.get(),
+            'output_device': self.output_device_var.get(),
+            'input_device': self.input_device_var.get(),
+            'sample_rate': self.sample_rate_var.get(),
+            'sample_format': self.format_var.get(),
+            'channels': self.channels_var.get(),
+            'latency': self.latency_var.get(),
+            'latency_target_ms': self.latency_target_var.get(),
+            'auto_chunk': self.last_settings.get('auto_chunk'),
+            'jitter_ms': self.jitter_var.get(),
+            'transport': self.transport_var.get(),
+            'codec': self.codec_var.get(),
+            'audio_io': self.audio_io(),
+            'dtx': self.dtx_var.get(),
+            'volume_db': self.volume_var.get(),
+            'bass_db': self.tone_vars['bass'].get(),
+            'mid_db': self.tone_vars['mid'].get(),
+            'treble_db': self.tone_vars['treble'].get(),
+            'limiter': self.limiter_var.get(),
+            'language': self.current_language,
+            'chunk_size': self.CHUNK
+        }
+
+    def audio_io(self):
+        return "callback" if self.callback_io_var.get() else "blocking"
+
+    def save_last_settings(self):
+        try:
+            save_settings(self.current_settings())
+        except Exception as e:
+            self.log_message(f"{self.language_strings[self.current_language]['save_settings_error']}{e}", 'error')
+            print(f"Error guardando la última configuración: {e}")
+
+    def load_last_settings(self):
+        return load_settings()
+    
+    def set_language(self, language):
+        self.current_language = language
+        self.mode_label.config(text=self.language_strings[language]["mode_label"])
+        modes = [(self.language_strings[language]["sender"], "sender"), (self.language_strings[language]["receiver"], "receiver")]
+        for widget in self.master.winfo_children():
+            if isinstance(widget, tk.Frame):
+                for sub_widget in widget.winfo_children():
+                    if isinstance(sub_widget, tk.Radiobutton):
+                        if sub_widget['value'] == 'sender':
+                            sub_widget.config(text=self.language_strings[language]["sender"])
+                        elif sub_widget['value'] == 'receiver':
+                            sub_widget.config(text=self.language_strings[language]["receiver"])
+        self.input_label.config(text=self.language_strings[language]["input_label"])
+        self.output_label.config(text=self.language_strings[language]["output_label"])
+        self.ip_label.config(text=self.language_strings[language]["ip_label"])
+        self.port_label.config(text=self.language_strings[language]["port_label"])
+        self.sample_rate_label.config(text=self.language_strings[language]["sample_rate_label"])
+        self.format_label.config(text=self.language_strings[language]["format_label"])
+        self.channels_label.config(text=self.language_strings[language]["channels_label"])
+        self.jitter_label.config(text=self.language_strings[language]["jitter_label"])
+        self.transport_label.config(text=self.language_strings[language]["transport_label"])
+        self.codec_label.config(text=self.language_strings[language]["codec_label"])
+        self.start_button.config(text=self.language_strings[language]["start_button"])
+        self.stop_button.config(text=self.language_strings[language]["stop_button"])
+        self.logs_label.config(text=self.language_strings[language]["logs_label"])
+        self.input_dropdown.set(self.language_strings[language]["select_input"])
+        self.output_dropdown.set(self.language_strings[language]["select_output"])
+        self.latency_label.config(text=self.language_strings[language]["latency_label"])
+        self.latency_target_label.config(text=self.language_strings[language]["latency_target_label"])
+        self.callback_io_check.config(text=self.language_strings[language]["callback_io"])
+        self.dtx_check.config(text=self.language_strings[language]["dtx_label"])
+        self.dsp_label.config(text=self.language_strings[language]["dsp_label"])
+        self.volume_scale.config(label=self.language_strings[language]["volume_label"])
+        for name, scale in self.tone_scales.items():
+            scale.config(label=self.language_strings[language][f"{name}_label"])
+        self.limiter_check.config(text=self.language_strings[language]["limiter_label"])
+        self.sessions_label.config(text=self.language_strings[language]["sessions_label"])
+        self.session_tree.heading("#0", text=self.language_strings[language]["session_name"])
+        self.session_tree.heading("mode", text=self.language_strings[language]["session_mode"])
+        self.session_tree.heading("status", text=self.language_strings[language]["session_status"])
+        self.session_tree.heading("traffic", text=self.language_strings[language]["session_traffic"])
+        self.session_start_button.config(text=self.language_strings[language]["session_start"])
+        self.session_stop_button.config(text=self.language_strings[language]["session_stop"])
+        self.update_session_list()
+
+    def on_language_change(self, event):
+        selected_language = self.lang_var.get()
+        self.set_language(selected_language)
+        self.save_last_settings()
+
+    def on_window_close(self):
+        self.stop_streaming()
+        self.master.destroy()
+        # Every session stops and closes its devices before the process exits
+        self.manager.close()
+    
+    def set_dropdown_values(self):
+        if self.last_settings and self.last_settings.get('input_device'):
+            self.input_device_var.set(self.last_settings['input_device'])
+        if self.last_settings and self.last_settings.get('output_device'):
+            self.output_device_var.set(self.last_settings['output_device'])
+
+def run_gui(sessions_file=None):
+    root = tk.Tk()
+    app = AudioStreamer(root, sessions_file)
+    root.mainloop()
@@ -0,0 +1,408 @@
+import argparse
+import heapq
+import random
+import socket
+import sys
+import threading
+import time
+from collections import deque
+
+# Network impairment proxy: sits between a sender and a receiver and makes
+# the link behave like a bad one, on purpose and reproducibly (--seed). The
+# sender streams to the proxy's port, the proxy forwards to the receiver.
+#
+#   python -m pcmstream.impair --listen 50500 --target 127.0.0.1:65432 --transport udp --profile wifi
+#
+# Audio (sender to receiver) gets the whole treatment: latency, jitter, loss,
+# reordering, a bandwidth cap and periodic stalls. The way back only carries
+# the receiver's reports and gets the base latency. TCP can't lose or reorder
+# bytes, so there a loss is a retransmission stall (the segment and
+# everything behind it wait --rto-ms) and jitter never reorders, like the
+# real thing. --reset-every also cuts TCP connections, to time reconnects.
+
+TCP_QUEUE_BYTES = 256 * 1024 # A TCP direction stops reading past this, the sender's buffers fill up behind it
+RECV_BYTES = 65536
+
+# Named starting points, single options still override them
+PROFILES = {
+    "lan": {"delay_ms": 1, "jitter_ms": 0.5},
+    "wifi": {"delay_ms": 4, "jitter_ms": 8, "loss": 0.005, "reorder": 0.002, "stall_every": 30, "stall_ms": 120},
+    "bad-wifi": {"delay_ms": 8, "jitter_ms": 25, "loss": 0.03, "reorder": 0.01, "rate_kbps": 4000,
+                 "stall_every": 10, "stall_ms": 300},
+    "congested": {"delay_ms": 20, "jitter_ms": 40, "loss": 0.01, "rate_kbps": 1500, "queue_ms": 100},
+}
+
+
+class Impairment:
+    # What the link does to one direction. schedule() gives the time a packet
+    # arriving now is delivered, or None when it is lost.
+    def __init__(self, delay_ms=0, jitter_ms=0, loss=0.0, reorder=0.0, reorder_ms=20, rate_kbps=0, queue_ms=200,
+                 stall_every=0, stall_ms=0, rto_ms=200, seed=None):
+        self.delay = delay_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.loss = loss
+        self.reorder = reorder
+        self.reorder_delay = reorder_ms / 1000
+        self.rate = rate_kbps * 1000 / 8 # Bytes per second, 0 is unlimited
+        self.queue = queue_ms / 1000 # Most a capped UDP link queues before it drops
+        self.stall_every = stall_every
+        self.stall = stall_ms / 1000
+        self.rto = rto_ms / 1000
+        self.random = random.Random(seed)
+        self.started = time.monotonic()
+        self.link_free = 0.0 # When a capped link is done with what it has queued
+        self.last_due = 0.0
+        self.packets = 0
+        self.bytes = 0
+        self.lost = 0
+        self.queue_drops = 0
+        self.reordered = 0
+        self.retransmits = 0
+        self.stalled = 0
+
+    def stalled_until(self, now):
+        # The link is down for the last stall of every stall_every seconds
+        if not self.stall_every or not self.stall:
+            return now
+        phase = (now - self.started) % self.stall_every
+        if phase < self.stall_every - self.stall:
+            return now
+        self.stalled += 1
+        return now + self.stall_every - phase
+
+    def schedule(self, now, size, stream=False):
+        self.packets += 1
+        self.bytes += size
+        lost = self.loss and self.random.random() < self.loss
+        if lost and not stream:
+            self.lost += 1
+            return None
+        due = self.stalled_until(now)
+        if self.rate:
+            start = max(due, self.link_free)
+            if not stream and start - now > self.queue:
+                self.queue_drops += 1
+                return None
+            self.link_free = start + size / self.rate
+            due = self.link_free
+        due += max(0.0, self.delay + self.random.uniform(-self.jitter, self.jitter))
+        if lost:
+            self.retransmits += 1
+            due += self.rto
+        elif not stream and self.reorder and self.random.random() < self.reorder:
+            self.reordered += 1
+            due += self.reorder_delay
+        if stream:
+            # Bytes of a connection arrive in order, whatever the jitter
+            due = max(due, self.last_due)
+            self.last_due = due
+        return due
+
+    def reverse(self):
+        # The way back: same base latency, nothing else
+        return Impairment(delay_ms=self.delay * 1000)
+
+    def stats(self):
+        return {
+            "packets": self.packets,
+            "bytes": self.bytes,
+            "lost": self.lost,
+            "queue_drops": self.queue_drops,
+            "reordered": self.reordered,
+            "retransmits": self.retransmits,
+            "stalled": self.stalled,
+        }
+
+
+class StreamPipe:
+    # One direction of a proxied TCP connection: a thread reads and timestamps,
+    # another writes each block once it is due
+    def __init__(self, src, dst, impairment, on_close):
+        self.src = src
+        self.dst = dst
+        self.impairment = impairment
+        self.on_close = on_close
+        self.queue = deque()
+        self.queued = 0
+        self.cond = threading.Condition()
+        self.closed = False
+        self.threads = [threading.Thread(target=self._read, daemon=True), threading.Thread(target=self._write, daemon=True)]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def _read(self):
+        try:
+            while True:
+                data = self.src.recv(RECV_BYTES)
+                if not data:
+                    break
+                with self.cond:
+                    while self.queued > TCP_QUEUE_BYTES and not self.closed:
+                        self.cond.wait(0.1)
+                    if self.closed:
+                        break
+                    self.queue.append((self.impairment.schedule(time.monotonic(), len(data), stream=True), data))
+                    self.queued += len(data)
+                    self.cond.notify_all()
+        except OSError:
+            pass
+        self.close()
+
+    def _write(self):
+        try:
+            while True:
+                with self.cond:
+                    while not self.queue and not self.closed:
+                        self.cond.wait()
+                    if not self.queue:
+                        break
+                    due, data = self.queue[0]
+                    wait = due - time.monotonic()
+                    if wait > 0:
+                        # Woken early by a close, or to look at the clock again
+                        self.cond.wait(wait)
+                        continue
+                    self.queue.popleft()
+                    self.queued -= len(data)
+                    self.cond.notify_all()
+                self.dst.sendall(data)
+        except OSError:
+            pass
+        self.close()
+
+    def close(self):
+        with self.cond:
+            if self.closed:
+                return
+            self.closed = True
+            self.queue.clear()
+            self.cond.notify_all()
+        self.on_close()
+
+
+class ImpairmentProxy:
+    def __init__(self, listen_port, target, transport="tcp", impairment=None, listen_ip="127.0.0.1", reset_every=0):
+        self.listen = (listen_ip, listen_port)
+        self.target = target # (host, port)
+        self.transport = transport
+        self.impairment = impairment or Impairment()
+        self.back = self.impairment.reverse()
+        self.reset_every = reset_every # TCP: cut the connection this often, in seconds, 0 never
+        self.sock = None
+        self.stopped = threading.Event()
+        self.threads = []
+        self.connections = 0
+        self.resets = 0
+        self.active = [] # TCP: (client, upstream) pairs
+        self.lock = threading.Lock()
+        # UDP: datagrams waiting to be delivered, (due, seq, socket, data, address)
+        self.heap = []
+        self.seq = 0
+        self.cond = threading.Condition()
+        self.client = None
+        self.upstream = None
+
+    def start(self):
+        if self.transport == "tcp":
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.sock.bind(self.listen)
+            self.sock.listen(4)
+            self._thread(self._accept)
+            if self.reset_every:
+                self._thread(self._resetter)
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.bind(self.listen)
+            self.upstream = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.upstream.connect(self.target)
+            self._thread(self._udp_forward)
+            self._thread(self._udp_back)
+            self._thread(self._udp_deliver)
+
+    def _thread(self, target):
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def _accept(self):
+        while not self.stopped.is_set():
+            try:
+                client, _ = self.sock.accept()
+            except OSError:
+                break
+            try:
+                upstream = socket.create_connection(self.target, timeout=5)
+                upstream.settimeout(None)
+            except OSError:
+                client.close()
+                continue
+            for sock in (client, upstream):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            pair = (client, upstream)
+            with self.lock:
+                self.connections += 1
+                self.active.append(pair)
+            close = lambda pair=pair: self._close_pair(pair)
+            StreamPipe(client, upstream, self.impairment, close).start()
+            StreamPipe(upstream, client, self.back, close).start()
+
+    def _close_pair(self, pair):
+        with self.lock:
+            if pair not in self.active:
+                return
+            self.active.remove(pair)
+        for sock in pair:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def _resetter(self):
+        while not self.stopped.wait(self.reset_every):
+            with self.lock:
+                pairs = list(self.active)
+            for pair in pairs:
+                self.resets += 1
+                self._close_pair(pair)
+
+    def _udp_forward(self):
+        while not self.stopped.is_set():
+            try:
+                data, addr = self.sock.recvfrom(RECV_BYTES)
+            except OSError:
+                break
+            if addr != self.client:
+                self.client = addr
+                self.connections += 1
+            self._queue(self.impairment.schedule(time.monotonic(), len(data)), self.upstream, data, None)
+
+    def _udp_back(self):
+        while not self.stopped.is_set():
+            try:
+                data = self.upstream.recv(RECV_BYTES)
+            except ConnectionRefusedError:
+                continue  # Nobody listening yet, ICMP from an earlier datagram
+            except OSError:
+                break
+            if self.client:
+                self._queue(self.back.schedule(time.monotonic(), len(data)), self.sock, data, self.client)
+
+    def _queue(self, due, sock, data, addr):
+        if due is None:
+            return
+        with self.cond:
+            self.seq += 1
+            heapq.heappush(self.heap, (due, self.seq, sock, data, addr))
+            self.cond.notify()
+
+    def _udp_deliver(self):
+        while True:
+            with self.cond:
+                while not self.heap and not self.stopped.is_set():
+                    self.cond.wait()
+                if self.stopped.is_set():
+                    break
+                wait = self.heap[0][0] - time.monotonic()
+                if wait > 0:
+                    self.cond.wait(wait)
+                    continue
+                _, _, sock, data, addr = heapq.heappop(self.heap)
+            try:
+                if addr:
+                    sock.sendto(data, addr)
+                else:
+                    sock.send(data)
+            except OSError:
+                pass  # Receiver not up yet, a lost datagram like any other
+
+    def close(self):
+        self.stopped.set()
+        with self.cond:
+            self.cond.notify_all()
+        for sock in (self.sock, self.upstream):
+            if sock:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                sock.close()
+        with self.lock:
+            pairs = list(self.active)
+        for pair in pairs:
+            self._close_pair(pair)
+        for thread in self.threads:
+            thread.join(2)
+
+    def stats(self):
+        stats = self.impairment.stats()
+        stats["connections"] = self.connections
+        if self.transport == "tcp":
+            stats["resets"] = self.resets
+        return stats
+
+
+def parse_address(spec, default_host="127.0.0.1"):
+    host, sep, port = spec.rpartition(':')
+    if not sep:
+        host, port = default_host, spec
+    return host or default_host, int(port)
+
+
+def add_impairment_arguments(parser):
+    # Shared with the soak runner
+    parser.add_argument("--profile", choices=PROFILES, help="Start from a named link profile, the options below override it")
+    parser.add_argument("--delay-ms", type=float, help="One way latency")
+    parser.add_argument("--jitter-ms", type=float, help="Latency varies this much either way")
+    parser.add_argument("--loss", type=float, help="Share of packets lost, 0.01 is 1%%. TCP: share of reads held --rto-ms")
+    parser.add_argument("--reorder", type=float, help="UDP: share of datagrams held back --reorder-ms so later ones overtake them")
+    parser.add_argument("--reorder-ms", type=float)
+    parser.add_argument("--rate-kbps", type=float, help="Bandwidth cap in kbit/s, 0 unlimited")
+    parser.add_argument("--queue-ms", type=float, help="UDP: what a capped link queues before it drops")
+    parser.add_argument("--stall-every", type=float, help="Seconds between stalls, the link passes nothing for --stall-ms")
+    parser.add_argument("--stall-ms", type=float)
+    parser.add_argument("--rto-ms", type=float, help="TCP: how long a lost segment holds the connection up")
+    parser.add_argument("--reset-every", type=float, default=0, help="TCP: cut the connection every this many seconds")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed, the same seed loses the same packets")
+
+
+def impairment_from_args(args):
+    options = dict(PROFILES.get(args.profile, {}))
+    for key in ("delay_ms", "jitter_ms", "loss", "reorder", "reorder_ms", "rate_kbps", "queue_ms",
+                "stall_every", "stall_ms", "rto_ms"):
+        value = getattr(args, key)
+        if value is not None:
+            options[key] = value
+    return Impairment(seed=args.seed, **options)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pcmstream.impair",
+                                     description="Proxy that adds latency, jitter, loss, reordering, a bandwidth cap and stalls")
+    parser.add_argument("--listen", required=True, help="[HOST:]PORT the sender streams to, host defaults to 127.0.0.1")
+    parser.add_argument("--target", required=True, help="HOST:PORT of the receiver")
+    parser.add_argument("--transport", choices=["tcp", "udp"], default="tcp")
+    parser.add_argument("--report", type=float, default=10, help="Print the proxy's counters every this many seconds")
+    add_impairment_arguments(parser)
+    args = parser.parse_args(argv)
+
+    proxy = ImpairmentProxy(parse_address(args.listen)[1], parse_address(args.target), args.transport,
+                            impairment_from_args(args), parse_address(args.listen)[0], args.reset_every)
+    proxy.start()
+    print(f"Proxying {args.transport} {args.listen} -> {args.target}")
+    try:
+        while True:
+            time.sleep(args.report)
+            print(proxy.stats(), flush=True)
+    except KeyboardInterrupt:
+        pass
+    proxy.close()
+    print(proxy.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+import time
+import threading
+
+# Returned by JitterBuffer.get() when the next chunk never arrived in time
+MISSING = object()
+
+SEQUENCE_MODULO = 1 << 32
+
+
+class JitterBuffer:
+    # Bounded, sequence ordered buffer between the network and the playout thread.
+    # Chunks may arrive late, twice or out of order (UDP), holes are reported as
+    # MISSING at playout time so they can be concealed instead of stalling.
+    # The target depth follows the measured arrival jitter (RFC 3550 style
+    # estimator), never below target_ms and never above max_ms.
+    def __init__(self, chunk_seconds, target_ms=60, max_ms=500, jitter_factor=4.0):
+        self.max_ms = max_ms
+        self.jitter_factor = jitter_factor
+        self.lock = threading.Lock()
+        self.chunks = {}
+        self._size(chunk_seconds, target_ms)
+        # Chunks from `boundary` on have the new size, the ones before it the old
+        self.boundary = None
+        self.old_chunk_seconds = chunk_seconds
+
+        self.target = self.base_target
+        self.jitter = 0.0
+        self.buffering = True
+        self.next_seq = None  # Next sequence number to play
+        self.end_seq = None  # One past the highest sequence number received
+        self.last_arrival = None
+        self.last_arrival_seq = None
+        self.auto_seq = 0
+        # Sequence numbers the sender skipped because it was quiet (DTX):
+        # [start, end), end is None until it sends audio again
+        self.quiet = None
+
+        # Counters
+        self.received = 0
+        self.played = 0
+        self.underruns = 0
+        self.lost = 0
+        self.reordered = 0
+        self.duplicates = 0
+        self.dropped_late = 0
+        self.dropped_overflow = 0
+        self.silent = 0
+
+    def _size(self, chunk_seconds, target_ms):
+        self.chunk_seconds = chunk_seconds
+        self.base_target = max(target_ms / 1000, chunk_seconds)
+        self.max_depth = max(self.max_ms / 1000, self.base_target + 2 * chunk_seconds)
+        self.max_chunks = int(self.max_depth / chunk_seconds)
+
+    @property
+    def depth(self):
+        # Span between the playout point and the newest chunk, holes included
+        if self.next_seq is None:
+            return 0.0
+        if self.boundary is not None and self.next_seq < self.boundary:
+            # Chunks of the previous size still queued in front
+            return ((self.boundary - self.next_seq) * self.old_chunk_seconds
+                    + (self.end_seq - self.boundary) * self.chunk_seconds)
+        return (self.end_seq - self.next_seq) * self.chunk_seconds
+
+    def set_chunk_seconds(self, chunk_seconds, target_ms):
+        # The sender changed its chunk size mid-stream. What is queued keeps
+        # playing, the depth counts it at its old length.
+        with self.lock:
+            if self.next_seq is not None and self.next_seq < self.end_seq:
+                self.boundary = self.end_seq
+                self.old_chunk_seconds = self.chunk_seconds
+            self._size(chunk_seconds, target_ms)
+            self.target = max(self.base_target, min(self.target, self.max_depth - chunk_seconds))
+            # Arrival spacing changes with the chunk, restart the estimate from here
+            self.last_arrival = None
+
+    def unwrap(self, seq):
+        # Sequence numbers are 32 bit on the wire, keep counting past the wrap
+        if self.end_seq is None:
+            return seq
+        reference = self.end_seq - 1
+        delta = (seq - reference + SEQUENCE_MODULO // 2) % SEQUENCE_MODULO - SEQUENCE_MODULO // 2
+        return reference + delta
+
+    def put(self, chunk, seq=None, arrival=None):
+        arrival = time.monotonic() if arrival is None else arrival
+        with self.lock:
+            if seq is None:
+                # Reliable transports, chunks arrive in order
+                seq = self.auto_seq
+            else:
+                seq = self.unwrap(seq)
+            self.auto_seq = seq + 1
+            self.received += 1
+
+            if self.next_seq is not None and abs(seq - self.end_seq) > 4 * self.max_chunks:
+                # Sender restarted or skipped way ahead, start over
+                self._reset()
+
+            if self.quiet and self.quiet[1] is None and seq >= self.quiet[0]:
+                # The sender is back after a pause
+                if self.chunks:
+                    # Still playing what it sent before, the pause plays as silence
+                    self.quiet = (self.quiet[0], seq)
+                else:
+                    # All played out already: start over from this chunk
+                    self.quiet = None
+                    self.next_seq = None
+                    self.buffering = True
+                self.last_arrival = None
+
+            if self.next_seq is None:
+                self.next_seq = seq
+                self.end_seq = seq
+
+            if seq < self.next_seq:
+                # Its playout time is gone
+                self.dropped_late += 1
+                return
+            if seq in self.chunks:
+                self.duplicates += 1
+                return
+            if seq < self.end_seq:
+                self.reordered += 1
+            else:
+                self.end_seq = seq + 1
+
+            self._update_jitter(seq, arrival)
+            self.chunks[seq] = chunk
+
+            # Full: the oldest chunks are the least useful ones
+            while self.depth > self.max_depth:
+                if self.chunks.pop(self.next_seq, None) is not None:
+                    self.dropped_overflow += 1
+                self.next_seq += 1
+
+    def _update_jitter(self, seq, arrival):
+        if self.last_arrival is not None:
+            # Deviation of the inter-arrival time from the sender's chunk period
+            expected = (seq - self.last_arrival_seq) * self.chunk_seconds
+            deviation = abs((arrival - self.last_arrival) - expected)
+            self.jitter += (deviation - self.jitter) / 16
+            target = max(self.base_target, self.jitter_factor * self.jitter)
+            self.target = min(target, self.max_depth - self.chunk_seconds)
+        self.last_arrival = arrival
+        self.last_arrival_seq = seq
+
+    def silence(self, seq):
+        # The sender stopped sending at seq because its input went quiet
+        with self.lock:
+            if self.next_seq is None:
+                return
+            seq = self.unwrap(seq)
+            if seq < self.end_seq or (self.quiet and self.quiet[1] is None):
+                return  # Late, or a repeat of the one that started this pause
+            self.quiet = (seq, None)
+
+    def get(self):
+        # Returns the next chunk to play, MISSING for a lost chunk, or None when
+        # the caller should play silence while the buffer fills
+        with self.lock:
+            if self.buffering:
+                if self.depth < self.target:
+                    return None
+                self.buffering = False
+
+            if not self.chunks:
+                if self.quiet:
+                    # The sender paused, nothing is late
+                    self.silent += 1
+                    return None
+                # Underrun, build the buffer back up to the target before resuming
+                self.underruns += 1
+                self.buffering = True
+                self.next_seq = self.end_seq
+                return None
+
+            # Running too far behind the target adds latency, skip ahead
+            while self.depth > self.target + 2 * self.chunk_seconds:
+                if self.chunks.pop(self.next_seq, None) is not None:
+                    self.dropped_late += 1
+                self.next_seq += 1
+
+            chunk = self.chunks.pop(self.next_seq, MISSING)
+            self.next_seq += 1
+            if self.quiet and self.quiet[1] is not None:
+                start, end = self.quiet
+                if self.next_seq >= end:
+                    self.quiet = None # Played through the pause
+                if chunk is MISSING and start < self.next_seq <= end:
+                    # Inside the pause: silence, not a loss
+                    self.silent += 1
+                    return None
+            if chunk is MISSING:
+                self.lost += 1
+            else:
+                self.played += 1
+            return chunk
+
+    def _reset(self):
+        self.chunks.clear()
+        self.boundary = None
+        self.buffering = True
+        self.next_seq = None
+        self.end_seq = None
+        self.last_arrival = None
+        self.last_arrival_seq = None
+        self.quiet = None
+
+    def clear(self):
+        with self.lock:
+            self._reset()
+
+    def stats(self):
+        return {
+            "depth_ms": round(self.depth * 1000, 1),
+            "target_ms": round(self.target * 1000, 1),
+            "jitter_ms": round(self.jitter * 1000, 2),
+            "received": self.received,
+            "played": self.played,
+            "underruns": self.underruns,
+            "lost": self.lost,
+            "reordered": self.reordered,
+            "duplicates": self.duplicates,
+            "dropped_late": self.dropped_late,
+            "dropped_overflow": self.dropped_overflow,
+            "silent": self.silent,
+        }
@@ -0,0 +1,90 @@
+import os
+import glob
+import time
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+MAX_LOG_BYTES = 2 * 1024 * 1024 # Per file before it rotates
+LOG_BACKUPS = 3 # Rotated files kept per session
+MAX_LOG_SESSIONS = 20 # Older session logs in the directory get deleted
+
+_listener = None
+
+
+def setup_logging(directory='logs'):
+    # Callers only put records on a queue, a listener thread does the file and
+    # console writes, so an audio thread never waits on the disk
+    global _listener
+    logger = logging.getLogger("socketPCM")
+    if _listener is not None:
+        return logger
+
+    # Create logs directory if it doesn't exist
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    prune_logs(directory)
+
+    log_filename = os.path.join(directory, f"audio_streamer_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s: %(message)s')
+    file_handler = RotatingFileHandler(log_filename, maxBytes=MAX_LOG_BYTES, backupCount=LOG_BACKUPS)
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(QueueHandler(records))
+    _listener = QueueListener(records, file_handler, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return logger
+
+
+def stop_logging():
+    # Flushes whatever is still queued, safe to call more than once
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def prune_logs(directory):
+    # Makes room for a new session: at most MAX_LOG_SESSIONS including it, rotated parts included
+    sessions = sorted(glob.glob(os.path.join(directory, "audio_streamer_*.log")))
+    for old in sessions[:max(0, len(sessions) - MAX_LOG_SESSIONS + 1)]:
+        for path in glob.glob(old + "*"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class RateLimiter:
+    # At most `burst` messages per key every `interval` seconds. What gets held
+    # back is counted and reported with the next message that goes through.
+    def __init__(self, burst=5, interval=10.0):
+        self.burst = burst
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.windows = {}  # key -> [window start, sent, suppressed]
+
+    def allow(self, key):
+        # Returns None to drop the message, otherwise how many were dropped before it
+        now = time.monotonic()
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                self.windows[key] = [now, 1, 0]
+                return suppressed
+            if window[1] < self.burst:
+                window[1] += 1
+                suppressed, window[2] = window[2], 0
+                return suppressed
+            window[2] += 1
+            return None
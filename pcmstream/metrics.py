@@ -0,0 +1,258 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .protocol import timestamp_us
+
+# Stream health counters. The streaming loops only bump a few integers and
+# drop a value into a fixed size histogram per chunk, everything else (jitter
+# buffer, device and drift stats) is read from the objects that already keep
+# it, when somebody asks: the Prometheus endpoint or the periodic JSON log line.
+
+LATENCY_BUCKETS_MS = (5, 10, 20, 30, 40, 60, 80, 100, 150, 200, 300, 500, 1000, 2000)
+METRIC_PREFIX = "socketpcm_"
+
+
+class Histogram:
+    # Cumulative counts per upper bound, Prometheus style, plus one overflow bucket
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q quantile, None when empty
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": round(self.sum / self.count, 1) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class StreamMetrics:
+    def __init__(self, role):
+        self.role = role
+        self.started = time.monotonic()
+        self.lock = threading.Lock() # Guards providers only, counters are bumped by a single loop
+        self.chunks = 0
+        self.frames = 0
+        self.audio_bytes = 0 # PCM, before encoding / after decoding
+        self.wire_bytes = 0 # Headers and encoded payload
+        self.clock_skew = 0 # Arrivals stamped before their capture time, clocks not in sync
+        # Capture on the sender to arrival here, needs both clocks synced (NTP)
+        self.transit = Histogram(LATENCY_BUCKETS_MS)
+        # Transit plus the audio queued in front of the chunk: mouth to ear, minus the device buffers
+        self.latency = Histogram(LATENCY_BUCKETS_MS)
+        self.providers = {}
+
+    def chunk(self, frames, audio_bytes, wire_bytes):
+        self.chunks += 1
+        self.frames += frames
+        self.audio_bytes += audio_bytes
+        self.wire_bytes += wire_bytes
+
+    def arrival(self, capture_us, queued_seconds):
+        transit = (timestamp_us() - capture_us) / 1000
+        if transit < 0:
+            self.clock_skew += 1
+            return
+        self.transit.observe(transit)
+        self.latency.observe(transit + queued_seconds * 1000)
+
+    def add_provider(self, name, stats, **labels):
+        # stats() returns {key: number}, or {label value: {key: number}} for
+        # per receiver tables like the fan-out's
+        with self.lock:
+            self.providers[(name, tuple(sorted(labels.items())))] = stats
+
+    def remove_provider(self, name, **labels):
+        with self.lock:
+            self.providers.pop((name, tuple(sorted(labels.items()))), None)
+
+    def gauges(self):
+        # (metric name, labels, value) for every number the providers report
+        with self.lock:
+            providers = list(self.providers.items())
+        for (name, labels), stats in providers:
+            try:
+                values = stats()
+            except Exception:
+                continue  # Provider torn down between the lookup and the call
+            for key, value in values.items():
+                if isinstance(value, dict):
+                    for inner_key, inner_value in value.items():
+                        if _is_number(inner_value):
+                            yield f"{name}_{inner_key}", labels + (("target", str(key)),), inner_value
+                elif _is_number(value):
+                    yield f"{name}_{key}", labels, value
+
+    def snapshot(self):
+        snapshot = {
+            "role": self.role,
+            "uptime_s": round(time.monotonic() - self.started, 1),
+            "chunks": self.chunks,
+            "frames": self.frames,
+            "audio_bytes": self.audio_bytes,
+            "wire_bytes": self.wire_bytes,
+            "clock_skew": self.clock_skew,
+            "transit_ms": self.transit.summary(),
+            "latency_ms": self.latency.summary(),
+        }
+        for name, labels, value in self.gauges():
+            key = name + "".join(f"{{{label}={label_value}}}" for label, label_value in labels)
+            snapshot[key] = value
+        return snapshot
+
+    def prometheus(self):
+        return render_prometheus(self.families())
+
+    def families(self, labels=()):
+        # (name, kind, help, samples) for every metric, labels go on every
+        # sample: a session manager tells its streams apart with them
+        role = (("role", self.role),) + tuple(labels)
+        families = []
+
+        def metric(name, kind, help_text, samples):
+            families.append((METRIC_PREFIX + name, kind, help_text,
+                             [(suffix, role + sample_labels, value) for suffix, sample_labels, value in samples]))
+
+        metric("chunks_total", "counter", "Audio chunks sent or received", [("", (), self.chunks)])
+        metric("frames_total", "counter", "Audio frames sent or received", [("", (), self.frames)])
+        metric("audio_bytes_total", "counter", "PCM bytes before encoding or after decoding", [("", (), self.audio_bytes)])
+        metric("wire_bytes_total", "counter", "Bytes on the wire, headers included", [("", (), self.wire_bytes)])
+        metric("clock_skew_total", "counter", "Chunks that arrived before their capture time, clocks out of sync",
+               [("", (), self.clock_skew)])
+        for name, histogram, help_text in (
+            ("transit_ms", self.transit, "Capture to arrival time in ms, needs synced clocks"),
+            ("latency_ms", self.latency, "Capture to playout estimate in ms, transit plus buffered audio"),
+        ):
+            samples = []
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                samples.append(("_bucket", (("le", str(bound)),), cumulative))
+            samples.append(("_bucket", (("le", "+Inf"),), histogram.count))
+            samples.append(("_sum", (), round(histogram.sum, 3)))
+            samples.append(("_count", (), histogram.count))
+            metric(name, "histogram", help_text, samples)
+
+        grouped = {}
+        for name, labels, value in self.gauges():
+            grouped.setdefault(name, []).append(("", labels, value))
+        for name, samples in grouped.items():
+            metric(name, "gauge", name.replace("_", " "), samples)
+        return families
+
+
+def render_prometheus(families):
+    # Text format. Families of the same name from several streams go under one
+    # HELP/TYPE, Prometheus rejects a metric that is declared twice.
+    merged = {}
+    for name, kind, help_text, samples in families:
+        if name in merged:
+            merged[name][2].extend(samples)
+        else:
+            merged[name] = (kind, help_text, list(samples))
+    lines = []
+    for name, (kind, help_text, samples) in merged.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for suffix, labels, value in samples:
+            lines.append(f"{name}{suffix}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class MetricsReporter:
+    # Logs one JSON line every interval seconds with per second rates since
+    # the previous line, until stop_event is set
+    def __init__(self, metrics_source, interval, log, stop_event):
+        self.metrics_source = metrics_source # Callable, the engine's metrics change with every run
+        self.interval = interval
+        self.log = log
+        self.stop_event = stop_event
+        self.previous = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            metrics = self.metrics_source()
+            if metrics is None:
+                continue
+            snapshot = metrics.snapshot()
+            now = time.monotonic()
+            if self.previous and self.previous[0] is metrics:
+                _, then, before = self.previous
+                elapsed = max(now - then, 1e-6)
+                for key in ("frames", "audio_bytes", "wire_bytes"):
+                    snapshot[f"{key}_per_s"] = round((snapshot[key] - before[key]) / elapsed, 1)
+            self.previous = (metrics, now, snapshot)
+            self.log("metrics " + json.dumps(snapshot, default=str))
+
+
+class MetricsServer:
+    # GET /metrics in Prometheus text format, on its own daemon thread
+    def __init__(self, metrics_source, host, port):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                metrics = metrics_source()
+                if self.path.split('?')[0] not in ("/", "/metrics") or metrics is None:
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes every few seconds would flood the log
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,151 @@
+import asyncio
+
+import numpy as np
+
+from .drift import Resampler
+from .formats import to_float, from_float, channel_matrix
+
+# Server mode with --mix: every sender goes through its own jitter buffer,
+# concealment and drift compensation as usual, then all of them are summed
+# into one output, so a single sound card plays everybody at once.
+# Every period of config.chunk frames each sender fills its row of a
+# preallocated (senders, frames, channels) float block, one tensordot with
+# the gains sums them, and a peak limiter keeps the sum out of clipping
+# before it goes back to samples.
+
+LIMIT = 0.98 # Peak the limiter holds the mix under, 1.0 is full scale
+RELEASE_SECONDS = 0.3 # How long the limiter takes to let go
+
+
+class MixInput:
+    # One sender as the mixer sees it: float frames in the mixer's rate and
+    # channel layout (a 5.1 sender is folded down, mono spread), handed out in
+    # whatever block size the mixer asks for
+    def __init__(self, session, config, gain):
+        self.session = session
+        self.gain = gain
+        self.source = session.config
+        self.matrix = channel_matrix(self.source.channels, config.channels)
+        self.ratio = self.source.rate / config.rate
+        self.resampler = Resampler(self.source) if self.ratio != 1 else None
+        self.pending = np.zeros((0, config.channels), dtype=np.float32)
+        self.position = 0
+
+    def fill(self, out):
+        filled = 0
+        frames = len(out)
+        while filled < frames:
+            if self.position >= len(self.pending):
+                data = self.session.next_block()
+                if data is None:
+                    # Still buffering, silent until it has enough
+                    out[filled:] = 0
+                    return
+                if self.resampler:
+                    data = self.resampler.process(data, self.ratio)
+                self.pending = to_float(data, self.source)
+                if self.matrix is not None:
+                    self.pending = self.pending @ self.matrix
+                self.position = 0
+            count = min(frames - filled, len(self.pending) - self.position)
+            out[filled:filled + count] = self.pending[self.position:self.position + count]
+            filled += count
+            self.position += count
+
+
+class Mixer:
+    # config is the output format: rate, channels, sample width and the mix period (chunk)
+    def __init__(self, config, sink, gains=None):
+        self.config = config
+        self.sink = sink
+        self.gains = gains or {} # host -> linear gain
+        self.inputs = []
+        self.block = np.zeros((0, config.chunk, config.channels), dtype=np.float32)
+        self.gain_vector = np.zeros(0, dtype=np.float32)
+        self.silence = bytes(config.chunk_bytes)
+        self.limiter_gain = 1.0
+        self.release = 1 - min(1.0, config.chunk_seconds / RELEASE_SECONDS)
+        self.blocks = 0
+        self.limited = 0
+        self.late = 0
+
+    def add(self, session):
+        self.inputs.append(MixInput(session, self.config, self.gains.get(session.peer[0], 1.0)))
+        self._resize()
+
+    def remove(self, session):
+        self.inputs = [source for source in self.inputs if source.session is not session]
+        self._resize()
+
+    def _resize(self):
+        self.block = np.zeros((len(self.inputs), self.config.chunk, self.config.channels), dtype=np.float32)
+        self.gain_vector = np.array([source.gain for source in self.inputs], dtype=np.float32)
+
+    def mix(self):
+        if not self.inputs:
+            return self.silence
+        block = self.block
+        for row, source in zip(block, self.inputs):
+            source.fill(row)
+        mixed = np.tensordot(self.gain_vector, block, axes=1)
+        # Peak limiter: instant attack, slow release
+        peak = float(np.abs(mixed).max()) * self.limiter_gain
+        if peak > LIMIT:
+            self.limiter_gain *= LIMIT / peak
+            self.limited += 1
+        if self.limiter_gain < 1.0:
+            mixed *= self.limiter_gain
+            self.limiter_gain = 1.0 - (1.0 - self.limiter_gain) * self.release
+        self.blocks += 1
+        # Whatever the limiter let through past full scale saturates here
+        return from_float(mixed, self.config)
+
+    async def run(self, server):
+        # Opens the output once and keeps it playing, silence when nobody sends
+        loop = asyncio.get_running_loop()
+        config = self.config
+        period = config.chunk_seconds
+        recorder = None
+        sink_open = False
+        try:
+            await loop.run_in_executor(server.executor, self.sink.open, config)
+            sink_open = True
+            server.metrics.add_provider("output", self.sink.stats)
+            recorder = server.open_recorder(config, "mix")
+            deadline = loop.time()
+            while True:
+                data = self.mix()
+                await loop.run_in_executor(server.executor, self.sink.write, data)
+                if recorder:
+                    recorder.offer(data)
+                deadline += period
+                delay = deadline - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                elif delay < -0.5:
+                    self.late += 1
+                    deadline = loop.time()  # Stalled for a while, don't rush to catch up
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            server.log_message(f"{server.strings['audio_receive_error']}{e}", 'error')
+        finally:
+            if recorder:
+                await loop.run_in_executor(server.executor, server.close_recorder, recorder)
+            if sink_open:
+                server.metrics.remove_provider("output")
+                try:
+                    await loop.run_in_executor(server.executor, self.sink.close)
+                except Exception as e:
+                    server.log_message(f"{server.strings['stream_close_error']}{e}", 'error')
+                server._log_audio_stats(self.sink)
+            server.log_message(f"{server.strings['mix_stats']}{self.stats()}")
+
+    def stats(self):
+        return {
+            "inputs": len(self.inputs),
+            "blocks": self.blocks,
+            "limited": self.limited,
+            "late": self.late,
+            "limiter_gain": round(self.limiter_gain, 3),
+        }
@@ -0,0 +1,264 @@
+import struct
+import time
+
+from .codec import (
+    available_codecs, codec_mask, codec_name, negotiate_codec, sender_codec, CODEC_IDS
+)
+from .formats import sample_format, MAX_CHANNELS
+
+# Wire protocol. Every message, TCP or UDP, is a fixed size header followed by
+# `length` bytes of payload:
+#
+#   magic u16 | version u8 | type u8 | sequence u32 | capture timestamp us u64 | length u32
+#
+# A TCP session starts with the sender's HELLO announcing the stream format,
+# answered by ACCEPT or REJECT (payload: reason). Then AUDIO frames follow.
+# Over UDP there is nobody to answer, the sender repeats HELLO every second
+# so a receiver can pick the stream up at any time.
+# With auto latency the sender may send a new HELLO mid-stream that only
+# changes the chunk size, and the receiver sends REPORTs back once a second.
+# With DTX a quiet sender sends an empty SILENCE instead of audio, its sequence
+# number is the first chunk that wasn't sent. Later chunks keep counting.
+
+MAGIC = 0x5043  # "PC"
+VERSION = 2
+
+MSG_AUDIO = 0
+MSG_HELLO = 1
+MSG_ACCEPT = 2
+MSG_REJECT = 3
+MSG_REPORT = 4
+MSG_SILENCE = 5
+
+PACKET_HEADER = struct.Struct("!HBBIQI")
+HEADER_SIZE = PACKET_HEADER.size
+
+# HELLO payload: sample width in bytes, channels, rate, frames per chunk,
+# then the codec the sender proposes and a bitmask of the codecs it can encode,
+# then flags. ACCEPT payload: the codec id the receiver picked.
+HELLO = struct.Struct("!BBII")
+CODEC_OFFER = struct.Struct("!BB")
+HELLO_FLAGS = struct.Struct("!B")
+FLAG_REPORTS = 1 # The sender wants REPORTs back
+FLAG_FLOAT = 2 # 4 byte samples are float32, not int32
+
+# REPORT payload: jitter buffer underruns and output device underruns so far,
+# and the jitter buffer's current target in ms
+REPORT = struct.Struct("!IIH")
+REPORT_INTERVAL = 1.0
+
+HELLO_INTERVAL = 1.0 # Seconds between HELLO repeats over UDP
+HANDSHAKE_TIMEOUT = 5
+
+# Largest payload that fits a single UDP datagram
+MAX_DATAGRAM_PAYLOAD = 65507 - HEADER_SIZE
+MAX_FRAME_PAYLOAD = 1 << 20
+
+# What a receiver is willing to play
+SUPPORTED_WIDTHS = (1, 2, 3, 4)
+RATE_RANGE = (8000, 192000)
+CHUNK_RANGE = (16, 16384)
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def timestamp_us():
+    # Wall clock, so both ends can compare it when their clocks are synced
+    return time.time_ns() // 1000
+
+
+def pack_header(kind, seq, timestamp, length):
+    return PACKET_HEADER.pack(MAGIC, VERSION, kind, seq & 0xFFFFFFFF, timestamp, length)
+
+
+def pack_packet(seq, timestamp, payload, kind=MSG_AUDIO):
+    return pack_header(kind, seq, timestamp, len(payload)) + payload
+
+
+def unpack_header(data):
+    magic, version, kind, seq, timestamp, length = PACKET_HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ProtocolError("Not a socketPCM stream")
+    if version != VERSION:
+        raise ProtocolError(f"Unsupported protocol version {version}, expected {VERSION}")
+    return kind, seq, timestamp, length
+
+
+def pack_hello(config):
+    payload = HELLO.pack(config.sample_width, config.channels, config.rate, config.chunk)
+    payload += CODEC_OFFER.pack(CODEC_IDS[sender_codec(config)], codec_mask(available_codecs(config)))
+    flags = FLAG_REPORTS if config.latency == "auto" else 0
+    if config.sample_float:
+        flags |= FLAG_FLOAT
+    payload += HELLO_FLAGS.pack(flags)
+    return pack_packet(0, timestamp_us(), payload, MSG_HELLO)
+
+
+def parse_hello(payload, config, negotiate=True):
+    # Returns a copy of the receiver's config using the sender's stream format.
+    # With negotiate=False (UDP, no reply possible) the sender's codec is taken as is.
+    if len(payload) < HELLO.size:
+        raise ProtocolError("Truncated HELLO")
+    sample_width, channels, rate, chunk = HELLO.unpack_from(payload)
+    proposed, offered = "none", codec_mask(["none"])
+    if len(payload) >= HELLO.size + CODEC_OFFER.size:
+        proposed_id, offered = CODEC_OFFER.unpack_from(payload, HELLO.size)
+        proposed = codec_name(proposed_id)
+        if proposed is None:
+            raise ProtocolError(f"Unknown codec {proposed_id}")
+    flags = 0
+    if len(payload) >= HELLO.size + CODEC_OFFER.size + HELLO_FLAGS.size:
+        flags, = HELLO_FLAGS.unpack_from(payload, HELLO.size + CODEC_OFFER.size)
+    if sample_width not in SUPPORTED_WIDTHS:
+        raise ProtocolError(f"Unsupported sample width {sample_width}")
+    sample_float = bool(flags & FLAG_FLOAT)
+    if sample_float and sample_width != 4:
+        raise ProtocolError(f"Unsupported float sample width {sample_width}")
+    if not 1 <= channels <= MAX_CHANNELS:
+        raise ProtocolError(f"Unsupported channel count {channels}")
+    if not RATE_RANGE[0] <= rate <= RATE_RANGE[1]:
+        raise ProtocolError(f"Unsupported sample rate {rate}")
+    if not CHUNK_RANGE[0] <= chunk <= CHUNK_RANGE[1]:
+        raise ProtocolError(f"Unsupported chunk size {chunk}")
+    codec = negotiate_codec(proposed, offered, config.codec) if negotiate else proposed
+    # On the receiver's side "auto" latency means the sender wants reports
+    latency = "auto" if flags & FLAG_REPORTS else "fixed"
+    return config.copy(sample_width=sample_width, sample_float=sample_float, channels=channels, rate=rate, chunk=chunk,
+                       codec=codec, latency=latency)
+
+
+def parse_rechunk(payload, config):
+    # A HELLO in the middle of a session. Only the chunk size may change,
+    # returns the new one.
+    changed = parse_hello(payload, config, negotiate=False)
+    for key in ("sample_width", "sample_float", "channels", "rate", "codec"):
+        if getattr(changed, key) != getattr(config, key):
+            raise ProtocolError(f"The sender changed {key} in the middle of the stream")
+    return changed.chunk
+
+
+def pack_report(underruns, device_underruns, buffer_ms):
+    payload = REPORT.pack(underruns & 0xFFFFFFFF, device_underruns & 0xFFFFFFFF, min(int(buffer_ms), 0xFFFF))
+    return pack_packet(0, timestamp_us(), payload, MSG_REPORT)
+
+
+def parse_report(payload):
+    if len(payload) < REPORT.size:
+        raise ProtocolError("Truncated REPORT")
+    return REPORT.unpack_from(payload)
+
+
+def describe_format(config):
+    return f"{config.rate} Hz, {config.channels} ch, {sample_format(config)}, CHUNK = {config.chunk}, codec {config.codec}"
+
+
+def recv_into_exact(sock, view):
+    # Fills the whole view. False on a clean EOF before the first byte.
+    received = sock.recv_into(view)
+    size = len(view)
+    while received < size:
+        if not received:
+            return False
+        n = sock.recv_into(view[received:])
+        if not n:
+            raise ProtocolError("Connection closed in the middle of a frame")
+        received += n
+    return True
+
+
+class FrameReader:
+    # Reads framed messages from a stream socket straight into one reusable
+    # buffer with recv_into: no allocation per frame, one header unpack per frame
+    def __init__(self, sock, size=4096):
+        self.sock = sock
+        self.header = bytearray(HEADER_SIZE)
+        self.header_view = memoryview(self.header)
+        self.buffer = bytearray(size)
+        self.length = None
+        self.payload = None
+        self.readonly = None
+
+    def read(self):
+        # (type, sequence, timestamp, payload) or None at EOF. The payload is a
+        # read-only view into the reader's buffer, valid until the next read:
+        # keep bytes(payload) if it has to live longer. Read-only because
+        # PyAudio's blocking write only takes read-only buffers.
+        if not recv_into_exact(self.sock, self.header_view):
+            return None
+        kind, seq, timestamp, length = unpack_header(self.header)
+        if length > MAX_FRAME_PAYLOAD:
+            raise ProtocolError(f"Frame of {length} bytes is too large")
+        if length != self.length:
+            # Chunks keep their size, so this only runs when the stream starts
+            if length > len(self.buffer):
+                self.buffer = bytearray(length)
+            self.length = length
+            self.payload = memoryview(self.buffer)[:length]
+            self.readonly = self.payload.toreadonly()
+        if length and not recv_into_exact(self.sock, self.payload):
+            raise ProtocolError("Connection closed in the middle of a frame")
+        return kind, seq, timestamp, self.readonly
+
+
+class FrameAligner:
+    # Makes sure a sink only ever gets whole frames. A chunk that ends in the
+    # middle of a frame keeps the partial frame for the front of the next one.
+    def __init__(self, frame_bytes):
+        self.frame_bytes = frame_bytes
+        self.partial = bytearray()
+
+    def align(self, data):
+        if not self.partial and len(data) % self.frame_bytes == 0:
+            return data  # The normal case, passed through untouched
+        self.partial += data
+        whole = len(self.partial) - len(self.partial) % self.frame_bytes
+        aligned = bytes(self.partial[:whole])
+        del self.partial[:whole]
+        return aligned
+
+
+def sender_handshake(sock, config):
+    # Announces the stream format, waits for the receiver's verdict.
+    # Returns the codec the receiver picked.
+    sock.sendall(pack_hello(config))
+    previous_timeout = sock.gettimeout()
+    sock.settimeout(HANDSHAKE_TIMEOUT)
+    try:
+        reply = FrameReader(sock).read()
+    finally:
+        sock.settimeout(previous_timeout)
+    if reply is None:
+        raise ProtocolError("Receiver closed the connection during the handshake")
+    kind, _, _, payload = reply
+    if kind == MSG_REJECT:
+        raise ProtocolError(f"Receiver rejected the stream: {bytes(payload).decode('utf-8', 'replace')}")
+    if kind != MSG_ACCEPT:
+        raise ProtocolError(f"Unexpected message {kind} during the handshake")
+    codec = codec_name(payload[0]) if payload else "none"
+    if codec is None or codec not in available_codecs(config):
+        raise ProtocolError(f"Receiver picked an unsupported codec {payload[0]}")
+    return codec
+
+
+def receiver_handshake(sock, config):
+    # Waits for HELLO and returns the session config, or rejects the sender
+    previous_timeout = sock.gettimeout()
+    sock.settimeout(HANDSHAKE_TIMEOUT)
+    try:
+        message = FrameReader(sock).read()
+    finally:
+        sock.settimeout(previous_timeout)
+    if message is None:
+        raise ProtocolError("Sender closed the connection during the handshake")
+    kind, _, _, payload = message
+    if kind != MSG_HELLO:
+        raise ProtocolError(f"Expected HELLO, got message {kind}")
+    try:
+        session_config = parse_hello(payload, config)
+    except ProtocolError as e:
+        sock.sendall(pack_packet(0, timestamp_us(), str(e).encode('utf-8'), MSG_REJECT))
+        raise
+    sock.sendall(pack_packet(0, timestamp_us(), bytes([CODEC_IDS[session_config.codec]]), MSG_ACCEPT))
+    return session_config
@@ -0,0 +1,118 @@
+import os
+import queue
+import threading
+import wave
+from datetime import datetime
+
+from .audio import wav_format
+from .config import DEFAULT_RECORD_MAX_MB
+from .formats import FormatConverter
+
+# Recording tee: the streaming loops hand every chunk to a writer thread
+# through a bounded queue and never wait for the disk. When the disk can't
+# keep up the queue fills and new chunks are dropped from the recording (never
+# from the stream), and counted.
+
+RECORD_QUEUE_SECONDS = 5 # Audio the queue holds before chunks get dropped
+WRITE_BUFFER = 1 << 20 # Bytes collected before each write to the file
+
+
+class Recorder:
+    def __init__(self, directory, config, prefix, log, strings, max_mb=DEFAULT_RECORD_MAX_MB):
+        self.directory = directory
+        self.config = wav_format(config)
+        self.converter = FormatConverter(config, self.config)
+        self.prefix = prefix
+        self.log = log # engine.log_message
+        self.strings = strings
+        self.max_bytes = max(1, max_mb) * 1024 * 1024
+        chunks = max(4, int(RECORD_QUEUE_SECONDS / config.chunk_seconds))
+        self.queue = queue.Queue(maxsize=chunks)
+        self.recorded = 0
+        self.dropped = 0
+        self.files = 0
+        self.bytes_written = 0
+        self.failed = False
+        self.file = None
+        self.wav = None
+        self.file_bytes = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.thread.start()
+        return self
+
+    def offer(self, data):
+        # Called from the streaming loop, never blocks
+        if self.failed:
+            self.dropped += 1
+            return
+        try:
+            # A view into a receive buffer is reused for the next frame
+            self.queue.put_nowait(data if isinstance(data, bytes) else bytes(data))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        try:
+            while True:
+                data = self.queue.get()
+                if data is None:
+                    break
+                if self.failed:
+                    continue
+                # Float streams become int32 here, on the writer thread
+                data = self.converter.convert(data)
+                try:
+                    if self.wav is None or self.file_bytes + len(data) > self.max_bytes:
+                        self._rotate()
+                    self.wav.writeframesraw(data)
+                    self.file_bytes += len(data)
+                    self.bytes_written += len(data)
+                    self.recorded += 1
+                except OSError as e:
+                    # Disk full or gone: stop recording, the stream goes on
+                    self.failed = True
+                    self.dropped += 1
+                    self.log(f"{self.strings['record_error']}{e}", 'error')
+        finally:
+            self._close_file()
+
+    def _rotate(self):
+        self._close_file()
+        name = f"{self.prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{self.files + 1:03d}.wav"
+        path = os.path.join(self.directory, name)
+        # wave writes straight to the file object, the large buffer batches it
+        self.file = open(path, 'wb', buffering=WRITE_BUFFER)
+        self.wav = wave.open(self.file, 'wb')
+        self.wav.setnchannels(self.config.channels)
+        self.wav.setsampwidth(self.config.sample_width)
+        self.wav.setframerate(self.config.rate)
+        self.file_bytes = 0
+        self.files += 1
+        self.log(f"{self.strings['record_file']}{path}")
+
+    def _close_file(self):
+        if self.wav is not None:
+            try:
+                # Patches the header sizes, then the file gets flushed
+                self.wav.close()
+                self.file.close()
+            except OSError as e:
+                self.log(f"{self.strings['record_error']}{e}", 'error')
+            self.wav = None
+            self.file = None
+
+    def close(self):
+        # Writes out whatever is queued, then closes the file
+        self.queue.put(None)
+        self.thread.join()
+
+    def stats(self):
+        return {
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "files": self.files,
+            "bytes": self.bytes_written,
+        }
@@ -0,0 +1,49 @@
+class RingBuffer:
+    # Single producer / single consumer byte ring over one preallocated buffer.
+    # No locks: the producer only ever moves write_pos and the consumer only
+    # read_pos, and each position is published after the bytes it covers have
+    # been copied, so a PortAudio callback never waits on the other side.
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.write_pos = 0 # Total bytes ever written
+        self.read_pos = 0 # Total bytes ever read
+
+    def readable(self):
+        return self.write_pos - self.read_pos
+
+    def writable(self):
+        return self.capacity - (self.write_pos - self.read_pos)
+
+    def write(self, data):
+        # Copies as much of data as fits, returns how many bytes that was
+        size = min(len(data), self.writable())
+        if not size:
+            return 0
+        source = memoryview(data)
+        start = self.write_pos % self.capacity
+        first = min(size, self.capacity - start)
+        self.view[start:start + first] = source[:first]
+        if size > first:
+            self.view[:size - first] = source[first:size]
+        self.write_pos += size
+        return size
+
+    def read(self, size):
+        # Up to size bytes, fewer if not that much is buffered
+        size = min(size, self.readable())
+        if not size:
+            return b''
+        start = self.read_pos % self.capacity
+        first = min(size, self.capacity - start)
+        if size > first:
+            data = b''.join((self.view[start:], self.view[:size - first]))
+        else:
+            data = bytes(self.view[start:start + size])
+        self.read_pos += size
+        return data
+
+    def clear(self):
+        # Consumer side only
+        self.read_pos = self.write_pos
@@ -0,0 +1,435 @@
+import asyncio
+import socket
+import struct
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .codec import create_codec, CODEC_IDS
+from .conceal import Concealer
+from .drift import DriftCompensator
+from .engine import StreamEngine, CONNECTION_TIMEOUT, UDP_SESSION_TIMEOUT
+from .jitter import JitterBuffer, MISSING
+from .protocol import (
+    unpack_header, pack_packet, parse_hello, parse_rechunk, pack_report, describe_format, timestamp_us,
+    ProtocolError, HEADER_SIZE, HANDSHAKE_TIMEOUT, MAX_FRAME_PAYLOAD, REPORT_INTERVAL,
+    MSG_AUDIO, MSG_HELLO, MSG_ACCEPT, MSG_REJECT, MSG_SILENCE
+)
+from .transport import join_multicast, multicast_bind_address, tune_socket
+
+# Receiver service for many senders at once: every socket and every playout
+# clock lives on one asyncio event loop. Sinks are only touched through a small
+# thread pool, so a slow write never holds up the other sessions.
+
+MAX_SESSIONS = 64
+AUDIO_WORKERS = 4
+
+
+async def read_frame(reader):
+    # (type, sequence, timestamp, payload) or None at EOF
+    try:
+        header = await reader.readexactly(HEADER_SIZE)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise ProtocolError("Connection closed in the middle of a frame")
+        return None
+    kind, seq, timestamp, length = unpack_header(header)
+    if length > MAX_FRAME_PAYLOAD:
+        raise ProtocolError(f"Frame of {length} bytes is too large")
+    try:
+        payload = await reader.readexactly(length) if length else b''
+    except asyncio.IncompleteReadError:
+        raise ProtocolError("Connection closed in the middle of a frame")
+    return kind, seq, timestamp, payload
+
+
+class ServerSession:
+    # One sender: jitter buffer, concealment, and a playout task paced by the
+    # event loop's clock instead of a thread blocking on the device
+    def __init__(self, server, peer, config, sink):
+        self.server = server
+        self.peer = peer
+        self.config = config
+        self.sink = sink
+        self.hello = None # UDP: the HELLO payload the session was started with
+        self.buffer = JitterBuffer(config.chunk_seconds, config.jitter_ms, config.jitter_max_ms)
+        self.concealer = Concealer(config, config.conceal)
+        self.drift = DriftCompensator(config) if config.drift_compensation else None
+        self.decoder = create_codec(config.codec, config)
+        self.last_packet = 0.0
+        # Only an auto latency sender wants REPORTs, and nobody hears them over multicast
+        reports = config.latency == "auto" and config.transport != "multicast"
+        self.next_report = 0.0 if reports else float('inf')
+        self.recorder = None
+        self.task = None
+
+    def set_chunk(self, chunk):
+        # The sender switched chunk size mid-stream (auto latency)
+        if chunk == self.config.chunk:
+            return
+        self.config.chunk = chunk
+        self.buffer.set_chunk_seconds(self.config.chunk_seconds, self.config.jitter_ms)
+        self.concealer = Concealer(self.config, self.config.conceal)
+        if self.drift:
+            self.drift.set_chunk_seconds(self.config.chunk_seconds)
+        self.server.log_message(f"{self.server.strings['chunk_changed'].format(chunk=chunk)} {self.peer}", key=('chunk_changed', self.peer))
+
+    def report_packet(self):
+        # A REPORT every REPORT_INTERVAL for an auto latency sender, else None
+        if self.last_packet < self.next_report:
+            return None
+        self.next_report = self.last_packet + REPORT_INTERVAL
+        return pack_report(self.buffer.underruns, self.sink.stats().get('underruns', 0), self.buffer.target * 1000)
+
+    def feed(self, seq, timestamp, payload, wire_bytes):
+        self.last_packet = asyncio.get_running_loop().time()
+        if self.decoder:
+            try:
+                payload = self.decoder.decode(payload)
+            except Exception as e:
+                # Corrupt chunk, concealed like a lost one
+                self.server.log_message(f"{self.server.strings['corrupt_packet'].format(addr=self.peer)}{e}", 'warning', key=('corrupt', self.peer))
+                return
+        self.buffer.put(payload, seq)
+        metrics = self.server.metrics
+        metrics.chunk(len(payload) // self.config.frame_bytes, len(payload), wire_bytes)
+        metrics.arrival(timestamp, self.buffer.depth)
+
+    def add_providers(self):
+        peer = f"{self.peer[0]}:{self.peer[1]}"
+        metrics = self.server.metrics
+        metrics.add_provider("jitter", self.buffer.stats, peer=peer)
+        if not self.server.mixer:
+            # Mixed sessions share the mixer's output, it reports it once
+            metrics.add_provider("output", self.sink.stats, peer=peer)
+        if self.drift:
+            metrics.add_provider("drift", self.drift.stats, peer=peer)
+
+    def remove_providers(self):
+        peer = f"{self.peer[0]}:{self.peer[1]}"
+        for name in ("jitter", "output", "drift"):
+            self.server.metrics.remove_provider(name, peer=peer)
+
+    def next_block(self):
+        # The next chunk to play: concealed when lost, resampled to follow the
+        # sender's clock. None while the buffer fills.
+        chunk = self.buffer.get()
+        if chunk is None:
+            return None
+        if chunk is MISSING:
+            data = self.concealer.conceal()
+        else:
+            data = self.concealer.played(chunk)
+        if self.drift:
+            data = self.drift.process(data, self.buffer.depth, self.buffer.target)
+            if self.drift.report_due():
+                self.server.log_message(f"{self.server.strings['drift_stats']}{self.peer}: {self.drift.stats()}")
+        return data
+
+    async def mix(self):
+        # Instead of play(): the server's mixer pulls from this session until it is cancelled
+        mixer = self.server.mixer
+        mixer.add(self)
+        try:
+            await asyncio.Future()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            mixer.remove(self)
+
+    async def play(self):
+        server = self.server
+        loop = asyncio.get_running_loop()
+        config = self.config
+        sink_open = False
+        peer = f"{self.peer[0]}:{self.peer[1]}"
+        try:
+            await loop.run_in_executor(server.executor, self.sink.open, config)
+            sink_open = True
+            self.recorder = server.open_recorder(config, f"{self.peer[0]}_{self.peer[1]}", peer=peer)
+            deadline = loop.time()
+            while True:
+                data = self.next_block()
+                if data is None:
+                    data = self.concealer.silence
+                # A callback sink only copies into its ring, it blocks when the
+                # device clock runs slower than ours and then paces this session
+                await loop.run_in_executor(server.executor, self.sink.write, data)
+                if self.recorder:
+                    self.recorder.offer(data)
+                deadline += len(data) / config.frame_bytes / config.rate
+                delay = deadline - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                elif delay < -0.5:
+                    deadline = loop.time()  # Stalled for a while, don't rush to catch up
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            server.log_message(f"{server.strings['audio_receive_error']}{self.peer}: {e}", 'error')
+        finally:
+            if self.recorder:
+                # Flushing the queue may take a moment, off the loop
+                await loop.run_in_executor(server.executor, partial(server.close_recorder, self.recorder, peer=peer))
+            if sink_open:
+                try:
+                    await loop.run_in_executor(server.executor, self.sink.close)
+                except Exception as e:
+                    server.log_message(f"{server.strings['stream_close_error']}{e}", 'error')
+
+
+class UdpServerProtocol(asyncio.DatagramProtocol):
+    # Sessions keyed by sender address, each one started by its HELLO
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, packet, addr):
+        server = self.server
+        try:
+            kind, seq, timestamp, length = unpack_header(packet)
+        except (ProtocolError, struct.error):
+            return  # Not ours, or truncated
+        payload = packet[HEADER_SIZE:HEADER_SIZE + length]
+        if len(payload) != length:
+            return
+        session = server.sessions.get(addr)
+
+        if kind == MSG_HELLO:
+            if session and session.hello == payload:
+                session.last_packet = asyncio.get_running_loop().time()
+                return
+            if session:
+                try:
+                    # Auto latency on the sender: same stream, new chunk size
+                    session.set_chunk(parse_rechunk(payload, session.config))
+                    session.hello = payload
+                    session.last_packet = asyncio.get_running_loop().time()
+                    return
+                except (ProtocolError, ValueError):
+                    pass
+            # New sender, or the sender changed format: (re)start its session
+            if session:
+                server.close_session(session)
+            elif len(server.sessions) >= MAX_SESSIONS:
+                return
+            try:
+                session_config = parse_hello(payload, server.config, negotiate=False)
+            except (ProtocolError, ValueError) as e:
+                server.log_message(f"{server.strings['handshake_error']}{addr}: {e}", 'error', key=('handshake', addr))
+                return
+            session = server.open_session(addr, session_config)
+            if session:
+                session.hello = payload
+                session.last_packet = asyncio.get_running_loop().time()
+            return
+        if kind == MSG_AUDIO and session:
+            session.feed(seq, timestamp, payload, len(packet))
+            report = session.report_packet()
+            if report:
+                self.transport.sendto(report, addr)
+        elif kind == MSG_SILENCE and session:
+            # The sender is quiet, not gone
+            session.last_packet = asyncio.get_running_loop().time()
+            session.buffer.silence(seq)
+
+
+class ReceiverServer(StreamEngine):
+    # sink_factory(peer) returns an unopened AudioSink for the sender at peer
+    # (host, port), that is where routing to devices or files happens.
+    # With a mixer every sender is summed into the mixer's one sink instead.
+    def __init__(self, config, sink_factory, on_log=None, on_stopped=None, mixer=None):
+        super().__init__(config, on_log, on_stopped)
+        self.sink_factory = sink_factory
+        self.mixer = mixer
+        self.sessions = {}
+        self.loop = None
+        self.shutdown = None
+        self.executor = None
+
+    def start(self, ip, port):
+        return self._start_thread(self.run_server, ip, port)
+
+    def stop(self):
+        self.is_streaming = False
+        self.stop_event.set()
+        loop = self.loop
+        if loop:
+            try:
+                loop.call_soon_threadsafe(self.shutdown.set)
+            except RuntimeError:
+                pass  # Loop already closed
+
+    def run_server(self, ip, port):
+        self.is_streaming = True
+        sock = None
+        try:
+            self.log_message(f"{self.strings['listening_on']}{ip}:{port} ({self.config.transport.upper()}, {self.strings['server_mode']})")
+            if self.config.transport == "tcp":
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            else:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            tune_socket(sock, self.config, stream=self.config.transport == "tcp", send=False)
+            if self.config.transport == "multicast":
+                self._bind(sock, multicast_bind_address(ip), port)
+                join_multicast(sock, ip, self.config.multicast_interface)
+            else:
+                self._bind(sock, ip, port)
+            sock.setblocking(False)
+            self.executor = ThreadPoolExecutor(AUDIO_WORKERS, thread_name_prefix="audio")
+            asyncio.run(self._serve(sock))
+        except Exception as e:
+            if self.running():
+                self.log_message(f"{self.strings['receiver_error']}{e}", 'error')
+                self.log_message(traceback.format_exc(), 'error')
+        finally:
+            self.is_streaming = False
+            self.loop = None
+            if self.executor:
+                self.executor.shutdown(wait=True)
+                self.executor = None
+            self._close_socket(sock)
+            self._stopped()
+
+    async def _serve(self, sock):
+        self.shutdown = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+        if self.stop_event.is_set():
+            return
+        if self.config.transport == "tcp":
+            sock.listen(MAX_SESSIONS)
+            server = await asyncio.start_server(self._handle_connection, sock=sock)
+            closer = server.close
+        else:
+            transport, _ = await self.loop.create_datagram_endpoint(lambda: UdpServerProtocol(self), sock=sock)
+            closer = transport.close
+            sweeper = asyncio.create_task(self._sweep_udp_sessions())
+        if self.mixer:
+            self.metrics.add_provider("mixer", self.mixer.stats)
+            asyncio.create_task(self.mixer.run(self), name="mixer")
+        self.log_message(self.strings["waiting_for_connection"])
+        try:
+            await self.shutdown.wait()
+        finally:
+            closer()
+            if self.config.transport != "tcp":
+                sweeper.cancel()
+            for session in list(self.sessions.values()):
+                self.close_session(session)
+            # Connection handlers are still waiting on their sockets, the
+            # playout tasks only need to finish closing their sinks
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                if not task.get_name().startswith("session"):
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def open_session(self, peer, session_config):
+        try:
+            if self.mixer:
+                sink = self.mixer.sink
+            else:
+                sink = self.sink_factory(peer)
+        except Exception as e:
+            self.log_message(f"{self.strings['receiver_error']}{peer}: {e}", 'error')
+            return None
+        session = ServerSession(self, peer, session_config, sink)
+        self.sessions[peer] = session
+        self.log_message(self.strings['session_started'].format(peer=peer, sink=sink.describe(), format=describe_format(session_config)))
+        session.add_providers()
+        session.task = asyncio.create_task(self._run_session(session), name=f"session {peer}")
+        return session
+
+    async def _run_session(self, session):
+        await (session.mix() if self.mixer else session.play())
+        session.remove_providers()
+        # Playout ended on its own (sink error) or was cancelled by close_session
+        if self.sessions.get(session.peer) is session:
+            del self.sessions[session.peer]
+        self.log_message(f"{self.strings['jitter_stats']}{session.peer}: {session.buffer.stats()}")
+        if session.drift:
+            self.log_message(f"{self.strings['drift_stats']}{session.peer}: {session.drift.stats()}")
+        if not self.mixer:
+            self._log_audio_stats(session.sink)
+        self.log_message(self.strings['session_ended'].format(peer=session.peer, count=len(self.sessions)))
+
+    def close_session(self, session):
+        if self.sessions.get(session.peer) is session:
+            del self.sessions[session.peer]
+        session.task.cancel()
+
+    async def _sweep_udp_sessions(self):
+        while True:
+            await asyncio.sleep(0.5)
+            now = self.loop.time()
+            for session in list(self.sessions.values()):
+                if now - session.last_packet > UDP_SESSION_TIMEOUT:
+                    self.log_message(self.strings['session_timeout'].format(addr=session.peer, seconds=UDP_SESSION_TIMEOUT))
+                    self.close_session(session)
+
+    async def _handle_connection(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        session = None
+        try:
+            self.log_message(f"{self.strings['connection_from']}{peer}")
+            try:
+                session_config = await asyncio.wait_for(self._handshake(reader, writer), HANDSHAKE_TIMEOUT)
+            except (ProtocolError, OSError, asyncio.TimeoutError, struct.error) as e:
+                self.log_message(f"{self.strings['handshake_error']}{peer}: {e}", 'error')
+                return
+            session = self.open_session(peer, session_config)
+            if not session:
+                return
+            while not session.task.done():
+                try:
+                    # A live sender always sends something, DTX a SILENCE frame every second
+                    frame = await asyncio.wait_for(read_frame(reader), CONNECTION_TIMEOUT)
+                except asyncio.TimeoutError:
+                    self.log_message(self.strings['session_timeout'].format(addr=peer, seconds=CONNECTION_TIMEOUT))
+                    break
+                if frame is None:
+                    break
+                kind, seq, timestamp, payload = frame
+                if kind == MSG_AUDIO:
+                    session.feed(seq, timestamp, payload, HEADER_SIZE + len(payload))
+                    report = session.report_packet()
+                    if report:
+                        writer.write(report)
+                elif kind == MSG_SILENCE:
+                    session.buffer.silence(seq)
+                elif kind == MSG_HELLO:
+                    session.set_chunk(parse_rechunk(payload, session.config))
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            if self.running():
+                self.log_message(f"{self.strings['audio_receive_error']}{peer}: {e}", 'error')
+        finally:
+            writer.close()
+            if session:
+                self.close_session(session)
+                await asyncio.gather(session.task, return_exceptions=True)
+
+    async def _handshake(self, reader, writer):
+        # Same exchange as protocol.receiver_handshake, on the event loop
+        message = await read_frame(reader)
+        if message is None:
+            raise ProtocolError("Sender closed the connection during the handshake")
+        kind, _, _, payload = message
+        if kind != MSG_HELLO:
+            raise ProtocolError(f"Expected HELLO, got message {kind}")
+        try:
+            if len(self.sessions) >= MAX_SESSIONS:
+                raise ProtocolError(f"Receiver busy, {MAX_SESSIONS} sessions already")
+            session_config = parse_hello(payload, self.config)
+        except ProtocolError as e:
+            writer.write(pack_packet(0, timestamp_us(), str(e).encode('utf-8'), MSG_REJECT))
+            await writer.drain()
+            raise
+        writer.write(pack_packet(0, timestamp_us(), bytes([CODEC_IDS[session_config.codec]]), MSG_ACCEPT))
+        await writer.drain()
+        return session_config
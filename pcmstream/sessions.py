@@ -0,0 +1,429 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import audio
+from .adaptive import starting_chunk
+from .config import StreamConfig
+from .devices import enumerate_devices, find_device
+from .dsp import DspChain, DspSink, DspSource
+from .engine import StreamEngine
+from .formats import SAMPLE_RATES, MAX_CHANNELS, parse_sample_format
+from .metrics import render_prometheus, METRIC_PREFIX
+from .strings import LANGUAGE_STRINGS
+
+# Several senders and receivers in one process. Every session is a stream
+# with its own engine, as if it were a socketPCM of its own, but they share
+# one PyAudio instance and a bounded pool of workers that run their stream
+# loops. Sessions come from a JSON file (--sessions) and are started, stopped
+# and watched one by one; the GUI's own stream is one more session.
+#
+#   {
+#     "workers": 4,
+#     "defaults": {"transport": "udp", "rate": 48000},
+#     "sessions": [
+#       {"name": "desk", "mode": "sender", "ip": "192.168.1.20", "device": "Line In"},
+#       {"name": "room", "mode": "receiver", "ip": "0.0.0.0", "port": 65433, "device": "Speakers"},
+#       {"name": "test", "mode": "sender", "ip": "127.0.0.1", "port": 65433, "source": "tone", "autostart": false}
+#     ]
+#   }
+#
+# A session takes the StreamConfig options (format as "int16" etc. instead of
+# sample_width) plus where its audio comes from or goes to: source
+# device/wav/tone, sink device/wav/null, device, file, loop, tone_frequency,
+# and its volume_db, eq (["lowshelf:100:3", ...]) and limit_db.
+
+DEFAULT_WORKERS = 8 # Stream loops running at once, more sessions wait for a free worker
+STOP_TIMEOUT = 5 # Seconds close() waits for the stream loops to finish
+ACTIVE = ("waiting", "running")
+ENDPOINT_KEYS = {"source": "device", "sink": "device", "device": None, "file": None, "loop": False, "tone_frequency": 440.0,
+                 "volume_db": 0.0, "limit_db": None, "eq": []}
+SPEC_KEYS = {"name", "format", "autostart"} | set(ENDPOINT_KEYS) | set(StreamConfig().__dict__) - {"sample_width", "sample_float"}
+
+
+def config_from_spec(spec):
+    # StreamConfig for a session definition, the same defaults as the command line
+    name = spec.get("name", "?")
+    unknown = sorted(set(spec) - SPEC_KEYS)
+    if unknown:
+        raise ValueError(f"Session {name}: unknown option {', '.join(unknown)}")
+    options = {key: value for key, value in spec.items() if key not in ENDPOINT_KEYS and key not in ("name", "format", "autostart")}
+    if options.get("mode", "sender") not in ("sender", "receiver"):
+        raise ValueError(f"Session {name}: mode must be sender or receiver")
+    try:
+        options["sample_width"], options["sample_float"] = parse_sample_format(spec.get("format", "int16"))
+    except ValueError as e:
+        raise ValueError(f"Session {name}: {e}")
+    config = StreamConfig(**options)
+    if not SAMPLE_RATES[0] <= config.rate <= SAMPLE_RATES[-1]:
+        raise ValueError(f"Session {name}: sample rate {config.rate} out of range, {SAMPLE_RATES[0]} to {SAMPLE_RATES[-1]} Hz")
+    if not 1 <= config.channels <= MAX_CHANNELS:
+        raise ValueError(f"Session {name}: 1 to {MAX_CHANNELS} channels")
+    if config.latency == "auto" and "chunk" not in spec:
+        config.chunk = starting_chunk(config)
+    return config
+
+
+def load_session_file(path):
+    # (workers, [Session]) from a sessions file, ValueError when it's wrong
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Could not read {path}: {e}")
+    if isinstance(data, list):
+        data = {"sessions": data}
+    defaults = data.get("defaults", {})
+    sessions = []
+    for spec in data.get("sessions", []):
+        spec = dict(defaults, **spec)
+        if not spec.get("name"):
+            raise ValueError(f"{path}: every session needs a name")
+        if any(session.name == spec["name"] for session in sessions):
+            raise ValueError(f"{path}: session {spec['name']} is defined twice")
+        endpoint = {key: spec.get(key, default) for key, default in ENDPOINT_KEYS.items()}
+        config = config_from_spec(spec)
+        try:
+            sessions.append(Session(spec["name"], config, endpoint, spec.get("autostart", True)))
+        except ValueError as e:
+            raise ValueError(f"Session {spec['name']}: {e}")
+    listening = {}
+    for session in sessions:
+        config = session.config
+        if config.mode == "receiver" and config.transport != "multicast":
+            key = ("tcp" if config.transport == "tcp" else "udp", config.port)
+            if key in listening:
+                raise ValueError(f"{path}: sessions {listening[key]} and {session.name} both listen on {key[0]} port {config.port}")
+            listening[key] = session.name
+    return int(data.get("workers", DEFAULT_WORKERS)), sessions
+
+
+def thread_cpu_seconds(ident):
+    # CPU time of another thread so far, None where the OS can't tell (Windows)
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (AttributeError, OSError, OverflowError, TypeError):
+        return None
+
+
+class Session:
+    # One stream the manager runs: what it is, and the engine of its current
+    # (or last) run. Counters add up over every run.
+    def __init__(self, name, config, endpoint, autostart=True):
+        self.name = name
+        self.config = config
+        self.endpoint = endpoint
+        self.autostart = autostart
+        self.status = "stopped" # "waiting" for a worker, "running", then "stopped", "finished" or "error"
+        self.engine = None
+        self.future = None
+        self.stopping = False
+        self.error = None
+        self.starts = 0
+        self.started = None
+        self.thread_id = None
+        self.cpu_start = 0.0
+        self.cpu_seconds = 0.0
+        self.totals = {"chunks": 0, "frames": 0, "audio_bytes": 0, "wire_bytes": 0}
+        # Volume, EQ and limiter, kept from run to run and adjustable while it runs.
+        # The GUI hands in the one its controls change.
+        self.dsp = endpoint.get("dsp") or DspChain(endpoint.get("volume_db", 0.0), endpoint.get("limit_db"), endpoint.get("eq", ()))
+
+    @property
+    def active(self):
+        return self.status in ACTIVE
+
+    @property
+    def uses_pyaudio(self):
+        key = "source" if self.config.mode == "sender" else "sink"
+        return self.endpoint.get(key, "device") == "device"
+
+    def target(self):
+        ip = self.config.ip or ("127.0.0.1" if self.config.mode == "sender" else "0.0.0.0")
+        return ip if "," in ip else f"{ip}:{self.config.port}"
+
+    def stats(self):
+        engine = self.engine
+        counters = dict(self.totals)
+        cpu = self.cpu_seconds
+        if self.status == "running" and engine:
+            for key in counters:
+                counters[key] += getattr(engine.metrics, key)
+            now = thread_cpu_seconds(self.thread_id)
+            if now is not None:
+                cpu += now - self.cpu_start
+        stats = {
+            "status": self.status,
+            "mode": self.config.mode,
+            "transport": self.config.transport,
+            "target": self.target(),
+            "starts": self.starts,
+            "uptime_s": round(time.monotonic() - self.started, 1) if self.status == "running" else 0,
+            "cpu_s": round(cpu, 3),
+        }
+        stats.update(counters)
+        if self.error:
+            stats["error"] = self.error
+        return stats
+
+
+class SessionManager:
+    # on_log(message, level) gets every session's log lines, prefixed with its
+    # name; on_change(session) is called from the worker whenever a session
+    # starts running or ends, and from start()/stop()
+    def __init__(self, workers=DEFAULT_WORKERS, language="en", on_log=None, on_change=None):
+        self.workers = max(1, workers)
+        self.strings = LANGUAGE_STRINGS.get(language, LANGUAGE_STRINGS["en"])
+        self.on_log = on_log
+        self.on_change = on_change
+        self.logger = logging.getLogger(__name__)
+        self.pool = ThreadPoolExecutor(self.workers, thread_name_prefix="session")
+        self.sessions = {} # name -> Session, in the order they were added
+        self.lock = threading.Lock()
+        # Shared by every session's devices, created the first time one needs it
+        self.pa = None
+        self.pa_lock = threading.Lock() # PortAudio can't start or stop on two threads at once
+        self.devices = None
+
+    def log_message(self, message, level='info'):
+        if self.on_log:
+            self.on_log(message, level)
+        elif level == 'error':
+            self.logger.error(message)
+        elif level == 'warning':
+            self.logger.warning(message)
+        else:
+            self.logger.info(message)
+
+    def add(self, session):
+        # Replaces a stopped session of the same name, the GUI redefines its own on every start
+        with self.lock:
+            old = self.sessions.get(session.name)
+            if old and old.active:
+                raise ValueError(f"Session {session.name} is running")
+            if old:
+                session.starts = old.starts
+                session.cpu_seconds = old.cpu_seconds
+                session.totals = old.totals
+            self.sessions[session.name] = session
+        return session
+
+    def load(self, sessions):
+        for session in sessions:
+            self.add(session)
+
+    def start(self, name):
+        with self.lock:
+            session = self.sessions[name]
+            if session.active:
+                return False
+            session.status = "waiting"
+            session.stopping = False
+            session.error = None
+            busy = sum(1 for other in self.sessions.values() if other.active)
+            session.future = self.pool.submit(self._run, session)
+        if busy > self.workers:
+            self.log_message(self.strings['session_waiting'].format(workers=self.workers) + name, 'warning')
+        self._changed(session)
+        return True
+
+    def start_all(self):
+        for session in list(self.sessions.values()):
+            if session.autostart:
+                self.start(session.name)
+
+    def stop(self, name):
+        with self.lock:
+            session = self.sessions.get(name)
+            if session is None or not session.active:
+                return False
+            session.stopping = True
+            if session.future.cancel():
+                # Never got a worker
+                session.status = "stopped"
+            engine = session.engine
+        if engine:
+            engine.stop()
+        self._changed(session)
+        return True
+
+    def stop_all(self):
+        # Waiting ones first, or they would take the workers the others free
+        for session in sorted(self.sessions.values(), key=lambda session: session.status != "waiting"):
+            self.stop(session.name)
+
+    def wait(self, timeout=None):
+        # True when every stream loop is done
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for session in list(self.sessions.values()):
+            future = session.future
+            if future is None or future.cancelled():
+                continue
+            try:
+                future.result(None if deadline is None else max(0, deadline - time.monotonic()))
+            except Exception:
+                return False
+        return True
+
+    def close(self):
+        self.stop_all()
+        self.wait(STOP_TIMEOUT)
+        self.pool.shutdown(wait=False)
+        with self.pa_lock:
+            if self.pa and not self.active():
+                self.pa.terminate()
+                self.pa = None
+
+    def active(self):
+        return [session for session in self.sessions.values() if session.active]
+
+    def pyaudio(self):
+        with self.pa_lock:
+            if self.pa is None:
+                self.pa = audio.load_pyaudio().PyAudio()
+            return self.pa
+
+    def refresh_devices(self):
+        # The device list as PortAudio sees it now. PortAudio only looks for new
+        # devices when it starts, so it is restarted, unless a session may be
+        # using it: then the list is read from the running instance.
+        with self.pa_lock:
+            if self.pa and not any(session.uses_pyaudio for session in self.active()):
+                self.pa.terminate()
+                self.pa = None
+            if self.pa is None:
+                self.pa = audio.load_pyaudio().PyAudio()
+            self.devices = enumerate_devices(self.pa)
+            return self.devices
+
+    def resolve_device(self, spec, direction):
+        # An index as is, a name looked up among the devices PortAudio sees
+        if spec is None or str(spec).isdigit():
+            return None if spec is None else int(spec)
+        devices = self.devices if self.devices is not None else self.refresh_devices()
+        device = find_device(devices, spec, direction)
+        if device is None:
+            raise ValueError(self.strings['error_device'].format(device=spec))
+        return device['index']
+
+    def build_source(self, session):
+        endpoint = session.endpoint
+        kind = endpoint.get("source", "device")
+        if kind == "tone":
+            source = audio.ToneSource(frequency=endpoint.get("tone_frequency", 440.0))
+        elif kind == "wav":
+            if not endpoint.get("file"):
+                raise ValueError(f"Session {session.name}: source wav needs a file")
+            source = audio.WavFileSource(endpoint["file"], loop=endpoint.get("loop", False))
+        else:
+            device = self.resolve_device(endpoint.get("device"), 'input')
+            source = audio.create_pyaudio_source(device, self.pyaudio(), session.config.audio_io)
+        return DspSource(source, session.dsp)
+
+    def build_sink(self, session):
+        endpoint = session.endpoint
+        kind = endpoint.get("sink", "device")
+        if kind == "null":
+            sink = audio.NullSink()
+        elif kind == "wav":
+            if not endpoint.get("file"):
+                raise ValueError(f"Session {session.name}: sink wav needs a file")
+            sink = audio.WavFileSink(endpoint["file"])
+        else:
+            device = self.resolve_device(endpoint.get("device"), 'output')
+            sink = audio.create_pyaudio_sink(device, self.pyaudio(), session.config.audio_io)
+        return DspSink(sink, session.dsp)
+
+    def _run(self, session):
+        # On a pool worker, for as long as the stream lasts
+        with self.lock:
+            if session.stopping:
+                session.status = "stopped"
+                return
+        config = session.config.copy()
+        engine = StreamEngine(config, on_log=lambda message, level='info': self._session_log(session, message, level))
+        try:
+            endpoint = self.build_source(session) if config.mode == "sender" else self.build_sink(session)
+        except Exception as e:
+            self._session_log(session, f"{engine.strings['error_starting_stream']}{e}", 'error')
+            self._ended(session, engine, 0.0)
+            return
+        with self.lock:
+            if session.stopping:
+                engine.stop_event.set()
+            session.engine = engine
+            session.status = "running"
+            session.starts += 1
+            session.started = time.monotonic()
+            session.thread_id = threading.get_ident()
+            session.cpu_start = time.thread_time()
+        self._changed(session)
+        try:
+            self._session_log(session, f"{engine.strings['streaming_start_input' if config.mode == 'sender' else 'streaming_start_output']}"
+                                       f"{endpoint.describe()}")
+            if config.mode == "sender":
+                engine.run_sender(endpoint, config.ip or "127.0.0.1", config.port)
+            else:
+                engine.run_receiver(endpoint, config.ip, config.port)
+        finally:
+            self._ended(session, engine, time.thread_time() - session.cpu_start)
+
+    def _ended(self, session, engine, cpu_seconds):
+        with self.lock:
+            session.cpu_seconds += cpu_seconds
+            for key in session.totals:
+                session.totals[key] += getattr(engine.metrics, key)
+            if session.stopping:
+                session.status = "stopped"
+            else:
+                session.status = "error" if session.error else "finished"
+        self.log_message(f"[{session.name}] {self.strings['session_stats']}{session.stats()}")
+        self._changed(session)
+
+    def _session_log(self, session, message, level='info'):
+        # The first error of a run says what went wrong, a traceback follows it
+        if level == 'error' and not session.stopping and session.error is None:
+            session.error = message.splitlines()[0] if message else message
+        self.log_message(f"[{session.name}] {message}", level)
+
+    def _changed(self, session):
+        if self.on_change:
+            self.on_change(session)
+
+    def status(self):
+        return {name: session.stats() for name, session in list(self.sessions.items())}
+
+    # The manager stands in for an engine's metrics: --metrics-interval and
+    # --metrics-port take it as is
+    def snapshot(self):
+        sessions = self.status()
+        snapshot = {
+            "role": "sessions",
+            "sessions": len(sessions),
+            "running": sum(1 for stats in sessions.values() if stats["status"] == "running"),
+            "waiting": sum(1 for stats in sessions.values() if stats["status"] == "waiting"),
+            "workers": self.workers,
+        }
+        for key in ("frames", "audio_bytes", "wire_bytes"):
+            snapshot[key] = sum(stats[key] for stats in sessions.values())
+        snapshot["per_session"] = sessions
+        return snapshot
+
+    def prometheus(self):
+        families = []
+        up = []
+        cpu = []
+        for name, session in list(self.sessions.items()):
+            label = (("session", name),)
+            stats = session.stats()
+            up.append(("", label, 1 if stats["status"] == "running" else 0))
+            cpu.append(("", label, stats["cpu_s"]))
+            engine = session.engine
+            if engine and stats["status"] == "running":
+                families.extend(engine.metrics.families(label))
+        families.append((METRIC_PREFIX + "session_up", "gauge", "1 while the session is streaming", up))
+        families.append((METRIC_PREFIX + "session_cpu_seconds", "counter", "CPU time of the session's stream loop", cpu))
+        families.append((METRIC_PREFIX + "session_workers", "gauge", "Workers in the session pool", [("", (), self.workers)]))
+        return render_prometheus(families)
@@ -0,0 +1,23 @@
+import json
+
+SETTINGS_FILE = 'last_settings.json'
+
+
+def load_settings(path=SETTINGS_FILE):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_settings(settings, path=SETTINGS_FILE):
+    with open(path, 'w') as f:
+        json.dump(settings, f)
+
+
+def update_settings(path=SETTINGS_FILE, **changes):
+    # Headless runs only touch the keys they own, the GUI's choices stay
+    settings = load_settings(path)
+    settings.update(changes)
+    save_settings(settings, path)
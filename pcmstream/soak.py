@@ -0,0 +1,213 @@
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from .bench import MarkerSource, MarkerSink, percentile
+from .config import StreamConfig, DEFAULT_CHUNK
+from .engine import StreamEngine
+from .impair import ImpairmentProxy, add_impairment_arguments, impairment_from_args
+
+# Soak test: a sender and a receiver engine in this process, like the
+# benchmark, but streaming through the impairment proxy for as long as it
+# takes (hours) to catch what only shows up over time. Every interval it
+# writes a line with the underruns, losses, latency and clock drift of that
+# stretch, and at the end how the latency moved over the whole run and how
+# long the audio took to come back after every outage.
+#
+#   python -m pcmstream.soak --hours 4 --transport udp --profile wifi --output soak.jsonl
+#
+# The source is never silent between its pulses, so silence at the sink is
+# audio that didn't make it: the receiver filled the gap in. A stretch of it
+# is an outage, and its length is how long the stream took to recover.
+
+SIGNAL_LEVEL = 1000 # What the source sends between pulses
+SILENT_LEVEL = 250 # Quieter than this at the sink is filled in audio
+MIN_OUTAGE_MS = 10 # Shorter silences are a concealment fade dipping, not an outage
+COUNTERS = ("jitter_underruns", "jitter_lost", "jitter_dropped_late", "output_underruns")
+
+
+class SignalSource(MarkerSource):
+    # The benchmark's pulses over a constant low level instead of silence
+    def read(self, frames):
+        samples = np.frombuffer(super().read(frames), dtype='<i2').copy()
+        samples[samples == 0] = SIGNAL_LEVEL
+        return samples.tobytes()
+
+
+class OutageSink(MarkerSink):
+    # Also times the silent stretches, once the stream has been heard
+    def __init__(self, source):
+        super().__init__(source)
+        self.heard = False
+        self.silent_frames = 0
+        self.outages = []
+
+    def write(self, data):
+        super().write(data)
+        quiet = np.abs(np.frombuffer(data, dtype='<i2')[::self.channels].astype(np.int32)) < SILENT_LEVEL
+        if quiet.all():
+            self.silent_frames += len(quiet)
+            return
+        # Quiet stretches are carried over from chunk to chunk, an outage ends
+        # at the first loud frame of a chunk
+        self.silent_frames += int(np.argmin(quiet))
+        if self.heard and self.silent_frames * 1000 >= MIN_OUTAGE_MS * self.rate:
+            self.outages.append(self.silent_frames * 1000 / self.rate)
+        self.heard = True
+        self.silent_frames = len(quiet) - 1 - int(np.flatnonzero(~quiet)[-1])
+
+
+class CounterDeltas:
+    # Receiver counters per interval. Playout sessions start over when a UDP
+    # sender is gone for long, so a counter that went down started again from 0.
+    def __init__(self):
+        self.last = {}
+        self.totals = dict.fromkeys(COUNTERS, 0)
+
+    def update(self, snapshot):
+        deltas = {}
+        for key in COUNTERS:
+            value = snapshot.get(key, 0)
+            previous = self.last.get(key, 0)
+            deltas[key] = value - previous if value >= previous else value
+            self.last[key] = value
+            self.totals[key] += deltas[key]
+        return deltas
+
+
+def drift_per_hour(points):
+    # Slope of the median latency over the run, ms per hour
+    points = [(t, latency) for t, latency in points if latency is not None]
+    if len(points) < 2:
+        return None
+    hours = np.array([t for t, _ in points]) / 3600
+    if hours[-1] - hours[0] <= 0:
+        return None
+    return round(float(np.polyfit(hours, [latency for _, latency in points], 1)[0]), 2)
+
+
+def run(args):
+    config = StreamConfig(rate=args.rate, chunk=args.chunk, transport=args.transport, codec=args.codec,
+                          jitter_ms=args.buffer_ms, latency=args.latency)
+    errors = []
+
+    def keep(message, level='info'):
+        if level != 'info':
+            errors.append(message.splitlines()[0])
+
+    proxy = ImpairmentProxy(args.port + 1, ("127.0.0.1", args.port), args.transport, impairment_from_args(args),
+                            reset_every=args.reset_every)
+    receiver = StreamEngine(config.copy(mode="receiver"), on_log=keep)
+    sender = StreamEngine(config.copy(mode="sender"), on_log=keep)
+    source = SignalSource()
+    sink = OutageSink(source)
+    deltas = CounterDeltas()
+    output = open(args.output, "w") if args.output else None
+    latency_points = []
+    all_outages = []
+    duration = args.hours * 3600 + args.seconds
+
+    receiver.start_receiver(sink, "127.0.0.1", args.port)
+    proxy.start()
+    time.sleep(0.2)
+    sender.start_sender(source, "127.0.0.1", args.port + 1)
+    started = time.monotonic()
+    print(f"{'time':>8} {'p50 ms':>7} {'p99 ms':>7} {'under':>5} {'lost':>5} {'late':>5} {'outages':>7} {'worst ms':>8} {'drift ppm':>9}")
+    try:
+        elapsed = 0.0
+        while elapsed < duration:
+            time.sleep(min(args.interval, duration - elapsed))
+            elapsed = time.monotonic() - started
+            latencies, sink.latencies = sink.latencies, []
+            outages, sink.outages = sink.outages, []
+            snapshot = receiver.metrics.snapshot()
+            changed = deltas.update(snapshot)
+            p50 = percentile(latencies, 0.5)
+            latency_points.append((elapsed, p50))
+            all_outages.extend(outages)
+            line = {
+                "elapsed_s": round(elapsed, 1),
+                "latency_p50_ms": p50,
+                "latency_p99_ms": percentile(latencies, 0.99),
+                "markers": len(latencies),
+                "underruns": changed["jitter_underruns"] + changed["output_underruns"],
+                "lost": changed["jitter_lost"],
+                "late": changed["jitter_dropped_late"],
+                "outages": len(outages),
+                "worst_outage_ms": round(max(outages), 1) if outages else 0,
+                "buffer_ms": snapshot.get("jitter_depth_ms"),
+                "buffer_target_ms": snapshot.get("jitter_target_ms"),
+                "drift_ppm": snapshot.get("drift_drift_ppm"),
+                "proxy": proxy.stats(),
+                "errors": errors[:],
+            }
+            errors.clear()
+            print(f"{time.strftime('%H:%M:%S', time.gmtime(elapsed)):>8} {p50!s:>7} {line['latency_p99_ms']!s:>7} "
+                  f"{line['underruns']:>5} {line['lost']:>5} {line['late']:>5} {line['outages']:>7} "
+                  f"{line['worst_outage_ms']:>8} {line['drift_ppm']!s:>9}", flush=True)
+            for error in line["errors"]:
+                print(f"    {error}")
+            if output:
+                output.write(json.dumps(line) + "\n")
+                output.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sender.stop()
+        sender.wait(5)
+        proxy.close()
+        receiver.stop()
+        receiver.wait(5)
+
+    # The first markers land while the buffer is still filling
+    points = latency_points[1:] if len(latency_points) > 2 else latency_points
+    summary = {
+        "summary": True,
+        "seconds": round(time.monotonic() - started, 1),
+        "transport": args.transport,
+        "chunk": config.chunk,
+        "latency_first_p50_ms": points[0][1] if points else None,
+        "latency_last_p50_ms": points[-1][1] if points else None,
+        "latency_drift_ms_per_hour": drift_per_hour(points),
+        "underruns": deltas.totals["jitter_underruns"] + deltas.totals["output_underruns"],
+        "lost": deltas.totals["jitter_lost"],
+        "late": deltas.totals["jitter_dropped_late"],
+        "outages": len(all_outages),
+        "recovery_p50_ms": percentile(all_outages, 0.5),
+        "recovery_max_ms": round(max(all_outages), 1) if all_outages else None,
+        "proxy": proxy.stats(),
+    }
+    print(json.dumps(summary))
+    if output:
+        output.write(json.dumps(summary) + "\n")
+        output.close()
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pcmstream.soak",
+                                     description="Long loopback run through the impairment proxy")
+    parser.add_argument("--hours", type=float, default=0, help="Length of the run, added to --seconds")
+    parser.add_argument("--seconds", type=float, default=0)
+    parser.add_argument("--interval", type=float, default=60, help="Seconds per report line")
+    parser.add_argument("--transport", choices=["tcp", "udp"], default="udp")
+    parser.add_argument("--rate", type=int, default=48000)
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK)
+    parser.add_argument("--latency", choices=["fixed", "auto"], default="fixed")
+    parser.add_argument("--codec", default="none")
+    parser.add_argument("--buffer-ms", type=int, default=60, help="Receiver jitter buffer target")
+    parser.add_argument("--port", type=int, default=50600, help="Receiver port, the proxy listens on the next one")
+    parser.add_argument("--output", help="Write every report line and the summary to this JSON lines file")
+    add_impairment_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.hours <= 0 and args.seconds <= 0:
+        args.hours = 1
+    run(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
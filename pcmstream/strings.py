@@ -0,0 +1,219 @@
+# User facing strings shared by the GUI and the headless engine
+LANGUAGE_STRINGS = {
+    "en": {
+        "mode_label": "Select Mode:",
+        "sender": "Sender",
+        "receiver": "Receiver",
+        "input_label": "Input Device:",
+        "output_label": "Output Device:",
+        "ip_label": "IP Address:",
+        "port_label": "Port:",
+        "sample_rate_label": "Sample Rate:",
+        "format_label": "Format:",
+        "channels_label": "Channels:",
+        "latency_label": "Latency:",
+        "latency_target_label": "Target ms:",
+        "start_button": "Stream",
+        "stop_button": "Stop Streaming",
+        "logs_label": "Logs:",
+        "select_input": "Select Input Device",
+        "select_output": "Select Output Device",
+        "error_ip_port": "Enter IP address and port...",
+        "error_port": "Invalid port.",
+        "streaming_start_input": "Streaming audio using input device: ",
+        "streaming_start_output": "Receiving audio using output device: ",
+        "streaming_rate": "Streaming at ",
+        "low_latency_on": "Low latency enabled, CHUNK = {chunk}",
+        "low_latency_off": "Low latency disabled, CHUNK = {chunk}",
+        "latency_auto_on": "Auto latency, starting at CHUNK = {chunk}, target {target} ms",
+        "latency_chunk": "Auto latency: CHUNK {old} -> {new}, about {latency} ms end to end",
+        "chunk_changed": "The sender switched to CHUNK = {chunk}",
+        "streaming_stopped": "Streaming stopped by user",
+        "connecting_to": "Attempting to connect to ",
+        "connected_to": "Connected to ",
+        "sender_error": "Sender error: ",
+        "receiver_error": "Receiver error: ",
+        "socket_close_error": "Error closing socket: ",
+        "stream_close_error": "Error closing stream: ",
+        "accept_connection_error": "Error accepting connection: ",
+        "audio_receive_error": "Error receiving/playing audio: ",
+        "save_settings_error": "Error saving last settings: ",
+        "address_in_use": "Address {ip}:{port} already in use. Retrying in {delay} seconds...",
+        "waiting_for_connection": "Waiting for sender connection...",
+        "connection_from": "Connection from ",
+        "error_starting_stream": "Error starting stream: ",
+        "listening_on": "Listening on ",
+        "source_finished": "Audio source finished",
+        "jitter_label": "Buffer (ms):",
+        "jitter_stats": "Jitter buffer: ",
+        "error_jitter": "Invalid buffer size.",
+        "error_rate": "Invalid sample rate, 8000 to 192000 Hz.",
+        "transport_label": "Transport:",
+        "session_timeout": "No packets from {addr} for {seconds} seconds, session closed",
+        "stream_format": "Stream format: ",
+        "handshake_error": "Handshake failed: ",
+        "codec_label": "Codec:",
+        "callback_io": "Callback I/O",
+        "dtx_label": "Don't send silence (DTX)",
+        "error_device": "Audio device {device} not found.",
+        "device_list_error": "Could not list the audio devices: ",
+        "audio_stats": "Audio device stats, ",
+        "fanout_streaming": "Streaming to {count} receivers",
+        "fanout_stats": "Per receiver stats: ",
+        "network_stats": "Network thread: ",
+        "socket_profile": "Socket profile: ",
+        "client_connected": "Receiver {client} connected",
+        "client_disconnected": "Receiver {client} disconnected: ",
+        "client_failed": "Could not reach receiver {client}, retrying in the background: ",
+        "client_slow": "Receiver {client} keeps falling behind, disconnecting it",
+        "client_codec_mismatch": "receiver wants codec {codec}, this stream is encoded once for everybody",
+        "multicast_joined": "Joined multicast group {group} on interface {interface}",
+        "server_mode": "server",
+        "session_started": "Session {peer} playing on {sink}: {format}",
+        "session_ended": "Session {peer} ended, {count} still active",
+        "mix_output": "Mixing every sender into ",
+        "mix_stats": "Mixer: ",
+        "dtx_on": "DTX on: nothing is sent while the input stays under {threshold} dBFS",
+        "dtx_stats": "Silence suppression: ",
+        "link_lost": "Connection lost, reconnecting: ",
+        "link_resumed": "Reconnected after {ms} ms ({attempts} attempts)",
+        "connection_replaced": "New connection from the sender, dropping the old one",
+        "drift_stats": "Clock drift: ",
+        "error_latency_target": "Invalid latency target.",
+        "record_file": "Recording to ",
+        "record_stats": "Recording: ",
+        "record_error": "Recording stopped, could not write: ",
+        "metrics_endpoint": "Metrics at ",
+        "corrupt_packet": "Dropped a corrupt packet from {addr}: ",
+        "log_suppressed": " ({count} similar messages suppressed)",
+        "sessions_loaded": "Loaded {count} sessions from {path}, {workers} workers",
+        "session_waiting": "All {workers} workers are busy, waiting for one: ",
+        "session_stats": "Session stats: ",
+        "sessions_label": "Sessions:",
+        "session_start": "Start",
+        "session_stop": "Stop",
+        "session_name": "Name",
+        "session_mode": "Mode",
+        "session_status": "Status",
+        "session_traffic": "Traffic",
+        "state_stopped": "stopped",
+        "state_waiting": "waiting",
+        "state_running": "running",
+        "state_finished": "finished",
+        "state_error": "error",
+        "dsp_label": "Volume and tone:",
+        "volume_label": "Volume (dB)",
+        "bass_label": "Bass",
+        "mid_label": "Mid",
+        "treble_label": "Treble",
+        "limiter_label": "Limiter (keeps peaks under -1 dBFS)"
+    },
+    "es": {
+        "mode_label": "Seleccionar Modo:",
+        "sender": "Emisor",
+        "receiver": "Receptor",
+        "input_label": "Dispositivo de Entrada:",
+        "output_label": "Dispositivo de Salida:",
+        "ip_label": "Dirección IP:",
+        "port_label": "Puerto:",
+        "sample_rate_label": "Sample Rate:",
+        "format_label": "Formato:",
+        "channels_label": "Canales:",
+        "latency_label": "Latencia:",
+        "latency_target_label": "Objetivo ms:",
+        "start_button": "Transmitir",
+        "stop_button": "Detener transmisión",
+        "logs_label": "Logs:",
+        "select_input": "Seleccionar Dispositivo de Entrada",
+        "select_output": "Seleccionar Dispositivo de Salida",
+        "error_ip_port": "Escribí la dirección IP y el puerto...",
+        "error_port": "Puerto inválido.",
+        "streaming_start_input": "Transmitiendo audio utilizando el dispositivo de entrada: ",
+        "streaming_start_output": "Recibiendo audio utilizando el dispositivo de salida: ",
+        "streaming_rate": "Transmitiendo a ",
+        "low_latency_on": "Baja latencia activada, CHUNK = {chunk}",
+        "low_latency_off": "Baja latencia desactivada, CHUNK = {chunk}",
+        "latency_auto_on": "Latencia automática, arrancando con CHUNK = {chunk}, objetivo {target} ms",
+        "latency_chunk": "Latencia automática: CHUNK {old} -> {new}, unos {latency} ms de punta a punta",
+        "chunk_changed": "El emisor pasó a CHUNK = {chunk}",
+        "streaming_stopped": "Transmisión detenida por el usuario",
+        "connecting_to": "Intentando conectar a ",
+        "connected_to": "Conectado a ",
+        "sender_error": "Error del emisor: ",
+        "receiver_error": "Error del receptor: ",
+        "socket_close_error": "Error al cerrar el socket: ",
+        "stream_close_error": "Error cerrando transmisión: ",
+        "accept_connection_error": "Error aceptando conexión: ",
+        "audio_receive_error": "Error en la recepción/reproducción de audio: ",
+        "save_settings_error": "Error guardando la última configuración: ",
+        "address_in_use": "Dirección {ip}:{port} ya en uso. Reintentando en {delay} segundos...",
+        "waiting_for_connection": "Esperando conexión del emisor...",
+        "connection_from": "Conexión desde ",
+        "error_starting_stream": "Error al iniciar la transmisión: ",
+        "listening_on": "Escuchando en ",
+        "source_finished": "La fuente de audio terminó",
+        "jitter_label": "Buffer (ms):",
+        "jitter_stats": "Buffer de jitter: ",
+        "error_jitter": "Tamaño de buffer inválido.",
+        "error_rate": "Frecuencia de muestreo inválida, de 8000 a 192000 Hz.",
+        "transport_label": "Transporte:",
+        "session_timeout": "Sin paquetes de {addr} durante {seconds} segundos, sesión cerrada",
+        "stream_format": "Formato de la transmisión: ",
+        "handshake_error": "Falló el handshake: ",
+        "codec_label": "Códec:",
+        "callback_io": "E/S por callback",
+        "dtx_label": "No enviar silencio (DTX)",
+        "error_device": "No se encontró el dispositivo de audio {device}.",
+        "device_list_error": "No se pudieron listar los dispositivos de audio: ",
+        "audio_stats": "Estadísticas del dispositivo de audio, ",
+        "fanout_streaming": "Transmitiendo a {count} receptores",
+        "fanout_stats": "Estadísticas por receptor: ",
+        "network_stats": "Hilo de red: ",
+        "socket_profile": "Perfil de socket: ",
+        "client_connected": "Receptor {client} conectado",
+        "client_disconnected": "Receptor {client} desconectado: ",
+        "client_failed": "No se pudo llegar al receptor {client}, reintentando en segundo plano: ",
+        "client_slow": "El receptor {client} se sigue atrasando, se lo desconecta",
+        "client_codec_mismatch": "el receptor pide el códec {codec}, esta transmisión se codifica una sola vez para todos",
+        "multicast_joined": "Unido al grupo multicast {group} en la interfaz {interface}",
+        "server_mode": "servidor",
+        "session_started": "Sesión {peer} reproduciendo en {sink}: {format}",
+        "session_ended": "Sesión {peer} terminada, {count} siguen activas",
+        "mix_output": "Mezclando a todos los emisores en ",
+        "mix_stats": "Mezclador: ",
+        "dtx_on": "DTX activado: no se envía nada mientras la entrada esté debajo de {threshold} dBFS",
+        "dtx_stats": "Supresión de silencio: ",
+        "link_lost": "Conexión perdida, reconectando: ",
+        "link_resumed": "Reconectado después de {ms} ms ({attempts} intentos)",
+        "connection_replaced": "Nueva conexión del emisor, se descarta la anterior",
+        "drift_stats": "Deriva de reloj: ",
+        "error_latency_target": "Objetivo de latencia inválido.",
+        "record_file": "Grabando en ",
+        "record_stats": "Grabación: ",
+        "record_error": "Grabación detenida, no se pudo escribir: ",
+        "metrics_endpoint": "Métricas en ",
+        "corrupt_packet": "Se descartó un paquete corrupto de {addr}: ",
+        "log_suppressed": " ({count} mensajes similares omitidos)",
+        "sessions_loaded": "Se cargaron {count} sesiones de {path}, {workers} workers",
+        "session_waiting": "Los {workers} workers están ocupados, esperando uno: ",
+        "session_stats": "Estadísticas de la sesión: ",
+        "sessions_label": "Sesiones:",
+        "session_start": "Iniciar",
+        "session_stop": "Detener",
+        "session_name": "Nombre",
+        "session_mode": "Modo",
+        "session_status": "Estado",
+        "session_traffic": "Tráfico",
+        "state_stopped": "detenida",
+        "state_waiting": "esperando",
+        "state_running": "transmitiendo",
+        "state_finished": "terminada",
+        "state_error": "error",
+        "dsp_label": "Volumen y tono:",
+        "volume_label": "Volumen (dB)",
+        "bass_label": "Graves",
+        "mid_label": "Medios",
+        "treble_label": "Agudos",
+        "limiter_label": "Limitador (mantiene los picos bajo -1 dBFS)"
+    }
+}
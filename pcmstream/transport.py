@@ -0,0 +1,731 @@
+import ipaddress
+import select
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import deque
+
+from .codec import sender_codec
+from .config import LOW_LATENCY_CHUNK
+from .protocol import (
+    pack_packet, pack_hello, sender_handshake, unpack_header, parse_report, FrameReader, ProtocolError,
+    MAX_DATAGRAM_PAYLOAD, HELLO_INTERVAL, HEADER_SIZE, MSG_AUDIO, MSG_REPORT, MSG_SILENCE
+)
+
+TRANSPORTS = ("tcp", "udp", "multicast")
+
+FANOUT_QUEUE_MS = 200 # Audio a receiver may fall behind before its oldest chunks are dropped
+SLOW_CLIENT_TIMEOUT = 5 # Seconds a receiver may stay that far behind before it is disconnected
+RETRY_FIRST_DELAY = 0.05 # A dropped link is retried right away, then after this, doubling
+RETRY_MAX_DELAY = 1.0 # ...up to this, for as long as it takes
+CONNECT_TIMEOUT = 2 # Seconds a TCP connect may take before the attempt counts as failed
+SEND_TIMEOUT = 2 # Seconds a receiver may stop reading before the link counts as dropped
+SEND_QUEUE_MS = 200 # Audio the sender's network thread may fall behind before its oldest chunks are dropped
+MAX_BATCH = 64 # Chunks at most in one scatter-gather send, well under every OS's IOV_MAX
+MIN_SOCKET_BUFFER = 8192 # Bytes, low latency send buffers never go below this
+
+# Socket settings per latency profile. TCP_NODELAY is always on: the network
+# thread already gathers whatever is queued into one send, Nagle would only
+# hold back the tail of a chunk until the previous one is acknowledged.
+# Low latency sizes the kernel's send buffer to the latency target, so a
+# stalled link backs up into the sender's queue, where old chunks get dropped,
+# instead of seconds of stale audio piling up in the kernel. The default
+# profile leaves the OS default, which Linux grows and shrinks on its own.
+# tos is the DSCP mark (EF for low latency, AF41 otherwise) and priority the
+# Linux queueing priority, both only matter where the network honours them.
+SOCKET_PROFILES = {
+    "low-latency": {"small_buffer": True, "tos": 0xB8, "priority": 6},
+    "default": {"small_buffer": False, "tos": 0x88, "priority": 5},
+}
+RECEIVE_BUFFER_MS = 500 # Receivers: audio the kernel may hold while the playout loop is busy
+
+
+def parse_targets(ip, default_port):
+    # "host", "host:port" or a comma separated list of them
+    targets = []
+    for entry in ip.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        host, sep, port = entry.rpartition(':')
+        if sep and port.isdigit():
+            targets.append((host, int(port)))
+        else:
+            targets.append((entry, default_port))
+    return targets
+
+
+def format_targets(targets):
+    return ", ".join(f"{host}:{port}" for host, port in targets)
+
+
+def socket_profile(config):
+    # Auto latency and the low latency chunk size get the low latency profile
+    if config.latency == "auto" or config.chunk <= LOW_LATENCY_CHUNK:
+        return "low-latency"
+    return "default"
+
+
+def audio_bytes(config, ms):
+    return int(config.rate * config.frame_bytes * ms / 1000)
+
+
+def _setsockopt(sock, level, option, value):
+    # Some options are refused by some OSes (Windows ignores IP_TOS, for one),
+    # none of them is worth failing a stream over
+    try:
+        sock.setsockopt(level, option, value)
+    except OSError:
+        pass
+
+
+def tune_socket(sock, config, stream, send=True):
+    # Applies the latency profile to a sender socket, or sizes a receiver's
+    # receive buffer
+    settings = SOCKET_PROFILES[socket_profile(config)]
+    if stream:
+        _setsockopt(sock, socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    if not send:
+        # Only ever grown, the OS default may already be larger
+        size = audio_bytes(config, RECEIVE_BUFFER_MS)
+        if sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) < size:
+            _setsockopt(sock, socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+        return
+    if settings["small_buffer"]:
+        size = max(MIN_SOCKET_BUFFER, audio_bytes(config, config.latency_target_ms))
+        _setsockopt(sock, socket.SOL_SOCKET, socket.SO_SNDBUF, size)
+    _setsockopt(sock, socket.IPPROTO_IP, socket.IP_TOS, settings["tos"])
+    if hasattr(socket, "SO_PRIORITY"):
+        _setsockopt(sock, socket.SOL_SOCKET, socket.SO_PRIORITY, settings["priority"])
+
+
+def send_buffers(sock, buffers):
+    # sendall for a list of packets: one scatter-gather sendmsg for all of
+    # them, more only when the kernel takes part of it. Returns the syscalls.
+    if not hasattr(sock, "sendmsg"):
+        # Windows has no sendmsg, one joined sendall is still one call
+        sock.sendall(b''.join(buffers))
+        return 1
+    views = [memoryview(buffer) for buffer in buffers]
+    syscalls = 0
+    while views:
+        sent = sock.sendmsg(views)
+        syscalls += 1
+        while views and sent >= len(views[0]):
+            sent -= len(views[0])
+            views.pop(0)
+        if sent:
+            views[0] = views[0][sent:]
+    return syscalls
+
+
+class Backoff:
+    # Delays between reconnection attempts: none for the first one, a brief
+    # blip is over by then, then short and doubling up to RETRY_MAX_DELAY
+    def __init__(self):
+        self.delay = 0.0
+
+    def next(self):
+        delay = self.delay
+        self.delay = min(max(delay * 2, RETRY_FIRST_DELAY), RETRY_MAX_DELAY)
+        return delay
+
+    def reset(self):
+        self.delay = 0.0
+
+
+class ReportListener:
+    # Reads the REPORTs a receiver sends back on the sender's own socket, on a
+    # thread of its own, so the capture loop only looks at the latest one
+    def __init__(self, sock, stream):
+        self.sock = sock
+        self.stream = stream # TCP: framed byte stream, UDP: one message per datagram
+        self.report = None # (underruns, device underruns, buffer ms)
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        reader = FrameReader(self.sock) if self.stream else None
+        buffer = bytearray(512)
+        while not self.closed:
+            try:
+                # select, so closing the socket ends the thread on every platform
+                readable, _, _ = select.select([self.sock], [], [], 0.5)
+                if not readable:
+                    continue
+                if reader:
+                    message = reader.read()
+                    if message is None:
+                        return
+                    kind, _, _, payload = message
+                else:
+                    size = self.sock.recv_into(buffer)
+                    if size < HEADER_SIZE:
+                        continue
+                    kind, _, _, length = unpack_header(buffer)
+                    payload = buffer[HEADER_SIZE:min(size, HEADER_SIZE + length)]
+                if kind == MSG_REPORT:
+                    self.report = parse_report(payload)
+            except ConnectionRefusedError:
+                continue  # UDP, receiver not up yet
+            except (OSError, ValueError, ProtocolError, struct.error):
+                return
+
+    def stop(self):
+        self.closed = True
+
+
+class TcpSender:
+    # Reliable byte stream, in order delivery. HELLO/ACCEPT handshake, then frames.
+    def __init__(self, ip, port):
+        self.address = (ip, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener = None
+        self.hello = None # New HELLO waiting to go out in front of the next frame
+
+    def open(self, config):
+        # Before connecting, the send buffer size goes into the handshake's window
+        tune_socket(self.sock, config, stream=True)
+        # Bounded, so an unreachable receiver doesn't wait out the OS's long connect timeout
+        self.sock.settimeout(CONNECT_TIMEOUT)
+        self.sock.connect(self.address)
+        config.codec = sender_handshake(self.sock, config)
+        # A send that can't get through in SEND_TIMEOUT raises, and the sender reconnects
+        self.sock.settimeout(SEND_TIMEOUT)
+        if config.latency == "auto":
+            self.listener = ReportListener(self.sock, stream=True)
+
+    def reconfigure(self, config):
+        # The chunk size changed. Called from the thread that sends, or before
+        # it sends again, so the HELLO lands between the old and the new frames.
+        self.hello = pack_hello(config)
+
+    def send(self, seq, timestamp, data, kind=MSG_AUDIO):
+        self.send_packet(seq, pack_packet(seq, timestamp, data, kind))
+
+    def send_packet(self, seq, packet):
+        if self.hello:
+            self.sock.sendall(self.hello)
+            self.hello = None
+        self.sock.sendall(packet)
+
+    def send_packets(self, packets):
+        # (seq, packet) pairs, gathered into one send. Returns the syscalls.
+        buffers = [packet for _, packet in packets]
+        if self.hello:
+            buffers.insert(0, self.hello)
+            self.hello = None
+        return send_buffers(self.sock, buffers)
+
+    def report(self):
+        return self.listener.report if self.listener else None
+
+    def interrupt(self):
+        # Unblocks a connect/sendall running in another thread
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def close(self):
+        if self.listener:
+            self.listener.stop()
+        self.sock.close()
+
+
+class UdpSender:
+    # One datagram per chunk, carrying its sequence number and capture time.
+    # Lost datagrams are never retransmitted, the receiver conceals them.
+    listens = True # Receivers can answer: their replies come from the connected address
+
+    def __init__(self, ip, port):
+        self.address = (ip, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.refused = 0
+        self.hello = b''
+        self.hello_every = 1
+        self.hello_now = False
+        self.listener = None
+
+    def open(self, config):
+        if config.chunk_bytes > MAX_DATAGRAM_PAYLOAD:
+            raise ValueError(f"Chunk of {config.chunk_bytes} bytes does not fit in a UDP datagram")
+        tune_socket(self.sock, config, stream=False)
+        # Connected UDP socket: fixed destination, no per packet address lookup
+        self.sock.connect(self.address)
+        config.codec = sender_codec(config)
+        self.reconfigure(config)
+        if config.latency == "auto" and self.listens:
+            self.listener = ReportListener(self.sock, stream=False)
+
+    def reconfigure(self, config):
+        self.hello = pack_hello(config)
+        self.hello_every = max(1, round(HELLO_INTERVAL / config.chunk_seconds))
+        self.hello_now = True
+
+    def send(self, seq, timestamp, data, kind=MSG_AUDIO):
+        self.send_packet(seq, pack_packet(seq, timestamp, data, kind))
+
+    def send_packet(self, seq, packet):
+        # Returns the syscalls it took
+        syscalls = 1
+        try:
+            # A quiet sender (DTX) only sends SILENCE, so that carries the HELLO
+            # repeats that let a receiver join in the middle of a pause.
+            # Byte 3 of the header is the message type.
+            if self.hello_now or seq % self.hello_every == 0 or packet[3] == MSG_SILENCE:
+                self.hello_now = False
+                syscalls += 1
+                self.sock.send(self.hello)
+            self.sock.send(packet)
+        except ConnectionRefusedError:
+            # ICMP port unreachable, receiver not started yet. Keep sending.
+            self.refused += 1
+        return syscalls
+
+    def send_packets(self, packets):
+        # Datagrams can't be gathered, each one is a send of its own
+        return sum(self.send_packet(seq, packet) for seq, packet in packets)
+
+    def report(self):
+        return self.listener.report if self.listener else None
+
+    def interrupt(self):
+        pass
+
+    def close(self):
+        if self.listener:
+            self.listener.stop()
+        self.sock.close()
+
+
+def check_multicast_group(group):
+    try:
+        is_multicast = ipaddress.IPv4Address(group).is_multicast
+    except ValueError:
+        is_multicast = False
+    if not is_multicast:
+        raise ValueError(f"{group} is not an IPv4 multicast group (224.0.0.0 - 239.255.255.255)")
+
+
+def join_multicast(sock, group, interface):
+    # Subscribes a bound receiver socket to the group, on the interface with
+    # that address or the one the OS picks when it is empty
+    check_multicast_group(group)
+    membership = struct.pack("4s4s", socket.inet_aton(group), socket.inet_aton(interface or "0.0.0.0"))
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+
+
+def multicast_bind_address(group):
+    # Binding to the group filters out unrelated datagrams on the same port.
+    # Windows only accepts a local address.
+    return "" if sys.platform == "win32" else group
+
+
+class MulticastSender(UdpSender):
+    # UDP to a multicast group: one datagram per chunk no matter how many
+    # receivers joined. Same packets and HELLO repeats as plain UDP, so a
+    # receiver can join at any time and spots losses from the sequence numbers.
+    # Nobody reports back, the socket is connected to the group.
+    listens = False
+
+    def open(self, config):
+        check_multicast_group(self.address[0])
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, config.multicast_ttl)
+        # Receivers on this machine hear the stream too
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        if config.multicast_interface:
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF,
+                                 socket.inet_aton(config.multicast_interface))
+        super().open(config)
+
+
+def create_single_sender(transport, ip, port):
+    if transport == "multicast":
+        return MulticastSender(ip, port)
+    if transport == "udp":
+        return UdpSender(ip, port)
+    return TcpSender(ip, port)
+
+
+def queue_length(ms, config):
+    # Chunks that hold ms of audio, never fewer than two
+    return max(2, round(ms / 1000 / config.chunk_seconds))
+
+
+def resized(queue, maxlen):
+    # A copy of queue bounded to maxlen, keeping the newest entries, and how
+    # many of the oldest did not fit
+    if maxlen == queue.maxlen:
+        return queue, 0
+    return deque(queue, maxlen=maxlen), max(0, len(queue) - maxlen)
+
+
+class QueuedSender:
+    # A single receiver's sender on a network thread of its own. The capture
+    # loop only queues packets and never waits for the network, the thread
+    # sends whatever piled up meanwhile in one go. A failed send is raised
+    # from the next send() call, so the capture loop can reconnect.
+    def __init__(self, sender):
+        self.sender = sender
+        self.queue = deque(maxlen=2) # (index, seq, packet)
+        self.queued = 0 # Index of the next packet
+        # (index, config): a chunk size change, sent once every packet queued
+        # before it has gone out. Not in the queue, a full queue would drop it.
+        self.pending = None
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+        self.closing = False
+        self.error = None
+        self.started = None
+        self.sent = 0
+        self.syscalls = 0
+        self.max_batch = 0
+        self.peak_queue = 0
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def open(self, config):
+        self.sender.open(config)
+        self.queue = deque(maxlen=queue_length(SEND_QUEUE_MS, config))
+        self.started = time.monotonic()
+        self.thread.start()
+
+    def send(self, seq, timestamp, data, kind=MSG_AUDIO):
+        # Called from the capture thread, never blocks
+        if self.error:
+            raise self.error
+        packet = pack_packet(seq, timestamp, data, kind)
+        with self.lock: # The network thread may be swapping in a resized queue
+            if len(self.queue) == self.queue.maxlen:
+                # Behind: the deque drops its oldest chunk
+                self.dropped += 1
+            self.queue.append((self.queued, seq, packet))
+            self.queued += 1
+        self.peak_queue = max(self.peak_queue, len(self.queue))
+        self.ready.set()
+
+    def reconfigure(self, config):
+        # The new HELLO follows the chunks of the old size already queued. A
+        # change before the last one went out replaces it in the same place.
+        with self.lock:
+            self.pending = (self.pending[0] if self.pending else self.queued, config.copy())
+        self.ready.set()
+
+    def _run(self):
+        try:
+            while not self.stopped.is_set():
+                pending = self.pending
+                if not self.queue and not pending:
+                    if self.closing:
+                        return
+                    self.ready.wait(0.5)
+                    self.ready.clear()
+                    continue
+                batch = []
+                while self.queue and len(batch) < MAX_BATCH:
+                    if pending and self.queue[0][0] >= pending[0]:
+                        break
+                    _, seq, packet = self.queue.popleft()
+                    batch.append((seq, packet))
+                if batch:
+                    self.syscalls += self.sender.send_packets(batch)
+                    self.sent += len(batch)
+                    self.max_batch = max(self.max_batch, len(batch))
+                if pending and (not self.queue or self.queue[0][0] >= pending[0]):
+                    with self.lock:
+                        if self.pending is pending:
+                            self.pending = None
+                        # Still SEND_QUEUE_MS of audio at the new chunk size
+                        self.queue, dropped = resized(self.queue, queue_length(SEND_QUEUE_MS, pending[1]))
+                        self.dropped += dropped
+                    self.sender.reconfigure(pending[1])
+        except Exception as e:
+            self.error = e
+            self.queue.clear()
+
+    def report(self):
+        return self.sender.report()
+
+    def interrupt(self):
+        self.stopped.set()
+        self.ready.set()
+        self.sender.interrupt()
+
+    def close(self):
+        # What is still queued goes out first, a file source's last chunks too
+        self.closing = True
+        self.ready.set()
+        if self.thread.is_alive():
+            self.thread.join(SEND_TIMEOUT + 1)
+        if self.thread.is_alive():
+            self.interrupt()
+            self.thread.join(1)
+        self.stopped.set()
+        self.sender.close()
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started if self.started else 0
+        return {
+            "sent": self.sent,
+            "syscalls": self.syscalls,
+            "syscalls_per_second": round(self.syscalls / elapsed, 1) if elapsed else 0,
+            "max_batch": self.max_batch,
+            "queued": len(self.queue),
+            "peak_queue": self.peak_queue,
+            "dropped": self.dropped,
+        }
+
+
+class Reconnector:
+    # Opens a new sender to the same receiver on a thread of its own, retrying
+    # until it works, so the capture loop can keep draining the input meanwhile.
+    # Stands in for the transport until then: stop() interrupts it.
+    def __init__(self, kind, host, port, config, stopped):
+        self.kind = kind
+        self.host = host
+        self.port = port
+        self.config = config # open() fills in the codec the receiver picked
+        self.stopped = stopped
+        self.sender = None # Set once connected
+        self.attempt = None
+        self.attempts = 0
+        self.error = None
+        self.cancelled = threading.Event()
+        self.started = time.monotonic()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        backoff = Backoff()
+        while not (self.stopped.is_set() or self.cancelled.wait(backoff.next())):
+            self.attempt = QueuedSender(create_single_sender(self.kind, self.host, self.port))
+            self.attempts += 1
+            try:
+                self.attempt.open(self.config)
+            except Exception as e:
+                self.error = e
+                self.attempt.close()
+                continue
+            if self.cancelled.is_set():
+                self.attempt.close()
+                return
+            self.sender = self.attempt
+            return
+
+    def interrupt(self):
+        self.cancelled.set()
+        if self.attempt:
+            self.attempt.interrupt()
+
+    def close(self):
+        self.interrupt()
+        self.thread.join(CONNECT_TIMEOUT + 1)
+        # Connected, but the capture loop stopped before taking it over
+        if self.sender:
+            self.sender.close()
+
+
+class ClientLink:
+    # One receiver of a fan-out: a bounded queue of ready made packets and a
+    # thread that sends them, reconnecting whenever the receiver goes away
+    def __init__(self, fanout, host, port):
+        self.fanout = fanout
+        self.host = host
+        self.port = port
+        self.name = f"{host}:{port}"
+        self.queue = deque(maxlen=fanout.queue_chunks) # (index, seq, packet)
+        self.queued = 0 # Index of the next packet
+        self.pending = None # (index, config) of a chunk size change, like QueuedSender's
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+        self.sender = None
+        self.connected = False
+        self.full_since = None
+        self.sent = 0
+        self.dropped = 0
+        self.disconnects = 0
+        self.syscalls = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def offer(self, seq, packet):
+        # Called from the capture thread, never blocks
+        if not self.connected:
+            return
+        if len(self.queue) == self.queue.maxlen:
+            # Behind: the deque drops its oldest chunk, for this receiver only
+            self.dropped += 1
+            now = time.monotonic()
+            if self.full_since is None:
+                self.full_since = now
+            elif now - self.full_since > SLOW_CLIENT_TIMEOUT:
+                self.fanout.log(self.fanout.strings['client_slow'].format(client=self.name), 'warning', key=('client', self.name))
+                self.full_since = None
+                self.kick()
+                return
+        else:
+            self.full_since = None
+        with self.lock: # The link's thread may be swapping in a resized queue
+            self.queue.append((self.queued, seq, packet))
+            self.queued += 1
+        self.ready.set()
+
+    def announce(self, config):
+        # The new HELLO goes out after the chunks of the old size this
+        # receiver still has to get. Kept out of the queue, where a slow
+        # receiver's full queue would drop it.
+        if self.connected:
+            with self.lock:
+                self.pending = (self.pending[0] if self.pending else self.queued, config)
+            self.ready.set()
+
+    def report(self):
+        sender = self.sender
+        return sender.report() if sender and self.connected else None
+
+    def kick(self):
+        self.connected = False
+        self.ready.set()
+        if self.sender:
+            self.sender.interrupt()
+
+    def _run(self):
+        fanout = self.fanout
+        strings = fanout.strings
+        failed_before = False
+        backoff = Backoff()
+        while not self.stopped.wait(backoff.next()):
+            config = fanout.config.copy()
+            self.sender = create_single_sender(fanout.kind, self.host, self.port)
+            try:
+                self.sender.open(config)
+                if config.codec != fanout.config.codec:
+                    raise ValueError(strings['client_codec_mismatch'].format(codec=config.codec))
+            except Exception as e:
+                # Only the first failure is logged, the receiver may just not be up yet
+                if not failed_before and not self.stopped.is_set():
+                    fanout.log(f"{strings['client_failed'].format(client=self.name)}{e}", 'warning')
+                failed_before = True
+                self.sender.close()
+                continue
+
+            failed_before = False
+            backoff.reset()
+            with self.lock:
+                self.queue = deque(maxlen=fanout.queue_chunks)
+                self.pending = None # The connection opened with the latest config
+            self.full_since = None
+            self.connected = True
+            fanout.log(strings['client_connected'].format(client=self.name), key=('client', self.name))
+            try:
+                while not self.stopped.is_set() and self.connected:
+                    pending = self.pending
+                    if not self.queue and not pending:
+                        self.ready.wait(0.5)
+                        self.ready.clear()
+                        continue
+                    # Everything queued so far goes out in one send, up to a
+                    # chunk size change
+                    batch = []
+                    while self.queue and len(batch) < MAX_BATCH:
+                        if pending and self.queue[0][0] >= pending[0]:
+                            break
+                        _, seq, packet = self.queue.popleft()
+                        batch.append((seq, packet))
+                    if batch:
+                        self.syscalls += self.sender.send_packets(batch)
+                        self.sent += len(batch)
+                    if pending and (not self.queue or self.queue[0][0] >= pending[0]):
+                        with self.lock:
+                            if self.pending is pending:
+                                self.pending = None
+                            self.queue, dropped = resized(self.queue, queue_length(FANOUT_QUEUE_MS, pending[1]))
+                            self.dropped += dropped
+                        self.sender.reconfigure(pending[1])
+            except Exception as e:
+                if not self.stopped.is_set():
+                    fanout.log(f"{strings['client_disconnected'].format(client=self.name)}{e}", 'warning', key=('client', self.name))
+            finally:
+                self.connected = False
+                if not self.stopped.is_set():
+                    self.disconnects += 1
+                self.sender.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.kick()
+
+    def stats(self):
+        return {"sent": self.sent, "syscalls": self.syscalls, "dropped": self.dropped, "disconnects": self.disconnects}
+
+
+class FanOutSender:
+    # One capture, several receivers. Each chunk is encoded and framed once and
+    # the same bytes object is queued for every receiver, so a slow or missing
+    # receiver only ever loses its own chunks and never stalls the capture loop.
+    sock = None
+
+    def __init__(self, kind, targets, log, strings):
+        self.kind = kind
+        self.targets = targets
+        self.log = log
+        self.strings = strings
+        self.config = None
+        self.queue_chunks = 2
+        self.links = []
+
+    def open(self, config):
+        if self.kind == "udp" and config.chunk_bytes > MAX_DATAGRAM_PAYLOAD:
+            raise ValueError(f"Chunk of {config.chunk_bytes} bytes does not fit in a UDP datagram")
+        # Every receiver gets the same encoded bytes, so the sender picks the codec
+        config.codec = sender_codec(config)
+        self.config = config
+        self.queue_chunks = queue_length(FANOUT_QUEUE_MS, config)
+        self.links = [ClientLink(self, host, port) for host, port in self.targets]
+        for link in self.links:
+            link.thread.start()
+
+    def send(self, seq, timestamp, data, kind=MSG_AUDIO):
+        packet = pack_packet(seq, timestamp, data, kind)
+        for link in self.links:
+            link.offer(seq, packet)
+
+    def reconfigure(self, config):
+        # Links that reconnect later open with the new config anyway, and a
+        # queue sized for it
+        self.config = config
+        self.queue_chunks = queue_length(FANOUT_QUEUE_MS, config)
+        for link in self.links:
+            link.announce(config.copy())
+
+    def report(self):
+        # Every receiver's glitches count, the largest buffer sets the latency
+        reports = [report for report in (link.report() for link in self.links) if report]
+        if not reports:
+            return None
+        return (sum(report[0] for report in reports), sum(report[1] for report in reports),
+                max(report[2] for report in reports))
+
+    def interrupt(self):
+        for link in self.links:
+            link.stop()
+
+    def close(self):
+        self.interrupt()
+        for link in self.links:
+            link.thread.join(2)
+
+    def stats(self):
+        return {link.name: link.stats() for link in self.links}
+
+
+def create_sender(transport, targets, log=None, strings=None):
+    if len(targets) == 1:
+        host, port = targets[0]
+        return QueuedSender(create_single_sender(transport, host, port))
+    return FanOutSender(transport, targets, log, strings)